@@ -15,129 +15,296 @@ import sys
 from datetime import datetime
 import logging
 import argparse
+import shlex
+import time
 try:
 	xrange
 except NameError:
 	# Remap xrange to range for Python 3
 	xrange = range
+import os
 import SAMBALoader
 import SAMBALoader.Transports
-from SAMBALoader.FileFormats import BinFormat
+from SAMBALoader import Session, SessionError, Profiler
 
 
-class SessionError(Exception):
-	pass
+# Commands which can be served by a running SAM-BA daemon
+DAEMON_COMMANDS = ('info', 'read', 'dump', 'write', 'verify', 'erase')
 
+# Commands which can be used as steps of a `run` script, besides the
+# `flash-boot` and `reset` steps
+SCRIPT_COMMANDS = ('info', 'read', 'dump', 'write', 'verify', 'erase')
 
-class Session(object):
+# Compressed upload modes of `write --compress`
+COMPRESS_MODES = ('off', 'auto', 'on')
 
-	def __init__(self, samba):
-		self.samba = samba
-		self.part  = None
 
+def show_progress_bar(progress):
+	"""Progress callback drawing a progress bar on stderr."""
+	width = 30
+	ratio = min(float(progress.done) / progress.total, 1.0) if progress.total else (1.0 if progress.finished else 0.0)
+	eta = progress.eta
+	sys.stderr.write('\r{:<7} [{:<{}}] {:4.0%} {:8.1f} KB/s {}'.format(progress.operation,
+		'#' * int(ratio * width), width, ratio, progress.rate / 1024,
+		'in {:.1f}s'.format(progress.elapsed) if progress.finished else 'ETA {:>5}'.format('?' if eta is None else '{:.0f}s'.format(eta))))
+	if progress.finished:
+		sys.stderr.write('\n')
+	sys.stderr.flush()
 
-	def _get_part(self, chip_ids):
-		# find & collect the part classes types by chip ids
-		matched_parts = SAMBALoader.PartLibrary.find_by_chip_ids(chip_ids)
 
-		if len(matched_parts) == 0:
-			raise SessionError('Unknown part.')
-		elif len(matched_parts) > 1:
-			raise SessionError('Multiple matching parts: %s' % [p.get_name() for p in matched_parts])
-		else:
-			# create part class instance
-			return matched_parts[0](self.samba)
-
-
-	def _get_file_processor(self, filename):
-		matched_formats = SAMBALoader.FileFormatLibrary.find_by_name(filename)
-
-		if len(matched_formats) == 0:
-			raise SessionError('Unknown file format: %s' % filename)
-		elif len(matched_formats) > 1:
-			raise SessionError('Multiple matching file formats: %s' % [f.get_name() for f in matched_formats])
-		else:
-			return matched_formats[0]()
-
-
-	def get_part_identifiers(self, addresses=None):
-		"""Reads out the chip identifiers from the attached device. Note that
-		   each device usually implements only a single one of the chip
-		   identifier modules, thus all but one value will essentially read as
-		   garbage.
-
-		Args:
-			addresses -- Dict: { REGISTER_NAME : REGISTER_ADDRESS, }. If `None`: DEFAULT_ADDRESSES
-
-		Returns:
-			Dictionary of `{name, identifiers}` for each chip identifier,
-			which can then be used to match against a device.
-		"""
-		return SAMBALoader.PartLibrary.get_chip_ids(self.samba, addresses)
-
-
-	def set_part_by_chip_ids(self, chip_ids):
-		self.part = self._get_part(chip_ids)
+def show_progress_json(progress):
+	"""Progress callback writing machine readable progress events, one JSON
+	   object per line, to stderr.
+	"""
+	import json
+	event = dict(progress.as_dict(), event='progress')
+	sys.stderr.write(json.dumps(event, sort_keys=True) + '\n')
+	sys.stderr.flush()
 
-		return self.part
 
+def get_progress(args):
+	"""Creates the `Progress` selected by `--progress`, or `None`."""
+	callbacks = { 'bar' : show_progress_bar, 'json' : show_progress_json }
+	mode = args.progress or ('bar' if sys.stderr.isatty() else 'none')
+	if mode not in callbacks:
+		return None
+	return SAMBALoader.Progress(callbacks[mode])
+
+
+def get_compress(args):
+	"""Selects the compressed upload of `write --compress`.
+
+	Returns:
+		Keyword arguments of the session write.
+	"""
+	mode = getattr(args, 'compress', 'off')
+	if mode == 'off':
+		return {}
+	return { 'compress' : 'auto' if mode == 'auto' else True }
+
+
+def get_output_format(args):
+	"""Selects the file format of the read output: `--format`, or by the
+	   extension of the output file, or binary.
+
+	Returns:
+		File format processor class.
+	"""
+	if args.format:
+		return SAMBALoader.FileFormatLibrary.get_format(args.format)
+	if args.file:
+		matched_formats = SAMBALoader.FileFormatLibrary.find_by_name(args.file)
+		if matched_formats:
+			return matched_formats[0]
+	return SAMBALoader.FileFormatLibrary.get_format('bin')
+
+
+def read_chunks(session, address, length, progress=None):
+	"""Reads the flash chunk by chunk, or at once through the SAM-BA daemon.
+
+	Returns:
+		Iterable of (address, data) tuples.
+	"""
+	if hasattr(session, 'read_flash_chunks'):
+		return session.read_flash_chunks(address, length, progress=progress)
+	return [(address if address is not None else session.get_flash_start(), session.read_flash(address, length))]
+
+
+def save_to_file(file_path, chunks, file_format=None):
+	"""Writes read (address, data) chunks as they are read, to a file (or
+	   stdout if `None`) in the given format (default: binary).
+	"""
+	if file_format is None:
+		file_format = SAMBALoader.FileFormatLibrary.get_format('bin')
+	stream = open(file_path, 'wb') if file_path else sys.stdout.buffer
+	writer = None
+	try:
+		for address, data in chunks:
+			if writer is None:
+				writer = file_format.get_writer(stream, address)
+			writer.write(data)
+		if writer is not None:
+			writer.close()
+	finally:
+		if file_path:
+			stream.close()
+	if file_path and writer is not None:
+		logging.info('Save 0x{0:X} ({0}) byte(s) to {1} file "{2}"'.format(writer.length, file_format().get_name(), file_path))
+
+
+def read_addressed_file(file_path):
+	"""Reads a file of a format carrying its own addresses (Intel HEX,
+	   S-records).
+
+	Returns:
+		File format processor holding the file data, or `None` for other
+		formats.
+	"""
+	addressed_formats = [SAMBALoader.FileFormatLibrary.get_format(name) for name in ('ihex', 'srec')]
+	matched_formats = [f for f in SAMBALoader.FileFormatLibrary.find_by_name(file_path) if f in addressed_formats]
+	if not matched_formats:
+		return None
+	f = matched_formats[0]()
+	try:
+		f.read(file_path)
+	except ImportError as e:
+		print(e)
+		sys.exit(3)
+	return f
 
-	def program_flash(self, filename):
-		if self.part is None:
-			raise SessionError('Part not set.')
-
-		file_format = self._get_file_processor(filename)
-		file_data   = file_format.read(filename)
-
-		self.part.program_flash(self.samba, data=file_data)
-
-
-	def verify_flash(self, filename):
-		if self.part is None:
-			raise SessionError('Part not set.')
-
-		file_format = self._get_file_processor(filename)
-		file_data   = file_format.read(filename)
-
-		verify_failure = self.part.verify_flash(self.samba, data=file_data)
-		if verify_failure is not None:
-			raise SessionError('Verification failure @ 0x%08x: 0x%08x != 0x%08x' % verify_failure)
 
+def read_from_file(file_path):
+	f = read_addressed_file(file_path)
+	if f is not None:
+		logging.info('Was readed 0x{0:X} ({0}) byte(s): 0x{1:X}..{2:X}'.format(len(f.data), f.address or 0, (f.address or 0) + len(f.data) - 1))
+		return f.data
+	logging.info('Read from binary file "{0}"'.format(file_path))
+	f = SAMBALoader.FileFormatLibrary.get_format('bin')()
+	f.read(file_path)
+	logging.info('Was readed 0x{0:X} ({0}) byte(s)'.format(len(f.data)))
+	return f.data
 
-def dump_buff(buff):
-	for i in xrange(0, len(buff), 16):
-		buff2 = ''
-		for ii in xrange(16):
-			buff2 += '{:02X} '.format(buff[i+ii])
-		print('{:08X} {}'.format(i, buff2))
 
+def read_regions_map(file_path):
+	"""Reads a map of memory regions to dump: one `[NAME] ADDRESS LENGTH`
+	   line per region, `#` starts a comment.
 
-def save_to_file(file_path, buff):
-	logging.info('Save 0x{0:X} ({0}) byte(s) to binary file "{1}"'.format(len(buff), file_path))
-	f = BinFormat()
-	f.data = buff
-	f.write(file_path)
+	Returns:
+		List of (name, address, length) tuples.
+	"""
+	regions = []
+	with open(file_path) as f:
+		for line_number, line in enumerate(f, 1):
+			words = line.split('#', 1)[0].split()
+			if not words:
+				continue
+			try:
+				if len(words) == 2:
+					address, length = parse_number(words[0]), parse_number(words[1])
+					name = '0x{:08X}'.format(address)
+				elif len(words) == 3:
+					name, address, length = words[0], parse_number(words[1]), parse_number(words[2])
+				else:
+					raise ValueError()
+			except ValueError:
+				print('Regions map line {}: expected [NAME] ADDRESS LENGTH: {}'.format(line_number, line.strip()))
+				sys.exit(2)
+			regions.append((name, address, length))
+	return regions
+
+
+def save_regions(file_path, part_name, regions):
+	"""Saves dumped regions to a JSON file (or stdout if `None`)."""
+	import json
+	dump = {
+		'part' : part_name,
+		'regions' : [
+			{ 'name' : name, 'address' : '0x{:08X}'.format(address), 'length' : len(data), 'data' : bytes(data).hex() }
+			for name, address, data in regions
+		],
+	}
+	text = json.dumps(dump, indent='\t') + '\n'
+	if file_path:
+		logging.info('Save {} region(s) to "{}"'.format(len(regions), file_path))
+		with open(file_path, 'w') as f:
+			f.write(text)
+	else:
+		sys.stdout.write(text)
 
 
-def read_from_file(file_path):
-	if file_path.lower().endswith('.hex'):
+def compile_plan(args):
+	"""Compiles the images of the `plan` command for the part given with
+	   --part, without a device.
+	"""
+	if not args.part:
+		print('Part required to compile a plan: use --part NAME (see parts)')
+		sys.exit(2)
+	try:
+		part = SAMBALoader.Plan.ProgrammingPlan.get_offline_part(args.part)
+		with Profiler.phase('file parse'):
+			images = read_images(args.f, part.flash_address_range.start if hasattr(part, 'flash_address_range') else part.FLASH_APP_ADDRESS)
+		plan = SAMBALoader.Plan.ProgrammingPlan.compile(part, images, args.erase, get_plan_sources(args.f))
+	except SAMBALoader.Plan.PlanError as e:
+		print(e)
+		sys.exit(2)
+	plan.save(args.output)
+	print(plan)
+
+
+def get_plan_sources(specs):
+	return SAMBALoader.Plan.ProgrammingPlan.get_sources([parse_image_spec(spec) for spec in specs])
+
+
+def get_plan(session, args):
+	"""Loads the plan of `write --plan`. With -f, the plan is a cache of the
+	   files: it is compiled again, and saved, if it is missing or out of
+	   date.
+
+	Returns:
+		`ProgrammingPlan` instance.
+	"""
+	ProgrammingPlan = SAMBALoader.Plan.ProgrammingPlan
+	plan = None
+	try:
+		if os.path.exists(args.plan) or not args.f:
+			plan = ProgrammingPlan.load(args.plan)
+	except (SAMBALoader.Plan.PlanError, IOError, ValueError) as e:
+		if not args.f:
+			print('Cannot load plan: %s' % e)
+			sys.exit(2)
+	if args.f:
+		sources = get_plan_sources(args.f)
+		if plan is None or not plan.is_current(session.part, sources):
+			with Profiler.phase('file parse'):
+				images = read_images(args.f, session.get_flash_start())
+			plan = ProgrammingPlan.compile(session.part, images, plan is not None and plan.strategy == ProgrammingPlan.STRATEGY_ERASE, sources)
+			plan.save(args.plan)
+	return plan
+
+
+def parse_image_spec(text):
+	"""Splits a FILE_PATH[@ADDRESS] write argument.
+
+	Returns:
+		Tuple of (file path, address or `None`).
+	"""
+	if '@' in text:
+		file_path, address = text.rsplit('@', 1)
 		try:
-			from intelhex import IntelHex
-		except ImportError:
-			print('To open HEX files install IntelHex library:\npip install IntelHex\npip3 install IntelHex')
-			sys.exit(3)
-		ih = IntelHex()
-		ih.loadhex(file_path)
-		logging.info('Was readed 0x{0:X} ({0}) byte(s): 0x{1:X}..{2:X}'.format(ih.maxaddr() - ih.minaddr() + 1, ih.minaddr(), ih.maxaddr()))
-		return bytearray(ih.gets(ih.minaddr(), ih.maxaddr() - ih.minaddr() + 1))
-	logging.info('Read from binary file "{0}"'.format(file_path))
-	f = BinFormat()
-	f.read(file_path)
-	logging.info('Was readed 0x{0:X} ({0}) byte(s)'.format(len(f.data)))
-	return f.data
+			return file_path, parse_number(address)
+		except ValueError:
+			pass
+	return text, None
+
+
+def read_images(specs, default_address=None):
+	"""Reads the images of a multi-image write or verify; binary files
+	   without @ADDRESS are placed at `default_address` if given.
+
+	Returns:
+		List of (address, data, name) tuples.
+	"""
+	images = []
+	for spec in specs:
+		file_path, address = parse_image_spec(spec)
+		f = read_addressed_file(file_path)
+		if f is not None:
+			if address is not None:
+				print('{} file "{}" carries its own addresses, remove @ADDRESS'.format(f.get_name(), file_path))
+				sys.exit(2)
+			for segment_address, segment_data in f.get_segments():
+				images.append((segment_address, segment_data, file_path))
+		else:
+			if address is None:
+				address = default_address
+			if address is None:
+				print('Address of "{}" required: use -f FILE_PATH@ADDRESS'.format(file_path))
+				sys.exit(2)
+			images.append((address, read_from_file(file_path), file_path))
+	return images
 
 
-def args_parse():
+def build_parser():
 	parser = argparse.ArgumentParser(
 		description='Atmel SAM-BA client tool',
 		epilog='Copyright (C) Dean Camera, 2016. Victoria Danchenko, 2019.')
@@ -145,10 +312,27 @@ def args_parse():
 	parser.add_argument('-p', '--port', \
 		default='1' if sys.platform.startswith('win') else '0', \
 		help='port; example: '+('1 or COM1' if sys.platform.startswith('win') else '0, ttyACM0, /dev/ttyACM0'))
+	parser.add_argument('--uart', action='store_true', help='device is connected to UART (XMODEM transfers), not USB')
+	parser.add_argument('--baud', type=int, default=115200, help='UART baud rate; default: 115200')
+	parser.add_argument('--xmodem-1k', action='store_true', help='use XMODEM-1K blocks in UART mode when supported by the device')
+	parser.add_argument('--segment-size', metavar='DEC_HEX', help='read block segment size; default: auto. Example: 0x1000 or 4k')
 	parser.add_argument('--autoconnect', action='store_true', help='autoconnect to device, see --autoconnect-vidpid')
 	parser.add_argument('--autoconnect-vidpid', metavar='VID:PID', default='03eb:6124', help='VendorID:ProductID; default: 03eb:6124')
+	parser.add_argument('--station', action='store_true', \
+		help='with --autoconnect: run the command on every device connected, one after another, until interrupted')
 	parser.add_argument('--addresses', metavar='NAME=ADDRESS,..', \
 		help='special identifier register addresses; example: CPUID=0xE000ED00,CHIPID=0x400E0740')
+	parser.add_argument('--part', metavar='NAME', help='part attached, skips identification; example: ATSAM4SD16C (see parts)')
+	parser.add_argument('--no-id-cache', action='store_true', help='do not use the cached identification of the device')
+	parser.add_argument('--socket', metavar='PATH', \
+		help='SAM-BA daemon socket; default: $SAMBALOADER_SOCKET or sambaloader-UID.sock in $XDG_RUNTIME_DIR')
+	parser.add_argument('--no-daemon', action='store_true', help='do not use a running SAM-BA daemon')
+	parser.add_argument('--progress', choices=('bar', 'json', 'none'), \
+		help='progress of long operations on stderr: bar, JSON events or none; default: bar on a terminal')
+	parser.add_argument('--profile', action='store_true', \
+		help='report the time, round trips and bytes of each phase of the run on stderr (not through the SAM-BA daemon)')
+	parser.add_argument('--profile-trace', metavar='FILE_PATH', \
+		help='save the profiled phases as a Chrome trace JSON file (chrome://tracing, Perfetto); implies --profile')
 	parser.add_argument('--flash-boot', action='store_true', help='make boot from flash when work was done')
 	parser.add_argument('--reset', action='store_true', help='reset chip when work was done')
 	subparsers = parser.add_subparsers(dest='cmd', help='sub-command help')
@@ -161,16 +345,45 @@ def args_parse():
 		help='length. Default: all flash. Example: 0x100 or 256 or 1k or 1M')
 	parser_read.add_argument('-f', '--file', metavar='FILE_PATH', \
 		help='file to read to. Default: stdout. Example: {}1.bin'.format('C:\\' if sys.platform.startswith('win') else '~/'))
+	parser_read.add_argument('--format', choices=[f[1] for f in SAMBALoader.FileFormatLibrary.SUPPORTED_FORMATS], \
+		help='output format. Default: by file extension, or bin')
+	parser_dump = subparsers.add_parser('dump', help='Read several memory regions to one JSON file')
+	parser_dump.add_argument('--regions', required=True, metavar='MAP_PATH', \
+		help='regions map file, one "[NAME] ADDRESS LENGTH" line per region. Example: SRAM 0x20000000 4k')
+	parser_dump.add_argument('--gap', metavar='DEC_HEX', default='256', \
+		help='largest gap between regions read together; default: 256. Use 0 around registers with read side effects')
+	parser_dump.add_argument('-f', '--file', metavar='FILE_PATH', help='JSON file to dump to. Default: stdout')
 	parser_write = subparsers.add_parser('write', help='Write to the chip')
 	parser_write.add_argument('-a', metavar='DEC_HEX', \
 		help='start address. Default: flash start. Example: 0x400000 or 4M')
 	parser_write.add_argument('-l', metavar='DEC_HEX', help='length. Example: 0x100 or 256 or 1k or 1M')
-	parser_write.add_argument('-f', required=True, metavar='FILE_PATH', \
-		help='file to write from, explicit. Example: {0}1.bin or {0}1.hex'.format('C:\\' if sys.platform.startswith('win') else '~/'))
+	parser_write.add_argument('-f', action='append', metavar='FILE_PATH[@ADDRESS]', \
+		help='file to write from, explicit; repeat to write several images in one job, '
+			'each .bin file at its @ADDRESS. Example: {0}1.bin or {0}1.hex or -f {0}boot.bin@0x400000 -f {0}app.hex'.format('C:\\' if sys.platform.startswith('win') else '~/'))
+	parser_write.add_argument('--resume', action='store_true', \
+		help='resume an interrupted write from its journal (FILE_PATH.journal)')
+	parser_write.add_argument('--compress', choices=COMPRESS_MODES, default='off', \
+		help='send the pages LZ4 compressed to a stub in SRAM (SAM3/SAM4): on, or auto where estimated faster from the link speed and compression ratio; default: off')
+	parser_write.add_argument('--plan', metavar='PLAN_PATH', \
+		help='write a plan compiled with "plan"; with -f, the plan is a cache of the files, compiled again when they or the part geometry change')
+	parser_verify = subparsers.add_parser('verify', help='Verify the chip against images')
+	parser_verify.add_argument('-f', required=True, action='append', metavar='FILE_PATH[@ADDRESS]', \
+		help='image to verify; repeat to verify several images, .bin files without @ADDRESS at flash start')
+	parser_verify.add_argument('--mismatches', type=int, default=10, metavar='N', help='number of mismatches to report; default: 10')
+	parser_plan = subparsers.add_parser('plan', help='Compile images for a part (--part) into a plan for "write --plan"')
+	parser_plan.add_argument('-f', required=True, action='append', metavar='FILE_PATH[@ADDRESS]', \
+		help='image to compile; repeat for several images, .bin files without @ADDRESS at flash start')
+	parser_plan.add_argument('-o', '--output', required=True, metavar='PLAN_PATH', help='plan file to write')
+	parser_plan.add_argument('--erase', action='store_true', \
+		help='erase the flash planes holding the images first, then write their non-blank pages only')
 	parser_read = subparsers.add_parser('erase', help='Erase flash plane or entire chip')
 	parser_read.add_argument('-a', metavar='DEC_HEX', \
 		help='flash plane address. Default: entire chip. Example: 0x400000 or 4M')
-	return parser.parse_args()
+	parser_serve = subparsers.add_parser('serve', help='Run the SAM-BA daemon, keeping device sessions open for other invocations')
+	parser_run = subparsers.add_parser('run', help='Run a script of commands over one connection')
+	parser_run.add_argument('script', nargs='?', default='-', metavar='SCRIPT', \
+		help='script file, one command per line: {}, flash-boot or reset. Default: stdin'.format(', '.join(SCRIPT_COMMANDS)))
+	return parser
 
 
 def parse_number(text):
@@ -203,26 +416,254 @@ def number_to_text(number):
 			return str(number / multiplier) + suffix
 
 
+def get_addresses(args):
+	"""Parses the special identifier register addresses given in command line.
+
+	Returns:
+		Dict: { REGISTER_NAME : REGISTER_ADDRESS, }, or `None` for defaults.
+	"""
+	if not args.addresses:
+		# use default special registers addresses
+		return None
+	# overwrite default special registers addresses (for one or more registers)
+	addresses = {}
+	for register_and_address in args.addresses.split(','):
+		register_name, register_address = register_and_address.split('=')
+		addresses[register_name] = parse_number(register_address)
+	return addresses
+
+
+def open_session(args):
+	"""Opens a session with the device, through the SAM-BA daemon if it is
+	   running, or directly otherwise.
+	"""
+	options = dict(is_usb=not args.uart, baud=args.baud, xmodem_1k=args.xmodem_1k,
+		read_segment_size=parse_number(args.segment_size), use_id_cache=not args.no_id_cache)
+	if args.cmd in DAEMON_COMMANDS and not args.no_daemon and not args.profile and not getattr(args, 'plan', None) \
+			and not get_compress(args) \
+			and SAMBALoader.Daemon.Client.is_running(args.socket):
+		logging.info('Using SAM-BA daemon: {}'.format(args.socket))
+		return SAMBALoader.Daemon.RemoteSession(SAMBALoader.Daemon.Client(args.socket), args.port, **options)
+	return Session.connect(args.port, **options)
+
+
+def parse_script(parser, args, lines):
+	"""Parses the steps of a `run` script; the global options of the
+	   command line apply to every step.
+
+	Returns:
+		List of (line, step args) tuples.
+	"""
+	steps = []
+	for line_number, line in enumerate(lines, 1):
+		words = shlex.split(line, comments=True)
+		if not words:
+			continue
+		if words[0] in ('flash-boot', 'reset') and len(words) == 1:
+			step_args = argparse.Namespace(**vars(args))
+			step_args.cmd = words[0]
+		elif words[0] in SCRIPT_COMMANDS:
+			try:
+				step_args = parser.parse_args(words, namespace=argparse.Namespace(**vars(args)))
+			except SystemExit:
+				print('Script line {}: invalid command: {}'.format(line_number, line.strip()))
+				sys.exit(2)
+		else:
+			print('Script line {}: unknown command: {}'.format(line_number, line.strip()))
+			sys.exit(2)
+		steps.append((line.strip(), step_args))
+	return steps
+
+
+def run_script(session, args, steps):
+	"""Executes the steps of a `run` script one after another in the
+	   session, stopping at the first failure. The time of each step is
+	   reported on stderr.
+	"""
+	identify(session, args)
+	start_timestamp = time.time()
+	for i, (line, step_args) in enumerate(steps, 1):
+		step_timestamp = time.time()
+		try:
+			execute_command(session, step_args)
+		except SystemExit:
+			report_step(i, len(steps), line, step_timestamp, 'FAIL')
+			raise
+		except Exception as e:
+			report_step(i, len(steps), line, step_timestamp, 'FAIL')
+			print(e)
+			sys.exit(2)
+		report_step(i, len(steps), line, step_timestamp, 'OK')
+	sys.stderr.write('{} steps done in {:.3f}s\n'.format(len(steps), time.time() - start_timestamp))
+
+	if args.flash_boot:
+		session.set_flash_boot()
+
+	if args.reset:
+		session.reset()
+
+
+def run_station(args, watcher, work):
+	"""Runs the work on every device connected, one after another, until
+	   interrupted. A failure only ends the work on its device; the result of
+	   each device is reported on stderr.
+
+	Args:
+		args    -- Command line arguments.
+		watcher -- `HotplugWatcher` of the devices.
+		work    -- Function `work(session)` run for each device.
+	"""
+	count = 0
+	failed = 0
+	try:
+		while True:
+			args.port = watcher.wait()
+			count += 1
+			start_timestamp = time.time()
+			status = 'OK'
+			try:
+				work(open_session(args))
+			except SystemExit as e:
+				if e.code:
+					status = 'FAIL'
+			except Exception as e:
+				logging.error(str(e) or type(e).__name__)
+				status = 'FAIL'
+			if status != 'OK':
+				failed += 1
+			sys.stderr.write('[{}] {:<20} {:8.3f}s {}\n'.format(count, args.port, time.time() - start_timestamp, status))
+	except KeyboardInterrupt:
+		pass
+	sys.stderr.write('{} device(s), {} failed\n'.format(count, failed))
+
+
+def report_step(index, count, line, start_timestamp, status):
+	sys.stderr.write('[{}/{}] {:<40} {:8.3f}s {}\n'.format(index, count, line, time.time() - start_timestamp, status))
+
+
+def identify(session, args):
+	"""Identifies the device attached to the session."""
+	logging.info('SAMBA Version: %s' % session.get_version())
+
+	# chip recognition by their identifiers
+	part_name = session.identify(get_addresses(args), args.part)
+	if args.cmd == 'info' or args.v > 0:
+		print('Chip identifiers')
+		print(session.get_chip_ids_info())
+		print('Discovered Part: %s' % part_name)
+	if not session.is_part_tested():
+		logging.warning('Selected part is currently untested')
+
+
+def run_command(session, args):
+	"""Executes the command line command in the session."""
+	identify(session, args)
+	execute_command(session, args)
+
+	if args.flash_boot:
+		session.set_flash_boot()
+
+	if args.reset:
+		session.reset()
+
+
+def execute_command(session, args):
+	"""Executes a single command in the session of an identified device."""
+	if args.cmd == 'info':
+		print(session.get_info())
+
+	elif args.cmd == 'read':
+		if not args.a and not args.l:
+			logging.info('Read all flash data')
+		save_to_file(args.file, read_chunks(session, parse_number(args.a), parse_number(args.l), get_progress(args)), get_output_format(args))
+
+	elif args.cmd == 'dump':
+		regions = session.read_regions(read_regions_map(args.regions), parse_number(args.gap))
+		save_regions(args.file, session.identify(), regions)
+
+	elif args.cmd == 'write' and args.plan:
+		plan = get_plan(session, args)
+		try:
+			result = session.execute_plan(plan, progress=get_progress(args))
+		except SAMBALoader.Plan.PlanError as e:
+			print(e)
+			sys.exit(2)
+		if not result:
+			print('Error while programming')
+			sys.exit(2)
+
+	elif args.cmd == 'write':
+		if not args.f:
+			print('Nothing to write: use -f FILE_PATH or --plan PLAN_PATH')
+			sys.exit(2)
+		journal_path = os.path.abspath(parse_image_spec(args.f[0])[0] + '.journal')
+		# a single file without @ADDRESS is written at -a, as a plain image
+		single_image = len(args.f) == 1 and parse_image_spec(args.f[0])[1] is None
+		with Profiler.phase('file parse'):
+			if single_image:
+				data = read_from_file(args.f[0])
+			else:
+				images = read_images(args.f)
+		try:
+			if single_image:
+				result = session.write_flash(data, parse_number(args.a), journal_path, args.resume, progress=get_progress(args), **get_compress(args))
+			else:
+				result = session.program_images(images, journal_path, args.resume, progress=get_progress(args), **get_compress(args))
+		except SAMBALoader.Transports.TimeoutError:
+			port_info = str(session)
+			print('Error while programming{}:'.format(' ({})'.format(port_info) if port_info else ''))
+			print('Timeout happened')
+			print('Use "write --resume" to continue')
+			sys.exit(1)
+		except Exception as e:
+			port_info = str(session)
+			print('Error while programming{}:'.format(' ({})'.format(port_info) if port_info else ''))
+			print(e)
+			print('Use "write --resume" to continue')
+			sys.exit(2)
+		if not result:
+			print('Error while programming')
+			sys.exit(2)
+
+	elif args.cmd == 'verify':
+		with Profiler.phase('file parse'):
+			images = read_images(args.f, session.get_flash_start())
+		result = session.verify_images(images, args.mismatches, progress=get_progress(args))
+		rate = result['length'] / result['elapsed'] / 1024 if result['elapsed'] else 0
+		print('Verify {}: 0x{:X} ({}) byte(s) in {:.3f}s, {:.1f} KB/s, {} byte(s) by checksum'.format(
+			'FAIL' if result['mismatches'] else 'OK', result['length'], result['length'], result['elapsed'], rate, result['checksummed']))
+		for address, expected, actual in result['mismatches']:
+			print('  0x{:08X}: expected 0x{:02X}, read {}'.format(address, expected, 'nothing' if actual is None else '0x{:02X}'.format(actual)))
+		if result['mismatches']:
+			sys.exit(2)
+
+	elif args.cmd == 'erase':
+		session.erase_chip(parse_number(args.a), progress=get_progress(args))
+
+	elif args.cmd == 'flash-boot':
+		session.set_flash_boot()
+
+	elif args.cmd == 'reset':
+		session.reset()
+
+
 if __name__ == '__main__':
 	# logging.basicConfig(level=logging.WARNING)
-	args = args_parse()
+	parser = build_parser()
+	args = parser.parse_args()
 	logging.basicConfig(level=[ logging.WARNING, logging.INFO, logging.DEBUG ][min(args.v, 2)])
 	logging.info('START ' + datetime.now().isoformat())
 
+	if args.station and not args.autoconnect:
+		parser.error('--station requires --autoconnect')
+
+	watcher = None
 	if args.autoconnect:
-		import time
-		import serial.tools.list_ports
-		def autoconnect():
-			'Waits until USB device connected'
-			vid, pid = [ int(x, 16) for x in args.autoconnect_vidpid.split(':') ]
-			while True:
-				for p in serial.tools.list_ports.comports():
-					if vid == p.vid and pid == p.pid:
-						args.port = p.device
-						logging.info('Found USB: {:04X}:{:04X} {}'.format(p.vid, p.pid, p.device))
-						return
-				time.sleep(.5)
-		autoconnect()
+		vid, pid = [ int(x, 16) for x in args.autoconnect_vidpid.split(':') ]
+		watcher = SAMBALoader.Hotplug.HotplugWatcher(vid, pid)
+		if not args.station:
+			# waits until USB device connected
+			args.port = watcher.wait()
 	else:
 		if sys.platform.startswith('win'):
 			if is_int(args.port):
@@ -235,6 +676,12 @@ if __name__ == '__main__':
 	# print(args)
 	# sys.exit(0)
 
+	profiler = None
+	if args.profile or args.profile_trace:
+		args.profile = True
+		profiler = Profiler()
+		profiler.start()
+
 	try:
 		if args.cmd == 'parts':
 			print('Supported parts:')
@@ -245,88 +692,32 @@ if __name__ == '__main__':
 					parts_names.append(name)
 			for i, v in enumerate(sorted(parts_names)):
 				print('{:02} {}'.format(i + 1, v))
-		else:
+		elif args.cmd == 'plan':
+			compile_plan(args)
+		elif args.cmd == 'serve':
 			try:
-				transport = SAMBALoader.Transports.Serial(port=args.port)
-			except Exception as e:
-				print(e)
-				sys.exit(2)
-			samba = SAMBALoader.SAMBA(transport, is_usb=True)
-			session = Session(samba)
-
-			logging.info('SAMBA Version: %s' % samba.get_version())
-
-			# chip recognition by their identifiers
-			# read a special registers from chip
-			if args.addresses:
-				# overwrite default special registers addresses (for one or more registers)
-				addresses = {}
-				for register_and_address in args.addresses.split(','):
-					register_name, register_address = register_and_address.split('=')
-					addresses[register_name] = parse_number(register_address)
-			else:
-				# use default special registers addresses
-				addresses = None
-			chip_ids = session.get_part_identifiers(addresses)
-			if args.cmd == 'info' or args.v > 0:
-				print('Chip identifiers')
-				for k, v in chip_ids.items():
-					print(v)
-			# find the part by special registers values
-			part = session.set_part_by_chip_ids(chip_ids)
-			if args.cmd == 'info' or args.v > 0:
-				print('Discovered Part: %s' % part.get_name())
-			if not part.is_tested():
-				logging.warning('Selected part is currently untested')
-
-			if args.cmd == 'info':
-				print(part.get_info())
-
-			elif args.cmd == 'read':
-				if not args.a and not args.l:
-					logging.info('Read all flash data')
-				buff = part.read_flash(parse_number(args.a), parse_number(args.l))
-				if args.file:
-					save_to_file(args.file, buff)
+				SAMBALoader.Daemon.Server(args.socket).serve_forever()
+			except KeyboardInterrupt:
+				pass
+		else:
+			if args.cmd == 'run':
+				if args.script == '-':
+					steps = parse_script(parser, args, sys.stdin.readlines())
 				else:
-					sys.stdout.buffer.write(buff)
-
-			elif args.cmd == 'write':
-				data = read_from_file(args.f)
+					with open(args.script) as f:
+						steps = parse_script(parser, args, f.readlines())
+				work = lambda session: run_script(session, args, steps)
+			else:
+				work = lambda session: run_command(session, args)
+			if args.station:
+				run_station(args, watcher, work)
+			else:
 				try:
-					result = part.program_flash(data, parse_number(args.a))
-				except SAMBALoader.Transports.TimeoutError:
-					try:
-						port_info = str(samba.transport)
-					except:
-						port_info = ''
-					else:
-						port_info = ' ({})'.format(port_info)
-					print('Error while programming{}:'.format(port_info))
-					print('Timeout happened'.format(port_info))
-					sys.exit(1)
+					session = open_session(args)
 				except Exception as e:
-					try:
-						port_info = str(samba.transport)
-					except:
-						port_info = ''
-					else:
-						port_info = ' ({})'.format(port_info)
-					print('Error while programming{}:'.format(port_info))
 					print(e)
 					sys.exit(2)
-				if not result:
-					print('Error while programming')
-					sys.exit(2)
-
-			elif args.cmd == 'erase':
-				part.erase_chip(parse_number(args.a))
-
-			if args.flash_boot:
-				part.set_flash_boot()
-
-			if args.reset:
-				part.reset()
+				work(session)
 
 	except SAMBALoader.Transports.TimeoutError:
 		logging.error('Timeout while waiting for data.')
@@ -335,3 +726,11 @@ if __name__ == '__main__':
 	except SessionError as e:
 		logging.error(str(e))
 		sys.exit(1)
+
+	finally:
+		if profiler:
+			profiler.stop()
+			sys.stderr.write(str(profiler) + '\n')
+			if args.profile_trace:
+				profiler.save_trace(args.profile_trace)
+				logging.info('Save profile trace to "{}"'.format(args.profile_trace))
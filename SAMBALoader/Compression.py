@@ -0,0 +1,496 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Compressed upload: flash pages are sent LZ4 compressed into SRAM, where a
+# small stub decompresses and programs them, so that the link carries the
+# compressed image rather than one write command per word.
+
+import logging
+import struct
+from time import time, sleep
+
+from . import Transports
+from .Profiler import Profiler
+
+
+class UploadError(Exception):
+	pass
+
+
+MIN_MATCH  = 4
+MAX_OFFSET = 0xFFFF
+
+
+def _write_length(out, length):
+	while length >= 255:
+		out.append(255)
+		length -= 255
+	out.append(length)
+
+
+def lz4_compress(data):
+	"""Compresses data into a LZ4 block (greedy matching). The last sequence
+	   may end with a match, which the standard LZ4 decoder does not accept;
+	   the upload stub does.
+
+	Args:
+		data -- Data to compress.
+
+	Returns:
+		Compressed data, as a bytearray.
+	"""
+
+	data = bytes(data)
+	length = len(data)
+	out = bytearray()
+	table = {}
+	anchor = 0
+	position = 0
+	misses = 0
+	while position + MIN_MATCH <= length:
+		key = data[position : position + MIN_MATCH]
+		candidate = table.get(key)
+		table[key] = position
+		if candidate is None or position - candidate > MAX_OFFSET:
+			# skip ahead faster through data that does not compress
+			misses += 1
+			position += 1 + (misses >> 6)
+			continue
+		misses = 0
+
+		end = position + MIN_MATCH
+		source = candidate + MIN_MATCH
+		while end + 64 <= length and data[end : end + 64] == data[source : source + 64]:
+			end += 64
+			source += 64
+		while end < length and data[end] == data[source]:
+			end += 1
+			source += 1
+
+		literals = position - anchor
+		match_length = end - position - MIN_MATCH
+		out.append(min(literals, 15) << 4 | min(match_length, 15))
+		if literals >= 15:
+			_write_length(out, literals - 15)
+		out += data[anchor : position]
+		out += struct.pack('<H', position - candidate)
+		if match_length >= 15:
+			_write_length(out, match_length - 15)
+		anchor = position = end
+
+	if anchor < length:
+		literals = length - anchor
+		out.append(min(literals, 15) << 4)
+		if literals >= 15:
+			_write_length(out, literals - 15)
+		out += data[anchor : ]
+	return out
+
+
+class CompressedUpload(object):
+	"""Programs flash pages of an EEFC part through a stub loaded in SRAM. The
+	   pages are sent in batches, each LZ4 compressed with `lz4_compress` and
+	   written to SRAM with `SAMBA.write_block`; the stub, started with
+	   `SAMBA.run_from_address`, decompresses the batch, then fills the page
+	   latch, issues the erase and write page command (or write page, for
+	   pages known to be erased) and compares the page with the decompressed
+	   data, for each page in turn.
+
+	   The SRAM area of the stub is given by the part (`APPLET_ADDRESS` and
+	   `APPLET_LENGTH`): the stub, as a vector table (stack pointer, entry
+	   point) followed by its code and mailbox, the compressed batch, the
+	   decompressed batch, and the stub stack at the end.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	# Thumb-2 machine code of the stub (252 bytes), assembled from:
+	#
+	#  vector:        .word 0, 0               @ stack pointer, entry point
+	#  entry:         push   {r4-r11, lr}
+	#                 adr    r7, mailbox
+	#                 ldr    r0, [r7, #4]      @ compressed data
+	#                 ldr    r1, [r7, #8]      @ compressed length
+	#                 add    r1, r0
+	#                 ldr    r2, [r7, #12]     @ decompressed data
+	#                 mov    r6, r2
+	#  next_sequence: cmp    r0, r1
+	#                 bhs    decoded
+	#                 ldrb   r3, [r0], #1      @ token
+	#                 lsrs   r4, r3, #4
+	#                 cmp    r4, #15
+	#                 bne    literals
+	#  literal_length:ldrb   r5, [r0], #1
+	#                 add    r4, r5
+	#                 cmp    r5, #255
+	#                 beq    literal_length
+	#  literals:      cbz    r4, literals_done
+	#  copy_literal:  ldrb   r5, [r0], #1
+	#                 strb   r5, [r2], #1
+	#                 subs   r4, #1
+	#                 bne    copy_literal
+	#  literals_done: cmp    r0, r1
+	#                 bhs    decoded
+	#                 ldrb   r4, [r0], #1      @ match offset
+	#                 ldrb   r5, [r0], #1
+	#                 orr    r4, r4, r5, lsl #8
+	#                 sub    r5, r2, r4
+	#                 and    r3, r3, #15
+	#                 cmp    r3, #15
+	#                 bne    match
+	#  match_length:  ldrb   r4, [r0], #1
+	#                 add    r3, r4
+	#                 cmp    r4, #255
+	#                 beq    match_length
+	#  match:         adds   r3, #4
+	#  copy_match:    ldrb   r4, [r5], #1
+	#                 strb   r4, [r2], #1
+	#                 subs   r3, #1
+	#                 bne    copy_match
+	#                 b      next_sequence
+	#  decoded:       ldr    r11, [r7, #20]    @ pages
+	#                 ldr    r4, [r7, #24]     @ page size
+	#                 mul    r5, r11, r4
+	#                 sub    r0, r2, r6
+	#                 cmp    r0, r5
+	#                 bne    decode_error
+	#                 ldr    r8, [r7, #16]     @ flash address
+	#                 ldr    r9, [r7, #28]     @ EEFC registers
+	#                 ldr    r10, [r7, #32]    @ EEFC_FCR value of the first page
+	#                 mov    r2, r6
+	#  next_page:     mov    r0, r8
+	#                 mov    r1, r2
+	#                 mov    r3, r4
+	#  fill_latch:    ldr    r5, [r1], #4
+	#                 str    r5, [r0], #4
+	#                 subs   r3, #4
+	#                 bne    fill_latch
+	#                 str    r10, [r9, #4]     @ EEFC_FCR
+	#  busy:          ldr    r5, [r9, #8]      @ EEFC_FSR
+	#                 tst    r5, #1
+	#                 beq    busy
+	#                 tst    r5, #14
+	#                 bne    flash_error
+	#                 mov    r0, r8
+	#                 mov    r1, r2
+	#                 mov    r3, r4
+	#  check_page:    ldr    r5, [r0], #4
+	#                 ldr    r12, [r1], #4
+	#                 cmp    r5, r12
+	#                 bne    verify_error
+	#                 subs   r3, #4
+	#                 bne    check_page
+	#                 add    r8, r4
+	#                 add    r2, r4
+	#                 add    r10, r10, #256
+	#                 subs   r11, #1
+	#                 bne    next_page
+	#                 movs   r0, #0
+	#  done:          str    r0, [r7]          @ status
+	#                 pop    {r4-r11, pc}
+	#  decode_error:  str    r0, [r7, #36]
+	#                 movs   r0, #1
+	#                 b      done
+	#  flash_error:   str    r5, [r7, #36]
+	#                 movs   r0, #2
+	#                 b      done
+	#  verify_error:  subs   r0, #4
+	#                 str    r0, [r7, #36]
+	#                 movs   r0, #3
+	#                 b      done
+	#                 .balign 4
+	#  mailbox:
+	STUB = bytes(bytearray.fromhex(
+		'00000000000000002de9f04f3ba77868'
+		'b9680144fa68164688422bd210f8013b'
+		'1c090f2c04d110f8015b2c44ff2dfad0'
+		'2cb110f8015b02f8015b013cf9d18842'
+		'18d210f8014b10f8015b44ea0524a2eb'
+		'040503f00f030f2b04d110f8014b2344'
+		'ff2cfad0043315f8014b02f8014b013b'
+		'f9d1d1e7d7f814b0bc690bfb04f5a2eb'
+		'0600a8422fd1d7f81080d7f81c90d7f8'
+		'20a0324640461146234651f8045b40f8'
+		'045b043bf9d1c9f804a0d9f8085015f0'
+		'010ffad015f00e0f18d1404611462346'
+		'50f8045b51f804cb654512d1043bf7d1'
+		'a04422440af5807abbf1010bdad10020'
+		'3860bde8f08f78620120f9e77d620220'
+		'f6e7043878620320f2e700bf'))
+	STUB_ENTRY = 0x08
+
+	# Mailbox words, after the stub code
+	MAILBOX_STATUS        = 0x00
+	MAILBOX_SOURCE        = 0x04
+	MAILBOX_SOURCE_LENGTH = 0x08
+	MAILBOX_BUFFER        = 0x0C
+	MAILBOX_FLASH_ADDRESS = 0x10
+	MAILBOX_PAGES         = 0x14
+	MAILBOX_PAGE_SIZE     = 0x18
+	MAILBOX_EEFC          = 0x1C
+	MAILBOX_COMMAND       = 0x20
+	MAILBOX_RESULT        = 0x24
+	MAILBOX_LENGTH        = 0x28
+
+	STATUS_RUNNING      = 0xFFFFFFFF
+	STATUS_MESSAGES     = {
+		1 : 'decompressed length mismatch: {:d} bytes',
+		2 : 'flash command error, EEFC_FSR: 0x{:08X}',
+		3 : 'page verify error @ 0x{:08X}',
+	}
+
+	STUB_AREA   = 0x200
+	STACK_SIZE  = 0x100
+	BATCH_SIZE  = 8 * 1024 # bytes of flash pages per batch
+
+	# Link cost model of the auto decision: a page programmed the usual way
+	# is read to compare it, its latch filled with one "W" command (20
+	# bytes) per word, and read again to verify it
+	PLAIN_BYTES_PER_BYTE  = 2 + 20 / 4.
+	PLAIN_ROUND_TRIPS     = 4 # per page
+	BATCH_ROUND_TRIPS     = 4 # per batch: mailbox writes, run, status poll
+	LINK_PROBE_LENGTH     = 1024 # bytes read to measure the link rate
+
+	PAGE_PROGRAM_TIME = 0.006 # s, erase and write of a page, estimated
+	PAGE_TIMEOUT      = 0.1   # s
+	POLL_INTERVAL     = 0.005 # s
+
+
+	def __init__(self, samba, part, memory=None):
+		"""Creates a compressed upload.
+
+		Args:
+			samba  -- Core `SAMBA` instance bound to the device.
+			part   -- EEFC part, see `is_supported()`.
+			memory -- `DeviceMemory` the current contents of partially
+			          written pages are read from (optional).
+		"""
+
+		self.samba   = samba
+		self.part    = part
+		self.memory  = memory if memory is not None else samba
+		self.address = part.APPLET_ADDRESS
+		self.mailbox = self.address + len(self.STUB)
+		self.source  = self.address + self.STUB_AREA
+		self.source_length = self.BATCH_SIZE + self.BATCH_SIZE // 255 + 16
+		self.source_length += -self.source_length % 4
+		self.buffer  = self.source + self.source_length
+		self.stack   = self.address + part.APPLET_LENGTH
+		if self.buffer + self.BATCH_SIZE > self.stack - self.STACK_SIZE:
+			raise UploadError('SRAM area of the stub too small')
+		self.rate    = None
+		self.latency = None
+		self.loaded  = False
+
+
+	@staticmethod
+	def is_supported(part):
+		"""Checks whether a part can be programmed by a compressed upload."""
+
+		from .FlashControllers import EEFCFlash
+		return hasattr(part, 'APPLET_ADDRESS') and \
+			all(isinstance(c, EEFCFlash.Flash) for c in getattr(part, 'flash_controllers', ()))
+
+
+	def get_pages(self, blocks):
+		"""Splits blocks of data into whole flash pages, filled with the
+		   current flash contents around the data.
+
+		Args:
+			blocks -- List of (address, data) tuples.
+
+		Returns:
+			List of (flash controller, page address, page data, data length,
+			erased) tuples, the data length being the bytes of the blocks in
+			the page, and erased `True` if the page is known to be erased.
+		"""
+
+		is_erased = getattr(self.memory, 'is_erased', lambda address, length: False)
+		pages = []
+		for address, data in blocks:
+			offset = 0
+			while offset < len(data):
+				chunk_address = address + offset
+				flash_controller = next((c for c in self.part.flash_controllers
+					if c.flash_address_range.is_in_range(chunk_address, 1)), None)
+				if flash_controller is None:
+					raise UploadError('Data @ 0x%08X outside of the flash' % chunk_address)
+				page_size = flash_controller.flash_address_range.page_size
+				page_address = chunk_address - chunk_address % page_size
+				length = min(page_address + page_size - chunk_address, len(data) - offset)
+				shared = pages and pages[-1][1] == page_address
+				if length == page_size:
+					page = data[offset : offset + length]
+				else:
+					# a page shared by two blocks, or partly written
+					page = pages[-1][2] if shared else bytearray(self.memory.read_block(page_address, page_size))
+					page[chunk_address - page_address : chunk_address - page_address + length] = data[offset : offset + length]
+				if shared:
+					pages[-1] = pages[-1][ : 3] + (pages[-1][3] + length, pages[-1][4])
+				else:
+					pages.append((flash_controller, page_address, page, length, is_erased(page_address, page_size)))
+				offset += length
+		return pages
+
+
+	def compress(self, pages):
+		"""Groups consecutive pages into batches and compresses them. Blank
+		   pages known to be erased are skipped, and batches of erased pages
+		   are written without erasing them.
+
+		Args:
+			pages -- List of pages, see `get_pages()`.
+
+		Returns:
+			List of (flash controller, address, pages, compressed data,
+			data length, command) tuples; skipped pages are listed as
+			batches of no pages, for their progress.
+		"""
+
+		batches = []
+		run = []
+		for page in pages + [None]:
+			if run and (page is None or page[0] is not run[0][0] or page[1] != run[-1][1] + len(run[-1][2]) \
+					or page[4] != run[0][4] or len(run[-1][2]) * (len(run) + 1) > self.BATCH_SIZE):
+				data = b''.join(bytes(p[2]) for p in run)
+				batches.append((run[0][0], run[0][1], len(run), lz4_compress(data), sum(p[3] for p in run),
+					'WP' if run[0][4] else 'EWP'))
+				run = []
+			if page is not None and page[4] and page[0]._is_blank(page[2]):
+				batches.append((page[0], page[1], 0, b'', page[3], None))
+			elif page is not None:
+				run.append(page)
+		return batches
+
+
+	def measure_link(self):
+		"""Measures the link rate and latency, with a read of
+		   `LINK_PROBE_LENGTH` bytes and a word read of the SRAM.
+
+		Returns:
+			Tuple of (rate in bytes/s, round trip latency in s).
+		"""
+
+		if self.rate is None:
+			start = time()
+			self.samba.read_word(self.address)
+			self.latency = max(time() - start, 1e-6)
+			start = time()
+			self.samba.read_block(self.source, self.LINK_PROBE_LENGTH)
+			self.rate = self.LINK_PROBE_LENGTH / max(time() - start - self.latency, 1e-6)
+			self.LOG.info('Link: {:.0f} bytes/s, {:.1f} ms round trip'.format(self.rate, self.latency * 1000))
+		return (self.rate, self.latency)
+
+
+	def is_worthwhile(self, batches):
+		"""Decides whether a compressed upload of the batches is faster than
+		   programming the pages the usual way, from the measured link rate
+		   and latency and the compression ratio.
+		"""
+
+		rate, latency = self.measure_link()
+		length = sum(batch[2] * batch[0].flash_address_range.page_size for batch in batches)
+		compressed = sum(len(batch[3]) for batch in batches)
+		pages = sum(batch[2] for batch in batches)
+		batches = [batch for batch in batches if batch[2]]
+		plain_time = length * self.PLAIN_BYTES_PER_BYTE / rate + pages * self.PLAIN_ROUND_TRIPS * latency
+		upload_time = (compressed + (0 if self.loaded else len(self.STUB))) / rate + \
+			len(batches) * self.BATCH_ROUND_TRIPS * latency
+		self.LOG.info('Compressed upload: {} bytes compressed to {} ({:.1%}), estimated {:.2f}s instead of {:.2f}s'.format(
+			length, compressed, compressed / float(length) if length else 0, upload_time, plain_time))
+		return upload_time < plain_time
+
+
+	def load(self):
+		"""Loads the stub into SRAM."""
+
+		if self.loaded:
+			return
+		stub = bytearray(self.STUB)
+		stub[0 : 8] = struct.pack('<II', self.stack, self.address + self.STUB_ENTRY + 1)
+		self.samba.write_block(self.address, stub)
+		self.loaded = True
+
+
+	def run(self, batches, journal=None, progress=None):
+		"""Programs compressed batches, see `compress()`.
+
+		Args:
+			batches  -- List of batches to program.
+			journal  -- `ProgrammingJournal` the programmed pages are confirmed in (optional).
+			progress -- `Progress` advanced by each batch (optional).
+		"""
+
+		with Profiler.phase('upload'):
+			self.load()
+		for flash_controller in set(batch[0] for batch in batches):
+			flash_controller._wait_while_busy()
+
+		for flash_controller, address, pages, data, length, command in batches:
+			page_size = flash_controller.flash_address_range.page_size
+			if not pages or journal and all(journal.is_confirmed(a) for a in range(address, address + pages * page_size, page_size)):
+				if progress:
+					progress.advance(length, False)
+				continue
+
+			self.LOG.debug('Compressed upload @ 0x%08X: %d pages, %d bytes' % (address, pages, len(data)))
+			with Profiler.phase('upload'):
+				self.samba.write_block(self.source, data)
+				command = flash_controller.FCR_FKEY | ((address // page_size) & 0xFFFF) << 8 | flash_controller.FCR_CMDA[command]
+				for offset, word in ((self.MAILBOX_STATUS, self.STATUS_RUNNING), (self.MAILBOX_SOURCE, self.source),
+						(self.MAILBOX_SOURCE_LENGTH, len(data)), (self.MAILBOX_BUFFER, self.buffer),
+						(self.MAILBOX_FLASH_ADDRESS, address), (self.MAILBOX_PAGES, pages),
+						(self.MAILBOX_PAGE_SIZE, page_size), (self.MAILBOX_EEFC, flash_controller.regs_base_address),
+						(self.MAILBOX_COMMAND, command)):
+					self.samba.write_word(self.mailbox + offset, word)
+			with Profiler.phase('flash busy wait'):
+				self.samba.run_from_address(self.address)
+				status = self._wait_for_status(pages)
+			flash_controller._invalidate(self.memory, address, pages * page_size)
+			if status != 0:
+				message = self.STATUS_MESSAGES[status].format(self.samba.read_word(self.mailbox + self.MAILBOX_RESULT))
+				raise UploadError('Compressed upload @ 0x{:08X}: {}'.format(address, message))
+
+			if journal:
+				for page_address in range(address, address + pages * page_size, page_size):
+					journal.confirm(page_address)
+			if progress:
+				progress.advance(length)
+
+
+	def _wait_for_status(self, pages):
+		"""Internal helper to wait for the stub to complete a batch. The
+		   monitor does not process commands while the stub runs, and over
+		   UART the bytes sent meanwhile may be lost, so there the status is
+		   read after the estimated run time, resynchronizing on a timeout.
+
+		Returns:
+			Status of the batch.
+		"""
+
+		if not self.samba.is_usb:
+			sleep(pages * self.PAGE_PROGRAM_TIME)
+		deadline = time() + pages * self.PAGE_TIMEOUT + 1
+		while True:
+			try:
+				status = self.samba.read_word(self.mailbox + self.MAILBOX_STATUS)
+				if status == 0 or status in self.STATUS_MESSAGES:
+					return status
+				if status != self.STATUS_RUNNING:
+					# a garbled response
+					raise Transports.TimeoutError()
+			except Transports.TimeoutError:
+				if time() >= deadline:
+					raise
+				try:
+					self.samba.resync()
+				except Transports.TimeoutError:
+					pass
+			if time() >= deadline:
+				raise UploadError('Compressed upload: stub timeout')
+			sleep(self.POLL_INTERVAL)
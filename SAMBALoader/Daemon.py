@@ -0,0 +1,318 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Local SAM-BA daemon: keeps `Session` instances open per port and serves
+# session operations to clients over a Unix socket.
+
+import base64
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+
+from . import Transports
+from .Session import Session, SessionError
+
+
+def get_default_socket_path():
+	"""Retrieves the default daemon socket path for the current user.
+
+	Returns:
+		Path of the Unix socket, overridable via `SAMBALOADER_SOCKET`.
+	"""
+
+	if 'SAMBALOADER_SOCKET' in os.environ:
+		return os.environ['SAMBALOADER_SOCKET']
+	directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+	return os.path.join(directory, 'sambaloader-{}.sock'.format(os.getuid()))
+
+
+def _encode(value):
+	"""Internal helper to encode a value for the JSON protocol."""
+
+	if isinstance(value, (bytes, bytearray)):
+		return { '__bytes__' : base64.b64encode(bytes(value)).decode('ascii') }
+	elif isinstance(value, (list, tuple)):
+		return [ _encode(v) for v in value ]
+	elif isinstance(value, dict):
+		return { k : _encode(v) for k, v in value.items() }
+	return value
+
+
+def _decode(value):
+	"""Internal helper to decode a value from the JSON protocol."""
+
+	if isinstance(value, dict):
+		if '__bytes__' in value:
+			return bytearray(base64.b64decode(value['__bytes__']))
+		return { k : _decode(v) for k, v in value.items() }
+	elif isinstance(value, list):
+		return [ _decode(v) for v in value ]
+	return value
+
+
+class DaemonError(Exception):
+	pass
+
+
+class Server(object):
+	"""SAM-BA daemon server. Each port gets one `Session`, shared by all
+	   clients; operations on a session are serialized while clients of
+	   different ports are served concurrently.
+
+	   An open session is checked before each request (see
+	   `Session.check_device()`), and reopened if the device changed or the
+	   link failed, e.g. after a board was reset or replaced.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	# Session methods that clients may call
+	METHODS = (
+		'get_version',
+		'identify',
+		'get_chip_ids_info',
+		'is_part_tested',
+		'get_info',
+		'get_flash_start',
+		'read_flash',
+		'read_regions',
+		'write_flash',
+		'program_images',
+		'verify_images',
+		'erase_chip',
+		'set_flash_boot',
+		'reset',
+	)
+
+	# Failures of the link of a session, after which the port is reopened
+	LINK_ERRORS = (Transports.TimeoutError, Transports.XMODEMError, OSError)
+
+
+	def __init__(self, path=None):
+		"""Creates a daemon server.
+
+		Args:
+			path -- Unix socket path (default: `get_default_socket_path()`).
+		"""
+
+		self.path = path or get_default_socket_path()
+		self.sessions = dict()   # { port : (session, options) }
+		self.port_locks = dict() # { port : lock }
+		self.lock = threading.Lock()
+
+
+	def _get_port_lock(self, port):
+		"""Internal helper to retrieve the lock serializing the operations on
+		   a port, including opening its session.
+		"""
+
+		with self.lock:
+			return self.port_locks.setdefault(port, threading.Lock())
+
+
+	def _get_session(self, port, options):
+		"""Internal helper to retrieve the session of a port, opening it on
+		   first use, or again if its device changed or its link failed. The
+		   port lock must be held.
+
+		Returns:
+			Tuple of (session, reused): `reused` is `False` for a session just
+			opened.
+		"""
+
+		with self.lock:
+			entry = self.sessions.get(port)
+		if entry is not None:
+			session, session_options = entry
+			if session_options != options:
+				raise SessionError('Session on {} open with other options: {}'.format(port, session_options))
+			try:
+				if session.check_device():
+					return (session, True)
+				self.LOG.info('Device changed on %s' % port)
+			except self.LINK_ERRORS as e:
+				self.LOG.info('Session on %s lost: %s' % (port, e))
+			self._close_session(port)
+
+		self.LOG.info('Open session on %s' % port)
+		session = Session.connect(port, **options)
+		session.get_version()
+		with self.lock:
+			self.sessions[port] = (session, options)
+		return (session, False)
+
+
+	def _close_session(self, port):
+		"""Internal helper to drop the session of a port, so that the next
+		   request reconnects and re-identifies the device.
+		"""
+
+		with self.lock:
+			if port in self.sessions:
+				self.LOG.info('Close session on %s' % port)
+				del self.sessions[port]
+
+
+	def handle_request(self, request):
+		"""Executes a single client request.
+
+		Args:
+			request -- Decoded request: { port, options, method, args }.
+
+		Returns:
+			Response dictionary, with either a `result` or an `error`.
+		"""
+
+		port, method = request['port'], request['method']
+		if method not in self.METHODS:
+			return { 'error' : { 'type' : 'SessionError', 'message' : 'Unknown method: %s' % method } }
+
+		options = request.get('options', {})
+		args = _decode(request.get('args', []))
+		with self._get_port_lock(port):
+			try:
+				session, reused = self._get_session(port, options)
+				try:
+					result = getattr(session, method)(*args)
+				except self.LINK_ERRORS as e:
+					if not reused:
+						raise
+					# the link of a session kept open may have gone stale
+					self.LOG.warning('%s on %s failed: %s, reconnecting' % (method, port, e))
+					self._close_session(port)
+					session, reused = self._get_session(port, options)
+					result = getattr(session, method)(*args)
+				if method == 'reset':
+					# device re-enumerates after a reset
+					self._close_session(port)
+				return { 'result' : _encode(result) }
+			except Exception as e:
+				self.LOG.warning('%s on %s failed: %s' % (method, port, e))
+				if not isinstance(e, SessionError):
+					self._close_session(port)
+				return { 'error' : { 'type' : type(e).__name__, 'message' : str(e) } }
+
+
+	def _serve_client(self, connection):
+		"""Internal helper serving all requests of one client connection."""
+
+		with connection:
+			stream = connection.makefile('rwb')
+			for line in stream:
+				response = self.handle_request(json.loads(line.decode('utf-8')))
+				stream.write(json.dumps(response).encode('utf-8') + b'\n')
+				stream.flush()
+
+
+	def serve_forever(self):
+		"""Listens on the Unix socket and serves clients until interrupted."""
+
+		if os.path.exists(self.path):
+			if Client.is_running(self.path):
+				raise DaemonError('Daemon already running on %s' % self.path)
+			os.remove(self.path)
+
+		listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			listener.bind(self.path)
+			os.chmod(self.path, 0o600)
+			listener.listen(8)
+			self.LOG.info('Listening on %s' % self.path)
+			while True:
+				connection, _ = listener.accept()
+				thread = threading.Thread(target=self._serve_client, args=(connection,))
+				thread.daemon = True
+				thread.start()
+		finally:
+			listener.close()
+			os.remove(self.path)
+
+
+class Client(object):
+	"""Client connection to a running SAM-BA daemon."""
+
+
+	def __init__(self, path=None):
+		self.path = path or get_default_socket_path()
+		self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.socket.connect(self.path)
+		self.stream = self.socket.makefile('rwb')
+
+
+	@staticmethod
+	def is_running(path=None):
+		"""Determines if a daemon is listening on the given socket path."""
+
+		path = path or get_default_socket_path()
+		if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+			return False
+		s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			s.connect(path)
+			return True
+		except socket.error:
+			return False
+		finally:
+			s.close()
+
+
+	def call(self, port, options, method, *args):
+		"""Calls a `Session` method of the given port in the daemon.
+
+		Returns:
+			Decoded method result.
+		"""
+
+		request = { 'port' : port, 'options' : options, 'method' : method, 'args' : _encode(list(args)) }
+		self.stream.write(json.dumps(request).encode('utf-8') + b'\n')
+		self.stream.flush()
+
+		line = self.stream.readline()
+		if not line:
+			raise DaemonError('Daemon closed the connection')
+		response = json.loads(line.decode('utf-8'))
+
+		if 'error' in response:
+			if response['error']['type'] == 'TimeoutError':
+				raise Transports.TimeoutError()
+			raise SessionError(response['error']['message'])
+		return _decode(response['result'])
+
+
+class RemoteSession(object):
+	"""Proxy exposing the `Session` operations of a port served by the daemon.
+	"""
+
+
+	def __init__(self, client, port, **options):
+		"""Creates a proxy session.
+
+		Args:
+			client  -- Connected `Client`.
+			port    -- Serial port of the device.
+			options -- `Session.connect` options used if the daemon has to
+			           open the port.
+		"""
+
+		self.client  = client
+		self.port    = port
+		self.options = options
+
+
+	def __str__(self):
+		return '{} via daemon'.format(self.port)
+
+
+	def __getattr__(self, name):
+		if name not in Server.METHODS:
+			raise AttributeError(name)
+		# progress is not reported through the daemon
+		return lambda *args, progress=None: self.client.call(self.port, self.options, name, *args)
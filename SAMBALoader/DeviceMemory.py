@@ -0,0 +1,380 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Read-through cache of device memory, sitting between `SAMBA` and the parts
+# and flash controllers using it.
+
+import collections
+import logging
+
+
+def _read_block(samba, address, length):
+	"""Default region reader, reading through `SAMBA.read_block`."""
+
+	return samba.read_block(address, length)
+
+
+class MemoryRegion(object):
+	"""Region of device memory whose contents only change when written by the
+	   host, and may therefore be cached. Anything outside of the memory map
+	   (peripheral registers, status flags) is volatile and never cached.
+	"""
+
+	def __init__(self, start, length, page_size, reader=None):
+		"""Creates a cacheable memory region.
+
+		Args:
+			start     -- Absolute start address of the region.
+			length    -- Length of the region, bytes.
+			page_size -- Caching granularity, bytes; `start` and `length`
+			             must be multiples of it.
+			reader    -- Function `reader(samba, address, length)` used to read
+			             the region (default: `SAMBA.read_block`).
+		"""
+
+		self.start     = start
+		self.length    = length
+		self.page_size = page_size
+		self.reader    = reader or _read_block
+
+
+	def __repr__(self):
+		return 'MemoryRegion(0x{:08X}, 0x{:X}, {})'.format(self.start, self.length, self.page_size)
+
+
+	def contains(self, address, length=1):
+		return address >= self.start and address + length <= self.start + self.length
+
+
+class DeviceMemory(object):
+	"""Page-granular LRU cache of device memory, wrapping a `SAMBA` instance
+	   and exposing the same interface. Reads within the regions of the memory
+	   map are served from the cache, anything else goes to the device. Every
+	   `write_*` call, and every flash command reported through `invalidate()`,
+	   drops the affected pages. Pages known to be erased, reported through
+	   `mark_erased()`, are served as blank without reading them, until they
+	   are written.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	DEFAULT_CAPACITY = 256 # pages
+	COALESCE_GAP     = 256 # bytes
+
+
+	def __init__(self, samba, capacity=DEFAULT_CAPACITY):
+		"""Creates a device memory cache.
+
+		Args:
+			samba    -- Core `SAMBA` instance bound to the device.
+			capacity -- Maximum number of cached pages.
+		"""
+
+		self.samba    = samba
+		self.capacity = capacity
+		self.regions  = []
+		self.pages    = collections.OrderedDict()
+		self.erased   = set()
+		self.hits     = 0
+		self.misses   = 0
+
+
+	def __getattr__(self, name):
+		# everything not cached here is served by the wrapped `SAMBA` instance
+		return getattr(self.samba, name)
+
+
+	def __str__(self):
+		return 'Device memory: {} regions, {} pages cached, {} hits, {} misses'.format(
+			len(self.regions), len(self.pages), self.hits, self.misses)
+
+
+	def add_region(self, region):
+		"""Adds a cacheable region to the memory map.
+
+		Args:
+			region -- `MemoryRegion` to add.
+		"""
+
+		self.LOG.debug('Cacheable region: %r' % region)
+		self.regions.append(region)
+
+
+	def set_memory_map(self, regions):
+		"""Replaces the memory map, dropping all cached pages.
+
+		Args:
+			regions -- Iterable of `MemoryRegion` instances.
+		"""
+
+		self.regions = []
+		self.invalidate()
+		for region in regions:
+			self.add_region(region)
+
+
+	def _find_region(self, address, length):
+		for region in self.regions:
+			if region.contains(address, length):
+				return region
+		return None
+
+
+	def invalidate(self, address=None, length=1):
+		"""Drops cached pages overlapping the given range.
+
+		Args:
+			address -- Start address of the modified range, or `None` to drop
+			           the entire cache.
+			length  -- Length of the modified range, bytes.
+		"""
+
+		if address is None:
+			self.pages.clear()
+			self.erased.clear()
+			return
+
+		for page_address in self._get_pages(address, length):
+			self.pages.pop(page_address, None)
+			self.erased.discard(page_address)
+
+
+	def mark_erased(self, address, length):
+		"""Records the pages within a range as erased (all 0xFF), e.g. once
+		   a flash erase command was issued for them.
+
+		Args:
+			address -- Start address of the erased range.
+			length  -- Length of the erased range, bytes.
+		"""
+
+		for page_address in self._get_pages(address, length):
+			self.pages.pop(page_address, None)
+			self.erased.add(page_address)
+
+
+	def is_erased(self, address, length=1):
+		"""Checks whether a range is known to be erased, without reading it.
+
+		Returns:
+			`True` if every page of the range was marked erased since it
+			was last written.
+		"""
+
+		if self._find_region(address, length) is None:
+			return False
+		return all(page_address in self.erased for page_address in self._get_pages(address, length))
+
+
+	def _get_pages(self, address, length):
+		"""Internal helper to list the addresses of the pages of the memory
+		   map regions overlapping a range.
+		"""
+
+		end = address + length
+		for region in self.regions:
+			if region.start < end and address < region.start + region.length:
+				first = max(address, region.start)
+				first -= (first - region.start) % region.page_size
+				for page_address in range(first, min(end, region.start + region.length), region.page_size):
+					yield page_address
+
+
+	def _store(self, page_address, data):
+		self.pages[page_address] = data
+		self.pages.move_to_end(page_address)
+		while len(self.pages) > self.capacity:
+			self.pages.popitem(last=False)
+
+
+	def _read_pages(self, region, start, end):
+		"""Internal helper to read the pages `start` to `end` of a region,
+		   fetching each run of missing pages with a single device read.
+
+		Returns:
+			List of page data, in address order.
+		"""
+
+		page_size = region.page_size
+		pages = []
+		missing_start = None
+		for page_address in range(start, end + page_size, page_size):
+			if page_address < end and page_address not in self.pages and page_address not in self.erased:
+				if missing_start is None:
+					missing_start = page_address
+				continue
+
+			if missing_start is not None:
+				# fetch the preceding run of missing pages
+				data = bytes(region.reader(self.samba, missing_start, page_address - missing_start))
+				for offset in range(0, len(data), page_size):
+					self._store(missing_start + offset, data[offset : offset + page_size])
+					pages.append(data[offset : offset + page_size])
+					self.misses += 1
+				missing_start = None
+
+			if page_address < end and page_address in self.erased:
+				pages.append(b'\xFF' * page_size)
+				self.hits += 1
+			elif page_address < end:
+				self.pages.move_to_end(page_address)
+				pages.append(self.pages[page_address])
+				self.hits += 1
+		return pages
+
+
+	def read_block(self, address, length):
+		"""Reads a block of data, from the cache where possible.
+
+		Args:
+			address -- Address to read the data from.
+			length  -- Length of the block to read.
+
+		Returns:
+			Block of data read from the attached device.
+		"""
+
+		region = self._find_region(address, length)
+		if region is None or length == 0:
+			return self.samba.read_block(address, length)
+
+		start = address - (address - region.start) % region.page_size
+		end   = address + length
+		end  += (region.start - end) % region.page_size
+
+		if (end - start) // region.page_size > self.capacity:
+			if self.is_erased(address, length):
+				return bytearray(b'\xFF') * length
+			# larger than the cache, caching would only evict everything else
+			return bytearray(region.reader(self.samba, address, length))
+
+		data = b''.join(self._read_pages(region, start, end))
+		return bytearray(data[address - start : address - start + length])
+
+
+	def read_word(self, address):
+		if self._find_region(address, 4) is None:
+			return self.samba.read_word(address)
+		data = self.read_block(address, 4)
+		return data[0] | data[1] << 8 | data[2] << 16 | data[3] << 24
+
+
+	def read_half_word(self, address):
+		if self._find_region(address, 2) is None:
+			return self.samba.read_half_word(address)
+		data = self.read_block(address, 2)
+		return data[0] | data[1] << 8
+
+
+	def read_byte(self, address):
+		if self._find_region(address, 1) is None:
+			return self.samba.read_byte(address)
+		return self.read_block(address, 1)
+
+
+	def _split(self, address, length):
+		"""Internal helper to split a range at the boundaries of the memory
+		   map regions.
+
+		Returns:
+			List of (address, length, region) tuples, with `None` regions
+			for pieces outside of the memory map.
+		"""
+
+		end = address + length
+		pieces = []
+		while address < end:
+			region = self._find_region(address, 1)
+			if region is not None:
+				piece_end = min(end, region.start + region.length)
+			else:
+				piece_end = min([end] + [r.start for r in self.regions if address < r.start < end])
+			pieces.append((address, piece_end - address, region))
+			address = piece_end
+		return pieces
+
+
+	def _overlaps_regions(self, address, end):
+		return any(r.start < end and address < r.start + r.length for r in self.regions)
+
+
+	def read_ranges(self, ranges, max_gap=COALESCE_GAP):
+		"""Reads several ranges of memory, coalescing adjacent, overlapping or
+		   nearby ranges into fewer reads. Ranges are never merged across the
+		   boundaries of the memory map regions, so each is read the way its
+		   region requires. Note that the gaps between merged ranges are read
+		   as well: keep `max_gap` zero around registers with read side
+		   effects.
+
+		Args:
+			ranges  -- List of (address, length) tuples.
+			max_gap -- Largest gap between two ranges read together, bytes.
+
+		Returns:
+			List of the data of each range, in the order of `ranges`.
+		"""
+
+		pieces = []
+		for index, (address, length) in enumerate(ranges):
+			for piece_address, piece_length, region in self._split(address, length):
+				pieces.append((piece_address, piece_length, region, index))
+		pieces.sort(key=lambda p: p[0])
+
+		# spans of [start, end, region, pieces]
+		spans = []
+		for piece in pieces:
+			address, length, region, _ = piece
+			if spans:
+				span = spans[-1]
+				end = max(span[1], address + length)
+				if span[2] is region and address <= span[1] + max_gap and \
+						(region is not None or not self._overlaps_regions(span[0], end)):
+					span[1] = end
+					span[3].append(piece)
+					continue
+			spans.append([address, address + length, region, [piece]])
+
+		self.LOG.debug('Read %d ranges with %d reads' % (len(ranges), len(spans)))
+		data = [bytearray() for _ in ranges]
+		for start, end, _, span_pieces in spans:
+			buff = self.read_block(start, end - start)
+			for address, length, _, index in span_pieces:
+				data[index] += buff[address - start : address - start + length]
+		return data
+
+
+	def write_block(self, address, data):
+		self.invalidate(address, len(data))
+		self.samba.write_block(address, data)
+
+
+	def write_word(self, address, word):
+		self.invalidate(address, 4)
+		self.samba.write_word(address, word)
+
+
+	def write_half_word(self, address, half_word):
+		self.invalidate(address, 2)
+		self.samba.write_half_word(address, half_word)
+
+
+	def write_byte(self, address, byte):
+		self.invalidate(address, 1)
+		self.samba.write_byte(address, byte)
+
+
+	def execute(self, transaction):
+		for address, _ in transaction.writes():
+			self.invalidate(address, 4)
+		return self.samba.execute(transaction)
+
+
+	def run_from_address(self, address):
+		# code running on the device may change any memory
+		self.invalidate()
+		self.samba.run_from_address(address)
@@ -6,31 +6,46 @@
 #         www.fourwalledcubicle.com
 #
 
-from . import FileFormats
+import importlib
 import logging
 
 
-def _get_subclasses(classname):
-	"""Recursively obtains all subclasses of the given class."""
+class FileFormatLibrary(object):
+	"""File format library class, which lists all supported file formats and
+		provides methods to retrieve the format processors for a given file.
+		Formats are listed by name and imported only once a file needs them.
+	"""
 
-	subclasses = []
+	# name, short name for the command line, filename extensions, module in
+	# the `FileFormats` package, class name
+	SUPPORTED_FORMATS = (
+		('Binary',            'bin',     ('bin',),                      'BinFormat',     'BinFormat'),
+		('Intel HEX',         'ihex',    ('hex',),                      'HexFormat',     'HexFormat'),
+		('Motorola S-record', 'srec',    ('srec', 's19', 's28', 's37'), 'SRecFormat',    'SRecFormat'),
+		('Hexdump',           'hexdump', (),                            'HexdumpFormat', 'HexdumpFormat'),
+		('C array',           'c',       ('c', 'h'),                    'CArrayFormat',  'CArrayFormat'),
+	)
 
-	for p in classname.__subclasses__():
-		subclasses.append(p)
-		subclasses.extend(_get_subclasses(p))
+	LOG = logging.getLogger(__name__)
 
-	return subclasses
 
+	@staticmethod
+	def get_format(name):
+		"""Retrieves a file format processor class by its name, importing it.
 
+		Args:
+			name -- Name or short name of the format, as listed in `SUPPORTED_FORMATS`.
 
-class FileFormatLibrary(object):
-	"""Part library class, which lists all supported devices and provides
-		methods to retrieve a given part by its chip identifiers, or by name.
-	"""
+		Returns:
+			File format processor class.
+		"""
 
-	SUPPORTED_FORMATS = _get_subclasses(FileFormats.FileFormatBase)
+		for format_name, short_name, _, module, classname in FileFormatLibrary.SUPPORTED_FORMATS:
+			if name in (format_name, short_name):
+				module = importlib.import_module('.FileFormats.' + module, __package__)
+				return getattr(module, classname)
 
-	LOG = logging.getLogger(__name__)
+		raise KeyError('Unknown file format: %s' % name)
 
 
 	@staticmethod
@@ -43,4 +58,6 @@ class FileFormatLibrary(object):
 		Returns:
 			List of all format processors which match against the filename.
 		"""
-		return [f for f in FileFormatLibrary.SUPPORTED_FORMATS if f.can_process(filename)]
+
+		extension = filename.split('.')[-1] if '.' in filename else None
+		return [FileFormatLibrary.get_format(f[0]) for f in FileFormatLibrary.SUPPORTED_FORMATS if extension and extension.lower() in f[2]]
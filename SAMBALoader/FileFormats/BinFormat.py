@@ -9,6 +9,18 @@
 from . import FileFormat
 
 
+class BinWriter(FileFormat.FormatWriter):
+	"""Streaming writer of raw binary data."""
+
+	def write(self, data):
+		self.stream.write(data)
+		self.length += len(data)
+
+
+	def write_records(self, address, data):
+		self.stream.write(data)
+
+
 class BinFormat(FileFormat.FileFormatBase):
 	def __init__(self):
 		"""Constructor for the bin file format processor."""
@@ -41,6 +53,11 @@ class BinFormat(FileFormat.FileFormatBase):
 		return "Binary"
 
 
+	@staticmethod
+	def get_writer(stream, address=0):
+		return BinWriter(stream, address)
+
+
 	def read(self, filename):
 		"""Reads and parses the contents of a binary file from disk.
 
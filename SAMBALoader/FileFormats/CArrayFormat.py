@@ -0,0 +1,62 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+from . import FileFormat
+
+
+class CArrayWriter(FileFormat.FormatWriter):
+	"""Streaming writer of a C source array, named after its address."""
+
+	RECORD_SIZE = 12 # bytes per source line
+
+
+	def write_header(self):
+		self._write_line('/* Read from 0x{:08X} by SAMBALoader */'.format(self.address))
+		self._write_line('const unsigned char data_{:08X}[] = {{'.format(self.address))
+
+
+	def write_records(self, address, data):
+		for offset in range(0, len(data), self.RECORD_SIZE):
+			self._write_line('\t' + ' '.join('0x{:02X},'.format(b) for b in bytearray(data[offset : offset + self.RECORD_SIZE])))
+
+
+	def write_trailer(self):
+		self._write_line('};')
+		self._write_line('const unsigned int data_{:08X}_length = {};'.format(self.address, self.length))
+
+
+class CArrayFormat(FileFormat.FileFormatBase):
+	"""C source array output format; C sources cannot be read back."""
+
+	def __init__(self):
+		"""Constructor for the C array file format processor."""
+
+		self.data = []
+		self.address = None
+
+
+	@staticmethod
+	def can_process(filename):
+		filename_components = filename.split('.')
+		if len(filename_components) < 2:
+			return False
+
+		return filename.split('.')[-1].lower() in ('c', 'h')
+
+
+	def get_name(self):
+		return "C array"
+
+
+	@staticmethod
+	def get_writer(stream, address=0):
+		return CArrayWriter(stream, address)
+
+
+	def read(self, filename):
+		raise NotImplementedError('C array files can only be written')
@@ -10,6 +10,93 @@ import abc
 import logging
 
 
+class FormatWriter(object):
+	"""Base class for streaming file format writers. Data is written chunk by
+	   chunk as it is read from the device, so only the current record is
+	   held in memory. Derived classes override `write_records()`, and
+	   `write_header()`/`write_trailer()` where the format needs them.
+	"""
+
+	__metaclass__ = abc.ABCMeta
+
+	RECORD_SIZE = 16 # bytes of data per record
+
+
+	def __init__(self, stream, address=0):
+		"""Creates a writer.
+
+		Args:
+			stream  -- Binary stream to write the formatted data to.
+			address -- Address of the first byte written.
+		"""
+
+		self.stream  = stream
+		self.address = address
+		self.length  = 0
+		self.pending = bytearray()
+		self.write_header()
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.close()
+
+
+	def write(self, data):
+		"""Writes the next chunk of data, following the previous one.
+
+		Args:
+			data -- Chunk of data.
+		"""
+
+		self.pending += data
+		complete = len(self.pending) - len(self.pending) % self.RECORD_SIZE
+		if complete:
+			self._flush(complete)
+
+
+	def close(self):
+		"""Writes the rest of the data and the format trailer."""
+
+		if self.pending:
+			self._flush(len(self.pending))
+		self.write_trailer()
+		self.stream.flush()
+
+
+	def _flush(self, length):
+		self.write_records(self.address + self.length, bytes(self.pending[:length]))
+		self.length += length
+		del self.pending[:length]
+
+
+	def _write_line(self, line):
+		self.stream.write(line.encode('ascii') + b'\n')
+
+
+	def write_header(self):
+		pass
+
+
+	@abc.abstractmethod
+	def write_records(self, address, data):
+		"""Writes records of data.
+
+		Args:
+			address -- Address of the data.
+			data    -- Data, a multiple of `RECORD_SIZE` except at the end.
+		"""
+		pass
+
+
+	def write_trailer(self):
+		pass
+
+
 class FileFormatBase(object):
 	"""Base class for file format readers. Derived instances should override
 	   all methods listed here.
@@ -61,10 +148,41 @@ class FileFormatBase(object):
 		pass
 
 
+	def get_segments(self):
+		"""Retrieves the data read from the file as (address, data) segments.
+		   Formats which do not carry addresses return a single segment with
+		   a `None` address.
+
+		Returns:
+			List of (address, data) tuples.
+		"""
+		return [(None, self.data)]
+
+
+	@staticmethod
+	def get_writer(stream, address=0):
+		"""Creates a streaming writer of the file format.
+
+		Args:
+			stream  -- Binary stream to write the formatted data to.
+			address -- Address of the first byte written.
+
+		Returns:
+			`FormatWriter` instance.
+		"""
+		raise NotImplementedError('Writing is not supported by this file format')
+
+
 	def write(self, filename):
-		"""Writes the contents the file to a file on disk.
+		"""Writes the contents the file to a file on disk, through the
+		   streaming writer of the format.
 
 		Args:
-			filename -- Filename of the binary file to write to.
+			filename -- Filename of the file to write to.
 		"""
-		pass
+
+		with open(filename, 'wb') as f:
+			with self.get_writer(f, getattr(self, 'address', None) or 0) as writer:
+				writer.write(bytearray(self.data))
+
+		self.LOG.debug('Wrote %s file \'%s\' (%d bytes)' % (self.get_name(), filename, len(self.data)))
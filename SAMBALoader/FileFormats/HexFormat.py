@@ -0,0 +1,109 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+from . import FileFormat
+
+
+class HexWriter(FileFormat.FormatWriter):
+	"""Streaming writer of Intel HEX records, with 32-bit addresses given by
+	   extended linear address records.
+	"""
+
+	def __init__(self, stream, address=0):
+		self.upper_address = None
+		super(HexWriter, self).__init__(stream, address)
+
+
+	def _write_record(self, record_type, address, data):
+		record = bytearray([len(data), (address >> 8) & 0xFF, address & 0xFF, record_type]) + data
+		self._write_line(':{}{:02X}'.format(bytes(record).hex().upper(), -sum(record) & 0xFF))
+
+
+	def write_records(self, address, data):
+		offset = 0
+		while offset < len(data):
+			record_address = address + offset
+			if record_address >> 16 != self.upper_address:
+				self.upper_address = record_address >> 16
+				self._write_record(0x04, 0, bytearray([self.upper_address >> 8, self.upper_address & 0xFF]))
+			# a record never crosses a 64 KB segment
+			length = min(self.RECORD_SIZE, len(data) - offset, 0x10000 - (record_address & 0xFFFF))
+			self._write_record(0x00, record_address & 0xFFFF, bytearray(data[offset : offset + length]))
+			offset += length
+
+
+	def write_trailer(self):
+		self._write_record(0x01, 0, bytearray())
+
+
+class HexFormat(FileFormat.FileFormatBase):
+	"""Intel HEX file format processor, using the IntelHex library (imported
+	   when a file is read) to read files; files are written without it.
+	"""
+
+	def __init__(self):
+		"""Constructor for the Intel HEX file format processor."""
+
+		self.data = []
+		self.address = None
+		self.segments = []
+
+
+	def __len__(self):
+		return len(self.data)
+
+
+	@staticmethod
+	def can_process(filename):
+		filename_components = filename.split('.')
+		if len(filename_components) < 2:
+			return False
+
+		return filename.split('.')[-1].lower() == "hex"
+
+
+	def get_name(self):
+		return "Intel HEX"
+
+
+	@staticmethod
+	def get_writer(stream, address=0):
+		return HexWriter(stream, address)
+
+
+	def get_segments(self):
+		return self.segments
+
+
+	def read(self, filename):
+		"""Reads and parses the contents of an Intel HEX file from disk. The
+		   contiguous segments are kept with their addresses; `data` holds the
+		   whole image from its lowest address, with gaps filled with 0xFF.
+
+		Args:
+			filename -- Filename of the HEX file to read.
+
+		Returns:
+			Iterable of the processed data.
+		"""
+
+		try:
+			from intelhex import IntelHex
+		except ImportError:
+			raise ImportError('To open HEX files install IntelHex library: pip install IntelHex')
+
+		ih = IntelHex()
+		ih.loadhex(filename)
+
+		self.segments = [(start, bytearray(ih.tobinstr(start, end - 1))) for start, end in ih.segments()]
+		if self.segments:
+			self.address = ih.minaddr()
+			self.data = bytearray(ih.tobinstr(ih.minaddr(), ih.maxaddr()))
+
+		self.LOG.debug('Read hex file \'%s\' (%d bytes in %d segments)' % (filename, len(self.data), len(self.segments)))
+		return self
@@ -0,0 +1,50 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+from . import FileFormat
+
+
+class HexdumpWriter(FileFormat.FormatWriter):
+	"""Streaming writer of a hexdump: one line of up to 16 bytes with its
+	   address and ASCII rendering.
+	"""
+
+	def write_records(self, address, data):
+		for offset in range(0, len(data), self.RECORD_SIZE):
+			line = data[offset : offset + self.RECORD_SIZE]
+			self._write_line('{:08X}  {:<48} |{}|'.format(address + offset,
+				' '.join('{:02X}'.format(b) for b in bytearray(line)),
+				''.join(chr(b) if 0x20 <= b < 0x7F else '.' for b in bytearray(line))))
+
+
+class HexdumpFormat(FileFormat.FileFormatBase):
+	"""Hexdump text output format; hexdumps cannot be read back."""
+
+	def __init__(self):
+		"""Constructor for the hexdump file format processor."""
+
+		self.data = []
+		self.address = None
+
+
+	@staticmethod
+	def can_process(filename):
+		return False
+
+
+	def get_name(self):
+		return "Hexdump"
+
+
+	@staticmethod
+	def get_writer(stream, address=0):
+		return HexdumpWriter(stream, address)
+
+
+	def read(self, filename):
+		raise NotImplementedError('Hexdump files can only be written')
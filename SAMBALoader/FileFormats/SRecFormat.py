@@ -0,0 +1,124 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+from . import FileFormat
+
+
+class SRecWriter(FileFormat.FormatWriter):
+	"""Streaming writer of Motorola S-records, with 32-bit addresses (S3
+	   data records, S7 termination).
+	"""
+
+	def __init__(self, stream, address=0):
+		self.records = 0
+		super(SRecWriter, self).__init__(stream, address)
+
+
+	def _write_record(self, record_type, address, address_size, data):
+		record = bytearray([address_size + len(data) + 1]) + bytearray(address.to_bytes(address_size, 'big')) + data
+		self._write_line('S{}{}{:02X}'.format(record_type, bytes(record).hex().upper(), ~sum(record) & 0xFF))
+
+
+	def write_header(self):
+		self._write_record(0, 0, 2, bytearray(b'SAMBALoader'))
+
+
+	def write_records(self, address, data):
+		for offset in range(0, len(data), self.RECORD_SIZE):
+			self._write_record(3, address + offset, 4, bytearray(data[offset : offset + self.RECORD_SIZE]))
+			self.records += 1
+
+
+	def write_trailer(self):
+		if self.records <= 0xFFFF:
+			self._write_record(5, self.records, 2, bytearray())
+		self._write_record(7, self.address, 4, bytearray())
+
+
+class SRecFormat(FileFormat.FileFormatBase):
+	"""Motorola S-record file format processor."""
+
+	def __init__(self):
+		"""Constructor for the S-record file format processor."""
+
+		self.data = []
+		self.address = None
+		self.segments = []
+
+
+	def __len__(self):
+		return len(self.data)
+
+
+	@staticmethod
+	def can_process(filename):
+		filename_components = filename.split('.')
+		if len(filename_components) < 2:
+			return False
+
+		return filename.split('.')[-1].lower() in ('srec', 's19', 's28', 's37')
+
+
+	def get_name(self):
+		return "Motorola S-record"
+
+
+	@staticmethod
+	def get_writer(stream, address=0):
+		return SRecWriter(stream, address)
+
+
+	def get_segments(self):
+		return self.segments
+
+
+	def read(self, filename):
+		"""Reads and parses the contents of an S-record file from disk. The
+		   contiguous segments are kept with their addresses; `data` holds the
+		   whole image from its lowest address, with gaps filled with 0xFF.
+
+		Args:
+			filename -- Filename of the S-record file to read.
+
+		Returns:
+			Iterable of the processed data.
+		"""
+
+		# address size of the S1/S2/S3 data records
+		address_sizes = { '1' : 2, '2' : 3, '3' : 4 }
+
+		self.segments = []
+		with open(filename) as f:
+			for line_number, line in enumerate(f, 1):
+				line = line.strip()
+				if not line:
+					continue
+				record = bytearray.fromhex(line[2:]) if line[:1] in ('S', 's') else None
+				if not record or record[0] != len(record) - 1 or sum(record) & 0xFF != 0xFF:
+					raise ValueError('Invalid S-record at line %d of \'%s\'' % (line_number, filename))
+				if line[1] not in address_sizes:
+					continue
+
+				address_size = address_sizes[line[1]]
+				address = int.from_bytes(bytes(record[1 : 1 + address_size]), 'big')
+				data = record[1 + address_size : -1]
+				if self.segments and self.segments[-1][0] + len(self.segments[-1][1]) == address:
+					self.segments[-1][1].extend(data)
+				else:
+					self.segments.append((address, bytearray(data)))
+
+		self.segments.sort(key=lambda s: s[0])
+		if self.segments:
+			self.address = self.segments[0][0]
+			end = max(address + len(data) for address, data in self.segments)
+			self.data = bytearray(b'\xFF') * (end - self.address)
+			for address, data in self.segments:
+				self.data[address - self.address : address - self.address + len(data)] = data
+
+		self.LOG.debug('Read S-record file \'%s\' (%d bytes in %d segments)' % (filename, len(self.data), len(self.segments)))
+		return self
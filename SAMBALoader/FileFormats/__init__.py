@@ -8,3 +8,7 @@
 
 from .FileFormat import *
 from .BinFormat import *
+from .HexFormat import *
+from .SRecFormat import *
+from .HexdumpFormat import *
+from .CArrayFormat import *
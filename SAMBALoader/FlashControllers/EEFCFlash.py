@@ -10,8 +10,13 @@
 
 from time import time, sleep
 import logging
+import struct
 
 from . import FlashController
+from ..DeviceMemory import DeviceMemory, MemoryRegion
+from ..Transaction import Transaction, TransactionError
+from ..Profiler import Profiler
+from .. import Transports
 
 
 class CommandException(Exception):
@@ -61,6 +66,21 @@ class Flash(FlashController.FlashControllerBase):
 		'SPUS' : 0x14, # Stop read user signature
 	}
 
+	# Commands changing the contents of a single page (FARG: page number)
+	PAGE_WRITE_COMMANDS = (0x01, 0x02, 0x03, 0x04)
+	# Commands changing, or remapping, the contents of the entire flash plane
+	PLANE_COMMANDS = (0x05, 0x07, 0x0E, 0x0F, 0x11, 0x12, 0x13, 0x14, 0x15)
+
+	# Word reads pipelined into one exchange when read_block cannot be used
+	READ_WORDS_PER_TRANSACTION = 256
+
+	PROGRESS_READ_SIZE = 16 * 1024 # bytes
+
+	# Erase timeout of a plane: grows with the size of the plane
+	ERASE_TIMEOUT_MIN    = 2     # s
+	ERASE_TIME_PER_KB    = 0.02  # s, worst case
+	ERASE_POLL_INTERVAL  = 0.01  # s
+
 	LOG = logging.getLogger(__name__)
 
 
@@ -82,6 +102,8 @@ class Flash(FlashController.FlashControllerBase):
 		# SAM3 bugfux
 		samba.write_word(self.regs_base_address + self.FMR_OFFSET, 0x6 << 8)
 		self.dont_use_read_block = dont_use_read_block
+		self.pipelined_word_reads = True
+		self.unique_identifier_area = None
 
 
 	def _wait_while_busy(self, timeout=2):
@@ -114,31 +136,145 @@ class Flash(FlashController.FlashControllerBase):
 			do_not_wait -- do not check busy flag before command issue
 		"""
 
-		if not do_not_wait:
-			self._wait_while_busy()
+		self._commands([(command, farg, do_not_wait)])
 
-		if type(command) is str:
-			command = self.FCR_CMDA[command]
 
-		reg  = self.FCR_FKEY | ((farg & 0xFFFF) << 8) | (command & 0xFF)
+	def _commands(self, commands, result_address=None):
+		"""Issues a sequence of low-level commands as a single register
+			transaction, checking the status of each command.
+
+		Args:
+			commands       -- List of (command, farg, do_not_wait) tuples, see `_command`
+			result_address -- Register to read once the last command completed (optional)
+
+		Returns:
+			Value of the result register, or `None` if not given.
+		"""
+
+		fsr_address = self.regs_base_address + self.FSR_OFFSET
+		fcr_address = self.regs_base_address + self.FCR_OFFSET
+
+		transaction = Transaction()
+		issued = []
+		status_indexes = []
+		results_count = 0
+		for command, farg, do_not_wait in commands:
+			if type(command) is str:
+				command = self.FCR_CMDA[command]
+
+			reg  = self.FCR_FKEY | ((farg & 0xFFFF) << 8) | (command & 0xFF)
+
+			self.LOG.debug('EEFC_FCR @ 0x{:08X} = 0x{:08X}'.format(fcr_address, reg))
+			if not do_not_wait:
+				transaction.poll_word(fsr_address, self.FSR_MASK['FRDY'])
+				results_count += 1
+			transaction.write_word(fcr_address, reg)
+			# check for error
+			transaction.read_word(fsr_address)
+			status_indexes.append(results_count)
+			results_count += 1
+			issued.append((command, farg))
+
+		if result_address is not None:
+			transaction.poll_word(fsr_address, self.FSR_MASK['FRDY'])
+			transaction.read_word(result_address)
+
+		try:
+			results = self.samba.execute(transaction)
+		except TransactionError as e:
+			raise Exception('Flash busy: timeout. FSR: ' + str(e.value))
+		finally:
+			for command, farg in issued:
+				self._invalidate_command(command, farg)
+
+		for index in status_indexes:
+			reg = results[index] & ~self.FSR_MASK['FRDY'] & 0xF
+			if reg:
+				raise CommandException(fsr_address, reg)
+
+		return results[-1] if result_address is not None else None
+
+
+	def _invalidate_command(self, command, farg):
+		"""Drops the cached flash contents changed by a flash command."""
+
+		if command in self.PAGE_WRITE_COMMANDS:
+			page_address = farg * self.flash_address_range.page_size
+			if self.flash_address_range.is_in_range(page_address, self.flash_address_range.page_size):
+				self._invalidate(self.samba, page_address, self.flash_address_range.page_size)
+				return
+		elif command not in self.PLANE_COMMANDS:
+			return
+		self._invalidate(self.samba, self.flash_address_range.start, self.flash_address_range.length)
+
+
+	def get_memory_region(self):
+		"""Retrieves the flash plane as a `MemoryRegion`, cached page by page."""
 
-		self.LOG.debug('EEFC_FCR @ 0x{:08X} = 0x{:08X}'.format(self.regs_base_address + self.FCR_OFFSET, reg))
-		self.samba.write_word(self.regs_base_address + self.FCR_OFFSET, reg)
-		# check for error
-		reg = self.samba.read_word(self.regs_base_address + self.FSR_OFFSET) & ~self.FSR_MASK['FRDY'] & 0xF
-		if reg:
-			raise CommandException(self.regs_base_address + self.FSR_OFFSET, reg)
+		if self.dont_use_read_block:
+			reader = lambda samba, address, length: self._read_words(address, length, samba)
+		else:
+			reader = None
+		return MemoryRegion(self.flash_address_range.start, self.flash_address_range.length,
+			self.flash_address_range.page_size, reader)
 
 
 	def _read_block(self, address, length):
 		"SAM3 bugfux: all 0 reads when SAMBA read_block"
-		if self.dont_use_read_block:
-			return self._read_by_word(address, length)
+		if self.dont_use_read_block and not isinstance(self.samba, DeviceMemory):
+			return self._read_words(address, length, self.samba)
 		else:
+			# `DeviceMemory` reads the flash through `get_memory_region()`
 			return self.samba.read_block(address, length)
 
 
-	def _read_by_word(self, address, length):
+	def _read_words(self, address, length, samba):
+		"""Reads the flash with word reads (SAM3 bugfix), pipelined where the
+		   link allows it, or one word at a time otherwise.
+
+		Args:
+			address -- Absolute address to read from.
+			length  -- Length of the data to read.
+			samba   -- Core `SAMBA` instance bound to the device.
+
+		Returns:
+			Byte array of the read data.
+		"""
+
+		if self.pipelined_word_reads and samba.is_usb:
+			try:
+				return self._read_by_word_pipelined(address, length, samba)
+			except Transports.TimeoutError:
+				self.LOG.warning('Pipelined word reads failed, reading word by word')
+				self.pipelined_word_reads = False
+				samba.resync()
+		return self._read_by_word(address, length, samba)
+
+
+	def _read_by_word_pipelined(self, address, length, samba):
+		"""Reads the flash with word reads, batched into transactions of
+		   `READ_WORDS_PER_TRANSACTION` reads each.
+		"""
+
+		start = address - address % 4
+		end   = address + length
+		end  += -end % 4
+
+		ret = bytearray()
+		batch_length = 4 * self.READ_WORDS_PER_TRANSACTION
+		for batch_address in range(start, end, batch_length):
+			transaction = Transaction()
+			for word_address in range(batch_address, min(batch_address + batch_length, end), 4):
+				transaction.read_word(word_address)
+			words = samba.execute(transaction)
+			ret += struct.pack('<%dI' % len(words), *words)
+
+		return ret[address - start : address - start + length]
+
+
+	def _read_by_word(self, address, length, samba=None):
+		if samba is None:
+			samba = self.samba
 		def append_bytes(offset_byte, length=None):
 			if length is None:
 				length = 4 - offset_byte % 4
@@ -146,62 +282,54 @@ class Flash(FlashController.FlashControllerBase):
 				ret.append(buff >> i * 8 & 0xFF)
 		ret = bytearray()
 		if address % 4 != 0:
-			buff = self.samba.read_word(address - address % 4)
+			buff = samba.read_word(address - address % 4)
 			append_bytes(address % 4, min(4 - address % 4, length))
 			length -= 4 - address % 4
 			address += 4 - address % 4
 		for i in range(address, address + length, 4):
-			buff = self.samba.read_word(i)
+			buff = samba.read_word(i)
 			append_bytes(0, min(address + length - i, 4))
 		return ret
 
 
 	def read_gpnvm(self):
 		"Reads GPNVM bits"
-		self._command('GGPB')
-		self._wait_while_busy()
-		buff = self.samba.read_word(self.regs_base_address + self.FRR_OFFSET)
+		buff = self._commands([('GGPB', 0, False)], self.regs_base_address + self.FRR_OFFSET)
 		self.LOG.info('EEFC_FRR @ 0x{:08X}: 0x{:08X}'.format(self.regs_base_address + self.FRR_OFFSET, buff))
 		return buff
 
 
 	def set_gpnvm(self, bits_mask):
 		"Sets GPNVM bits according to mask"
-		for i, bit in enumerate(bin(bits_mask)[2:][::-1]):
-			if bit == '1':
-				self._command('SGPB', i)
+		self._commands([('SGPB', i, False) for i, bit in enumerate(bin(bits_mask)[2:][::-1]) if bit == '1'])
 
 
 	def clear_gpnvm(self, bits_mask):
 		"Clears GPNVM bits according to mask"
-		for i, bit in enumerate(bin(bits_mask)[2:][::-1]):
-			if bit == '1':
-				self._command('CGPB', i)
+		self._commands([('CGPB', i, False) for i, bit in enumerate(bin(bits_mask)[2:][::-1]) if bit == '1'])
 
 
 	def read_descriptor(self):
 		"Reads flash descriptor as list of words"
-		self._command()
-		self._wait_while_busy()
+		buff = self._commands([('GETD', 0, False)], self.regs_base_address + self.FRR_OFFSET)
 		start_timestamp = time()
 		ret = []
-		while True:
+		while buff:
 			if time() - start_timestamp >= .5:
 				raise Exception('Get Flash Descriptor: timeout')
-			buff = self.samba.read_word(self.regs_base_address + self.FRR_OFFSET)
-			if not buff:
-				return ret
 			ret.append(buff)
+			buff = self.samba.read_word(self.regs_base_address + self.FRR_OFFSET)
 		return ret
 
 
 	def read_unique_identifier_area(self):
-		"Reads unique identifier area as bytearray"
-		self._command('STUI')
-		# self._wait_while_busy() # The FRDY flag is not set when the STUI command is achieved
-		ret = self._read_block(self.flash_address_range.start, 16)
-		self._command('SPUI', do_not_wait=True)
-		return ret
+		"Reads unique identifier area as bytearray, once per instance"
+		if self.unique_identifier_area is None:
+			self._command('STUI')
+			# self._wait_while_busy() # The FRDY flag is not set when the STUI command is achieved
+			self.unique_identifier_area = self._read_block(self.flash_address_range.start, 16)
+			self._command('SPUI', do_not_wait=True)
+		return self.unique_identifier_area
 
 
 	def get_info(self):
@@ -217,12 +345,14 @@ class Flash(FlashController.FlashControllerBase):
 		return ret
 
 
-	def read_flash(self, address=None, length=None):
+	def read_flash(self, address=None, length=None, progress=None):
 		"""Reads the data from flash.
 
 		Args:
 			address -- Absolute address to read from. If `None` read from start of flash.
 			length -- Length of the data to read (or until end of application area if `None`).
+			progress -- `Progress` advanced as the data is read, in blocks of
+			            `PROGRESS_READ_SIZE` (optional).
 
 		Returns:
 			Byte array of the extracted data.
@@ -239,17 +369,100 @@ class Flash(FlashController.FlashControllerBase):
 			raise OutOfRangeException(self.flash_address_range, address)
 
 		self.LOG.debug('Flash read: '+str(FlashController.AddressRange(address, length)))
-		ret = self._read_block(address, length)
+		if progress is None:
+			return self._read_block(address, length)
 
+		ret = bytearray()
+		for offset in range(0, length, self.PROGRESS_READ_SIZE):
+			ret += self._read_block(address + offset, min(self.PROGRESS_READ_SIZE, length - offset))
+			progress.advance(min(self.PROGRESS_READ_SIZE, length - offset))
 		return ret
 
 
-	def program_flash(self, data, address=None):
+	def read_page(self, page_address):
+		"""Reads the current contents of a flash page.
+
+		Args:
+			page_address -- Absolute address of the page.
+
+		Returns:
+			Byte array of the page contents.
+		"""
+
+		self.LOG.debug('Flash read page: '+str(FlashController.AddressRange(page_address, self.flash_address_range.page_size)))
+		return self._read_block(page_address, self.flash_address_range.page_size)
+
+
+	def plan_page(self, chunk_address, chunk_data, page):
+		"""Plans the write of a chunk of data within a single flash page. This
+		   only works on host data, the page contents are read beforehand with
+		   `read_page`.
+
+		Args:
+			chunk_address -- Absolute address of the chunk.
+			chunk_data    -- Chunk data, not crossing the page boundary.
+			page          -- Current contents of the page.
+
+		Returns:
+			`None` if the page already holds the data, or a tuple of
+			(address, words, command) for `write_page`.
+		"""
+
+		page_size = self.flash_address_range.page_size
+		offset = chunk_address % page_size
+		buff = page[offset : offset + len(chunk_data)]
+		if self._is_equal(chunk_data, buff):
+			self.LOG.info('Flash compare: equals, not need to write: '+str(FlashController.AddressRange(chunk_address, len(chunk_data))))
+			return None
+
+		# checks it's needs to turn from 0 to 1 for any bit
+		new_bits = int.from_bytes(bytes(bytearray(chunk_data)), 'little')
+		need_erase = int.from_bytes(bytes(buff), 'little') & new_bits != new_bits
+		# align: 32 bit words or page size, padded with the current page contents
+		align_bytes = page_size if need_erase else 4
+		start = offset - offset % align_bytes
+		end = offset + len(chunk_data)
+		end += -end % align_bytes
+		data = bytearray(page[start : end])
+		data[offset - start : offset - start + len(chunk_data)] = bytearray(chunk_data)
+		# 32-bit words must be written continuously, in either ascending or descending order.
+		words = struct.unpack('<%dI' % (len(data) // 4), bytes(data))
+		return (chunk_address - offset + start, words, 'EWP' if need_erase else 'WP')
+
+
+	def write_page(self, plan):
+		"""Writes a flash page as planned by `plan_page`, and verifies it.
+
+		Args:
+			plan -- Tuple of (address, words, command).
+		"""
+
+		address, words, command = plan
+		# write to page buffer with 32 bit words
+		with Profiler.phase('latch fill'):
+			for i, word in enumerate(words):
+				self.samba.write_word(address + 4 * i, word)
+		with Profiler.phase('flash busy wait'):
+			self._command(command, address // self.flash_address_range.page_size)
+			self._wait_while_busy()
+		# check the chunk
+		with Profiler.phase('verify'):
+			verified = self.verify_flash(struct.pack('<%dI' % len(words), *words), address)
+		if not verified:
+			raise FlashController.WriteException(address, self.flash_address_range.page_size)
+
+
+	def program_flash(self, data, address=None, journal=None, verify=True, progress=None):
 		"""Writes the data to flash.
 
 		Args:
 			data -- Data to write.
 			address -- Absolute address to write to. If `None` write from start of flash.
+			journal -- `ProgrammingJournal` of confirmed pages. Confirmed pages are
+			           skipped, newly verified pages are recorded in it.
+			verify -- Verify the entire data once written (each written page is
+			          always verified).
+			progress -- `Progress` advanced by each page (optional).
 		"""
 
 		if address is None:
@@ -266,62 +479,107 @@ class Flash(FlashController.FlashControllerBase):
 		self._wait_while_busy()
 		start_timestamp = time()
 		for (chunk_address, chunk_data) in self._chunk(self.flash_address_range.page_size, address, data):
-			# write to page
-			self.LOG.debug('Flash read & compare: '+str(FlashController.AddressRange(chunk_address, len(chunk_data))))
-			buff = self._read_block(chunk_address, len(chunk_data))
-			if self._is_equal(chunk_data, buff):
-				self.LOG.info('Flash compare: equals, not need to write: '+str(FlashController.AddressRange(chunk_address, len(chunk_data))))
-			else:
-				# checks it's needs to turn from 0 to 1 for any bit
-				need_erase = False
-				for i in range(len(buff)):
-					if buff[i] & chunk_data[i] != chunk_data[i]:
-						need_erase = True
-						break
-				# align: 32 bit words or page size
-				align_bytes = self.flash_address_range.page_size if need_erase else 4
-				# check chunk data for aligned boundary
-				if chunk_address % align_bytes != 0:
-					# start of chunk data not aligned # add bytes to chunk data
-					new_address = chunk_address - chunk_address % align_bytes
-					buff = self._read_block(new_address, chunk_address % align_bytes)
-					chunk_data = list(buff) + chunk_data
-					chunk_address = new_address
-				# now chunk_address is aligned
-				if len(chunk_data) % align_bytes != 0:
-					# end of chunk data not aligned
-					buff = self._read_block(chunk_address + len(chunk_data), align_bytes - len(chunk_data) % align_bytes)
-					chunk_data += list(buff)
-				# now chunk_address & chunk_data is aligned
-				# write to page buffer with 32 bit words
-				for i in range(0, len(chunk_data), 4):
-					buff = chunk_data[i] | chunk_data[i + 1] << 8 | chunk_data[i + 2] << 16 | chunk_data[i + 3] << 24
-					self.samba.write_word(chunk_address + i, buff)
-				self._command('EWP' if need_erase else 'WP', chunk_address // self.flash_address_range.page_size)
-				self._wait_while_busy()
-				# check the chunk
-				if not self.verify_flash(chunk_data, chunk_address):
-					raise Exception('Flash write error: page address [0x{:08X}..0x{:08X}]'.format(chunk_address, chunk_address + self.flash_address_range.page_size))
+			page_address = chunk_address - chunk_address % self.flash_address_range.page_size
+			if journal and journal.is_confirmed(page_address):
+				self.LOG.debug('Flash page confirmed by journal, skipped: '+str(FlashController.AddressRange(chunk_address, len(chunk_data))))
+				if progress:
+					progress.advance(len(chunk_data), False)
+				continue
+			with Profiler.phase('read-compare'):
+				plan = self.plan_page(chunk_address, chunk_data, self.read_page(page_address))
+			if plan is not None:
+				self.write_page(plan)
+			if journal:
+				journal.confirm(page_address)
+			if progress:
+				progress.advance(len(chunk_data), plan is not None)
 
 		self.LOG.info('Flash was wrote for {:.3f}s'.format(time() - start_timestamp))
 
+		if journal or not verify:
+			# every written page was verified already
+			return True
+
 		# check the entire data
-		return self.verify_flash(data, address)
+		with Profiler.phase('verify'):
+			return self.verify_flash(data, address)
+
 
+	def erase_flash(self, start_address=None, wait=False):
+		"""Erases the flash: entire plane, sector, page. Now support entire plane only (`start_address=None`)
 
-	def erase_flash(self, start_address=None):
-		"""Erases the flash: entire plane, sector, page. Now support entire plane only (`start_address=None`)"""
+		Args:
+			start_address -- Start address to erase (`None` for the entire plane).
+			wait          -- Wait until the erase completed.
+		"""
 		if start_address is not None:
 			raise Exception('Erase sector or page not supported yet')
 		self._command('EA')
+		# the erased pages are not read again to be compared before they are written
+		self._mark_erased(self.samba, self.flash_address_range.start, self.flash_address_range.length)
+		if wait:
+			self.wait_for_erase([self])
+
+
+	def get_erase_timeout(self):
+		"""Calculates the timeout of the erase of the entire plane, from its size.
+
+		Returns:
+			Timeout (double), s
+		"""
+
+		return self.ERASE_TIMEOUT_MIN + self.ERASE_TIME_PER_KB * self.flash_address_range.length / 1024
+
+
+	@staticmethod
+	def wait_for_erase(flash_controllers, progress=None):
+		"""Waits until the erase of flash planes completed. The planes are
+		   erased concurrently once their `EA` commands were issued, so their
+		   status registers are polled together, and the wait lasts as long as
+		   the slowest plane.
+
+		Args:
+			flash_controllers -- EEFC instances of the erased planes of a device.
+			progress          -- `Progress` advanced by each erased plane (optional).
+		"""
+
+		pending = list(flash_controllers)
+		if not pending:
+			return
+		samba = pending[0].samba
+		timeout = max(flash_controller.get_erase_timeout() for flash_controller in pending)
+		start_timestamp = time()
+		while True:
+			transaction = Transaction()
+			for flash_controller in pending:
+				transaction.read_word(flash_controller.regs_base_address + flash_controller.FSR_OFFSET)
+			results = samba.execute(transaction)
+
+			for flash_controller, fsr in list(zip(pending, results)):
+				if fsr & flash_controller.FSR_MASK['FRDY'] == 0:
+					continue
+				pending.remove(flash_controller)
+				reg = fsr & ~flash_controller.FSR_MASK['FRDY'] & 0xF
+				if reg:
+					raise CommandException(flash_controller.regs_base_address + flash_controller.FSR_OFFSET, reg)
+				flash_controller.LOG.debug('Flash erased in {:.3f}s: {}'.format(time() - start_timestamp, flash_controller.flash_address_range))
+				if progress:
+					progress.advance(flash_controller.flash_address_range.length)
+			if not pending:
+				return
+
+			if time() - start_timestamp >= timeout:
+				raise Exception('Flash busy: erase timeout. FSR: ' + ', '.join(
+					'0x{:08X}'.format(fsr) for fsr in results))
+			sleep(Flash.ERASE_POLL_INTERVAL)
 
 
-	def verify_flash(self, data, address=None):
+	def verify_flash(self, data, address=None, progress=None):
 		"""Verifies the flash data with a reference data"""
 		if address is None:
 			address = self.flash_address_range.start
 		self.LOG.debug('Flash verify: '+str(FlashController.AddressRange(address, len(data))))
-		buff = self.read_flash(address, len(data))
+		buff = self.read_flash(address, len(data), progress)
 		ret = self._is_equal(buff, data)
 		if ret:
 			self.LOG.info('Flash verify '+str(FlashController.AddressRange(address, len(data)))+': OK')
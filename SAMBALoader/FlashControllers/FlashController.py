@@ -25,6 +25,15 @@ class OutOfRangeException(Exception):
 				str(self.flash_address_range), self.address)
 
 
+class WriteException(Exception):
+	def __init__(self, address, length):
+		self.address, self.length = address, length
+
+
+	def __str__(self):
+		return 'Flash write error: page address [0x{:08X}..0x{:08X}]'.format(self.address, self.address + self.length)
+
+
 class AddressRange():
 	def __init__(self, start, length, page_size=None):
 		self.start, self.length = start, length
@@ -137,27 +146,71 @@ class FlashControllerBase(object):
 			write.
 		"""
 
-		chunk = []
+		offset = 0
+		while offset < len(data):
+			chunk_length = min(flash_page_size - (address + offset) % flash_page_size, len(data) - offset)
+			yield (address + offset, list(data[offset : offset + chunk_length]))
+			offset += chunk_length
+
 
-		for offset in range(len(data)):
-			if offset and (address + offset) % flash_page_size == 0:
-				yield (address, chunk)
+	@staticmethod
+	def _invalidate(samba, address=None, length=1):
+		"""Helper method for subclasses; drops the cached device memory changed
+		   by a flash operation, if `samba` is a `DeviceMemory` cache.
+
+		Args:
+			samba   -- `SAMBA` or `DeviceMemory` instance bound to the device.
+			address -- Start address of the changed range (everything if `None`).
+			length  -- Length of the changed range.
+		"""
 
-				address += flash_page_size
-				chunk = []
+		invalidate = getattr(samba, 'invalidate', None)
+		if invalidate is not None:
+			invalidate(address, length)
 
-			chunk.append(data[offset])
 
-		if len(chunk):
-			yield (address, chunk)
+	def invalidate(self, samba, address=None, length=1):
+		"""Drops the cached device memory of a range of flash whose contents
+		   are unknown, e.g. after a failed write.
+
+		Args:
+			samba   -- `SAMBA` or `DeviceMemory` instance bound to the device.
+			address -- Start address of the range (everything if `None`).
+			length  -- Length of the range.
+		"""
+
+		self._invalidate(samba, address, length)
+
+
+	@staticmethod
+	def _mark_erased(samba, address, length):
+		"""Helper method for subclasses; records a range of flash as erased,
+		   if `samba` is a `DeviceMemory` cache, so that it is not read again
+		   to be compared before it is written.
+
+		Args:
+			samba   -- `SAMBA` or `DeviceMemory` instance bound to the device.
+			address -- Start address of the erased range.
+			length  -- Length of the erased range.
+		"""
+
+		mark_erased = getattr(samba, 'mark_erased', None)
+		if mark_erased is not None:
+			mark_erased(address, length)
 
 
 	@staticmethod
 	def _is_equal(buff1, buff2):
-		for i in range(len(buff1)):
-			if buff1[i] != buff2[i]:
-				return False
-		return True
+		return bytearray(buff1) == bytearray(buff2[:len(buff1)])
+
+
+	@staticmethod
+	def _is_blank(buff):
+		"""Helper method for subclasses; checks whether data is all 0xFF, as
+		   erased flash.
+		"""
+
+		return bytearray(buff).count(0xFF) == len(buff)
 
 
 	@abc.abstractmethod
@@ -171,33 +224,38 @@ class FlashControllerBase(object):
 
 
 	@abc.abstractmethod
-	def erase_flash(self, start_address=None):
+	def erase_flash(self, start_address=None, wait=False):
 		"""Erases the device's application area in the specified region.
 
 		Args:
 			start_address -- Start address to erase (if `None` then start address of flash).
+			wait          -- Wait until the erase completed.
 		"""
 		pass
 
 
 	@abc.abstractmethod
-	def program_flash(self, data, address=None):
+	def program_flash(self, data, address=None, journal=None, verify=True, progress=None):
 		"""Program's the device's application area.
 
 		Args:
-			data    -- Data to program into the device.
-			address -- Address to programm from (if `None` then start address of flash).
+			data     -- Data to program into the device.
+			address  -- Address to programm from (if `None` then start address of flash).
+			journal  -- `ProgrammingJournal` of confirmed pages, which are skipped (optional).
+			verify   -- Verify the entire data once written.
+			progress -- `Progress` advanced by each page (optional).
 		"""
 		pass
 
 
 	@abc.abstractmethod
-	def verify_flash(self, data, address=None):
+	def verify_flash(self, data, address=None, progress=None):
 		"""Verifies the device's application area against a reference data set.
 
 		Args:
-			address -- Address to verify from (if `None` then start address of flash).
-			data    -- Data to verify against.
+			address  -- Address to verify from (if `None` then start address of flash).
+			data     -- Data to verify against.
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			`None` if the given data matches the data in the device at the
@@ -208,13 +266,14 @@ class FlashControllerBase(object):
 
 
 	@abc.abstractmethod
-	def read_flash(self, address=None, length=None):
+	def read_flash(self, address=None, length=None, progress=None):
 		"""Reads the device's application area.
 
 		Args:
-			address -- Address to read from (if `None` then start address of flash).
-			length  -- Length of the data to extract (or until end of
+			address  -- Address to read from (if `None` then start address of flash).
+			length   -- Length of the data to extract (or until end of
 					application area if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			Byte array of the extracted data.
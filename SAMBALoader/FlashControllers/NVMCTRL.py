@@ -111,14 +111,18 @@ class NVMCTRL(FlashController.FlashControllerBase):
 			self._command(samba, self.CTRLA_CMDA['ER'])
 			self._wait_while_busy(samba)
 
+		self._invalidate(samba, start_address, end_address - start_address)
 
-	def program_flash(self, samba, address, data):
+
+	def program_flash(self, samba, address, data, journal=None, progress=None):
 		"""Program's the device's application area.
 
 		Args:
 			samba   -- Core `SAMBA` instance bound to the device.
 			address -- Address to program from.
 			data    -- Data to program into the device.
+			journal -- `ProgrammingJournal` of confirmed pages, which are skipped (optional).
+			progress -- `Progress` advanced by each page (optional).
 		"""
 
 		self._get_nvm_params(samba)
@@ -129,22 +133,34 @@ class NVMCTRL(FlashController.FlashControllerBase):
 		self._wait_while_busy(samba)
 
 		for (chunk_address, chunk_data) in self._chunk(self.page_size, address, data):
+			page_address = chunk_address - chunk_address % self.page_size
+			if journal and journal.is_confirmed(page_address):
+				if progress:
+					progress.advance(len(chunk_data), False)
+				continue
+
 			for offset in range(0, len(chunk_data), 4):
 				word = sum([x << (8 * i) for i, x in enumerate(chunk_data[offset : offset + 4])])
 				samba.write_word(chunk_address + offset, word)
 
 			self._command(samba, self.CTRLA_CMDA['WP'])
 			self._wait_while_busy(samba)
+
+			if journal and self.verify_flash(samba, chunk_address, chunk_data) is None:
+				journal.confirm(page_address)
+			if progress:
+				progress.advance(len(chunk_data), True)
 		return True
 
 
-	def verify_flash(self, samba, address, data):
+	def verify_flash(self, samba, address, data, progress=None):
 		"""Verifies the device's application area against a reference data set.
 
 		Args:
-			samba   -- Core `SAMBA` instance bound to the device.
-			address -- Address to verify from.
-			data    -- Data to verify against.
+			samba    -- Core `SAMBA` instance bound to the device.
+			address  -- Address to verify from.
+			data     -- Data to verify against.
+			progress -- `Progress` advanced by each page (optional).
 
 		Returns:
 			`None` if the given data matches the data in the device at the
@@ -162,16 +178,20 @@ class NVMCTRL(FlashController.FlashControllerBase):
 				if actual_word != expected_word:
 					return (chunk_address + offset, actual_word, expected_word)
 
+			if progress:
+				progress.advance(len(chunk_data))
+
 		return None
 
 
-	def read_flash(self, samba, address, length=None):
+	def read_flash(self, samba, address, length=None, progress=None):
 		"""Reads the device's application area.
 
 		Args:
-			samba   -- Core `SAMBA` instance bound to the device.
-			address -- Address to read from.
-			length  -- Length of the data to extract (or until end of application area if `None`).
+			samba    -- Core `SAMBA` instance bound to the device.
+			address  -- Address to read from.
+			length   -- Length of the data to extract (or until end of application area if `None`).
+			progress -- `Progress` advanced once the data is read (optional).
 
 		Returns:
 			Byte array of the extracted data.
@@ -182,4 +202,7 @@ class NVMCTRL(FlashController.FlashControllerBase):
 		if length is None:
 			length = (self.pages * self.page_size) - address
 
-		return samba.read_block(address, length)
+		ret = samba.read_block(address, length)
+		if progress:
+			progress.advance(len(ret))
+		return ret
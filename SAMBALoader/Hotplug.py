@@ -0,0 +1,211 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Detection of SAM-BA devices as they are connected: Linux kernel uevents,
+# or polling of the serial ports list elsewhere.
+
+import collections
+import logging
+import os
+import select
+import socket
+import sys
+from time import time, sleep
+
+
+class HotplugWatcher(object):
+	"""Watches for serial ports of a USB VID:PID being connected. On Linux,
+	   the kernel announces new devices over a netlink socket, so a device is
+	   found as soon as it enumerates; elsewhere, or if netlink is not
+	   available, the serial ports list is polled. Devices are queued in the
+	   order they appear, so several boards connected at once are all served
+	   one after another. Devices already connected when the watcher is
+	   created are queued first.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	POLL_INTERVAL = 0.5 # s
+	NODE_TIMEOUT  = 2.0 # s, wait for udev to make a new device node accessible
+
+	NETLINK_KOBJECT_UEVENT = 15
+	NETLINK_KERNEL_GROUP   = 1
+	NETLINK_BUFFER_SIZE    = 16 * 1024
+
+
+	def __init__(self, vid, pid, use_netlink=True):
+		"""Creates a watcher.
+
+		Args:
+			vid         -- USB vendor ID of the devices to watch for.
+			pid         -- USB product ID of the devices to watch for.
+			use_netlink -- Use kernel uevents where available, `False` to poll.
+		"""
+
+		self.vid = vid
+		self.pid = pid
+		self.devices = collections.deque()
+		# subscribe before listing the present devices, so none is missed
+		self._socket = self._open_netlink() if use_netlink else None
+		self._present = set()
+		for device in sorted(self._list_devices()):
+			self._add_device(device)
+
+
+	def __del__(self):
+		self.close()
+
+
+	def close(self):
+		"""Stops watching."""
+
+		if getattr(self, '_socket', None) is not None:
+			self._socket.close()
+			self._socket = None
+
+
+	def _open_netlink(self):
+		"""Internal helper to subscribe to the kernel uevents.
+
+		Returns:
+			Netlink socket, or `None` if not available.
+		"""
+
+		if not sys.platform.startswith('linux'):
+			return None
+		try:
+			sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self.NETLINK_KOBJECT_UEVENT)
+			sock.bind((0, self.NETLINK_KERNEL_GROUP))
+		except (AttributeError, OSError) as e:
+			self.LOG.info('Kernel uevents not available (%s), polling the serial ports' % e)
+			return None
+		return sock
+
+
+	def _list_devices(self):
+		"""Internal helper to list the serial ports of the watched VID:PID.
+
+		Returns:
+			Set of device paths.
+		"""
+
+		import serial.tools.list_ports
+		return set(p.device for p in serial.tools.list_ports.comports() if p.vid == self.vid and p.pid == self.pid)
+
+
+	def _add_device(self, device):
+		if device in self._present:
+			return
+		self._present.add(device)
+		self.devices.append(device)
+		self.LOG.info('Found USB: {:04X}:{:04X} {}'.format(self.vid, self.pid, device))
+
+
+	def _remove_device(self, device):
+		self._present.discard(device)
+		if device in self.devices:
+			self.devices.remove(device)
+
+
+	def wait(self, timeout=None):
+		"""Waits for the next device connected.
+
+		Args:
+			timeout -- Wait timeout, s, or `None` to wait forever.
+
+		Returns:
+			Device path (e.g. "/dev/ttyACM0"), or `None` on timeout.
+		"""
+
+		deadline = None if timeout is None else time() + timeout
+		while not self.devices:
+			remaining = None if deadline is None else deadline - time()
+			if remaining is not None and remaining <= 0:
+				return None
+			if self._socket is not None:
+				self._receive_uevents(remaining)
+			else:
+				self._poll(remaining)
+		return self.devices.popleft()
+
+
+	def _poll(self, timeout):
+		"""Internal helper to poll the serial ports list once."""
+
+		sleep(self.POLL_INTERVAL if timeout is None else min(self.POLL_INTERVAL, timeout))
+		present = self._list_devices()
+		for device in self._present - present:
+			self._remove_device(device)
+		for device in sorted(present):
+			self._add_device(device)
+
+
+	def _receive_uevents(self, timeout):
+		"""Internal helper to process the kernel uevents received within the
+		   timeout.
+		"""
+
+		if not select.select([self._socket], [], [], timeout)[0]:
+			return
+		while True:
+			try:
+				message = self._socket.recv(self.NETLINK_BUFFER_SIZE, socket.MSG_DONTWAIT)
+			except (BlockingIOError, InterruptedError):
+				return
+			self._process_uevent(message)
+
+
+	def _process_uevent(self, message):
+		"""Internal helper to process a kernel uevent: "ACTION@DEVPATH"
+		   followed by KEY=VALUE fields, separated by NUL characters.
+		"""
+
+		fields = message.decode('utf-8', 'replace').split('\0')
+		event = dict(field.split('=', 1) for field in fields[1:] if '=' in field)
+		if event.get('SUBSYSTEM') != 'tty' or 'DEVNAME' not in event or 'DEVPATH' not in event:
+			return
+
+		device = '/dev/' + event['DEVNAME']
+		if event.get('ACTION') == 'add':
+			if self._get_usb_ids('/sys' + event['DEVPATH']) == (self.vid, self.pid):
+				self._wait_for_node(device)
+				self._add_device(device)
+		elif event.get('ACTION') == 'remove':
+			self._remove_device(device)
+
+
+	@staticmethod
+	def _get_usb_ids(sys_path):
+		"""Internal helper to find the USB VID:PID of a device from sysfs, in
+		   the first parent device having them.
+
+		Returns:
+			Tuple of (vid, pid), or `None` if not a USB device.
+		"""
+
+		path = os.path.realpath(sys_path)
+		while len(path) > len('/sys'):
+			try:
+				with open(os.path.join(path, 'idVendor')) as f:
+					vid = int(f.read(), 16)
+				with open(os.path.join(path, 'idProduct')) as f:
+					pid = int(f.read(), 16)
+				return (vid, pid)
+			except (IOError, ValueError):
+				path = os.path.dirname(path)
+		return None
+
+
+	def _wait_for_node(self, device):
+		"""Internal helper to wait until udev made a new device node
+		   accessible; the kernel announces the device first.
+		"""
+
+		deadline = time() + self.NODE_TIMEOUT
+		while not os.access(device, os.R_OK | os.W_OK) and time() < deadline:
+			sleep(.01)
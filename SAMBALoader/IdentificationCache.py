@@ -0,0 +1,115 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+import json
+import logging
+import os
+
+
+class IdentificationCache(object):
+	"""Persistent cache of chip identification results, keyed by the device
+	   (USB serial number or port path) and its CPUID value. A cache entry
+	   records the identified part and which chip identifier register, at
+	   which address, identified it, so that the next connection only has to
+	   read that one register to confirm the part.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+
+	def __init__(self, path=None):
+		"""Opens an identification cache.
+
+		Args:
+			path -- Cache file path (default: `get_default_path()`).
+		"""
+
+		self.path = path or self.get_default_path()
+		self.entries = None
+
+
+	@staticmethod
+	def get_default_path():
+		"""Retrieves the default cache file path for the current user."""
+
+		directory = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+		return os.path.join(directory, 'sambaloader', 'identification.json')
+
+
+	@staticmethod
+	def _make_key(device_id, cpuid):
+		return '{}|{:08X}'.format(device_id, cpuid)
+
+
+	def _load(self):
+		"""Internal helper to load the cache file on first use."""
+
+		if self.entries is not None:
+			return
+		try:
+			with open(self.path, 'r') as f:
+				self.entries = json.load(f)
+		except (IOError, OSError, ValueError):
+			self.entries = dict()
+
+
+	def lookup(self, device_id, cpuid):
+		"""Looks up the identification of a device.
+
+		Args:
+			device_id -- Device identifier (USB serial number or port path).
+			cpuid     -- CPUID register value read from the device.
+
+		Returns:
+			Tuple of (part name, identifier name, identifier address), or
+			`None` if the device is not in the cache.
+		"""
+
+		self._load()
+		entry = self.entries.get(self._make_key(device_id, cpuid))
+		if entry is None:
+			return None
+		return (entry['part'], entry['identifier'], entry['address'])
+
+
+	def store(self, device_id, cpuid, part_name, identifier_name, identifier_address):
+		"""Stores the identification of a device.
+
+		Args:
+			device_id          -- Device identifier (USB serial number or port path).
+			cpuid              -- CPUID register value read from the device.
+			part_name          -- Name of the identified part.
+			identifier_name    -- Name of the chip identifier register (e.g. 'CHIPID').
+			identifier_address -- Address of the chip identifier register.
+		"""
+
+		self._load()
+		self.entries[self._make_key(device_id, cpuid)] = {
+			'part'       : part_name,
+			'identifier' : identifier_name,
+			'address'    : identifier_address,
+		}
+		try:
+			directory = os.path.dirname(self.path)
+			if not os.path.isdir(directory):
+				os.makedirs(directory)
+			temp_path = self.path + '.tmp'
+			with open(temp_path, 'w') as f:
+				json.dump(self.entries, f, indent=1, sort_keys=True)
+			os.replace(temp_path, self.path)
+		except (IOError, OSError) as e:
+			self.LOG.warning('Can\'t write identification cache \'%s\': %s' % (self.path, e))
+
+
+	def remove(self, device_id, cpuid):
+		"""Removes a stale entry from the cache (it is not written back until
+		   the next `store`).
+		"""
+
+		self._load()
+		self.entries.pop(self._make_key(device_id, cpuid), None)
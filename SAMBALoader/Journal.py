@@ -0,0 +1,159 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+import hashlib
+import logging
+import os
+
+
+class ProgrammingJournal(object):
+	"""On-disk journal of the flash pages confirmed written during a
+	   programming job, so that an interrupted job can be resumed from the
+	   first unconfirmed page. A journal is bound to a single device (by its
+	   unique identifier) and a single image (by its hash); a journal for any
+	   other device or image is discarded.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	HEADER = 'SAMBALoader journal v1'
+
+	# Number of confirmed pages between journal syncs to disk
+	FSYNC_INTERVAL = 64
+
+
+	def __init__(self, path, device_id, image_hash, resume=False):
+		"""Opens a programming journal.
+
+		Args:
+			path       -- Journal file path.
+			device_id  -- Unique identifier of the device, as a string.
+			image_hash -- Hash of the image being programmed (see `image_hash`).
+			resume     -- If `True`, pages confirmed by an existing matching
+			              journal are kept, otherwise the journal is restarted.
+		"""
+
+		self.path = path
+		self.header = '{} {} {}\n'.format(self.HEADER, device_id, image_hash)
+		self.confirmed = set()
+		self._unsynced = 0
+
+		if resume:
+			self._load()
+			if self.confirmed:
+				self.LOG.info('Resuming from journal \'%s\': %d page(s) already confirmed' % (self.path, len(self.confirmed)))
+			self.file = open(self.path, 'a')
+		else:
+			self.file = open(self.path, 'w')
+
+		if self.file.tell() == 0:
+			self.file.write(self.header)
+			self._sync()
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+	@staticmethod
+	def image_hash(data, address=None):
+		"""Calculates the hash that identifies an image in a journal.
+
+		Args:
+			data    -- Image data.
+			address -- Address the image is programmed to.
+
+		Returns:
+			Hash of the image and its address, as a hex string.
+		"""
+
+		h = hashlib.sha256(bytearray(data))
+		h.update(str(address).encode('ascii'))
+		return h.hexdigest()
+
+
+	def _load(self):
+		"""Internal helper to load confirmed pages from an existing journal,
+		   if it matches the current device and image.
+		"""
+
+		try:
+			with open(self.path, 'r') as f:
+				if f.readline() != self.header:
+					self.LOG.warning('Journal \'%s\' is for another device or image, restarting' % self.path)
+					os.remove(self.path)
+					return
+				for line in f:
+					# a torn last line is ignored
+					if line.endswith('\n'):
+						self.confirmed.add(int(line, 16))
+		except (IOError, OSError):
+			pass
+
+
+	def _sync(self):
+		"""Internal helper to flush and sync the journal file to disk."""
+
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		self._unsynced = 0
+
+
+	def is_confirmed(self, page_address):
+		"""Determines if a page has already been confirmed written.
+
+		Args:
+			page_address -- Absolute address of the flash page.
+
+		Returns:
+			`True` if the page is recorded as written and verified.
+		"""
+
+		return page_address in self.confirmed
+
+
+	def confirm(self, page_address):
+		"""Records a page as written and verified. The journal is synced to
+		   disk every `FSYNC_INTERVAL` pages.
+
+		Args:
+			page_address -- Absolute address of the flash page.
+		"""
+
+		if page_address in self.confirmed:
+			return
+
+		self.confirmed.add(page_address)
+		self.file.write('{:08X}\n'.format(page_address))
+
+		self._unsynced += 1
+		if self._unsynced >= self.FSYNC_INTERVAL:
+			self._sync()
+
+
+	def close(self):
+		"""Syncs and closes the journal, keeping it on disk for a later resume."""
+
+		if not self.file.closed:
+			self._sync()
+			self.file.close()
+
+
+	def remove(self):
+		"""Closes and deletes the journal, once the job has completed."""
+
+		if not self.file.closed:
+			self.file.close()
+		try:
+			os.remove(self.path)
+		except OSError:
+			pass
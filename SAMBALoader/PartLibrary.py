@@ -7,21 +7,22 @@
 #
 
 import logging
-from . import Parts
 from . import ChipIdentifiers
-from . import FlashControllers
+from .Parts.Part import PartDefinition
+from .Parts.PartTable import PART_TABLE, IDENTIFIER_MASKS
 
 
-def _get_subclasses(classname):
-	"""Recursively obtains all subclasses of the given class."""
+def _build_registry(parts):
+	"""Indexes part definitions by their (identifier name, identifier value)
+	   key, so that a part is resolved in a single lookup.
+	"""
 
-	subclasses = []
+	registry = dict()
 
-	for p in classname.__subclasses__():
-		subclasses.append(p)
-		subclasses.extend(_get_subclasses(p))
+	for p in parts:
+		registry.setdefault((p.identifier, p.chip_id), []).append(p)
 
-	return subclasses
+	return registry
 
 
 class CannotRecognizeChipException(Exception):
@@ -50,7 +51,11 @@ class PartLibrary(object):
 	   methods to retrieve a given part by its chip identifiers, or by name.
 	"""
 
-	SUPPORTED_PARTS = _get_subclasses(Parts.PartBase)
+	SUPPORTED_PARTS = [PartDefinition(*entry) for entry in PART_TABLE]
+
+	_REGISTRY = _build_registry(SUPPORTED_PARTS)
+
+	_NAMES = dict((p.get_name(), p) for p in SUPPORTED_PARTS)
 
 	LOG = logging.getLogger(__name__)
 
@@ -64,15 +69,23 @@ class PartLibrary(object):
 
 
 	@staticmethod
-	def get_chip_ids(samba, addresses=None):
+	def get_chip_ids(samba, addresses=None, cache=None, device_id=None):
 		"""Reads out the chip identifiers from the attached device. Note that
 		   each device usually implements only a single one of the chip
 		   identifier modules, thus all but one value will essentially read as
 		   garbage.
 
+		   If an `IdentificationCache` holds an entry for the device, only the
+		   CPUID and the cached chip identifier register are read to confirm
+		   the cached part; the full probe is only run on a cache miss or a
+		   mismatch, and its result is stored in the cache.
+
 		Args:
 			samba     -- Core `SAMBA` instance bound to the device.
 			addresses -- Dict: { REGISTER_NAME : REGISTER_ADDRESS, }. If `None`: DEFAULT_ADDRESSES
+			cache     -- `IdentificationCache` instance (optional).
+			device_id -- Identifier of the device in the cache (USB serial
+			             number or port path); caching is disabled if `None`.
 
 		Returns:
 			Dictionary of `{name, identifiers}` for each chip identifier,
@@ -92,16 +105,45 @@ class PartLibrary(object):
 			raise CannotRecognizeChipException(register_name=register_name, register_addresses=register_addresses)
 
 
+		def confirm_cached_identifier(cpuid):
+			cached = cache.lookup(device_id, cpuid)
+			if cached is None:
+				return False
+			part_name, register_name, register_address = cached
+			reg = getattr(ChipIdentifiers, register_name)(base_address=register_address)
+			identifiers[register_name] = reg
+			if reg.read(samba) and part_name in [p.get_name() for p in PartLibrary.find_by_chip_ids(identifiers)]:
+				PartLibrary.LOG.debug('Identification cache hit: %s' % part_name)
+				return True
+			PartLibrary.LOG.info('Identification cache mismatch for %s, probing' % device_id)
+			del identifiers[register_name]
+			cache.remove(device_id, cpuid)
+			return False
+
+
 		identifiers = dict()
 
 		create_identifier_register(ChipIdentifiers.CPUID, 'CPUID')
+		cpuid = identifiers['CPUID'].chip_id
+
+		if cache is not None and device_id is not None and not addresses:
+			if confirm_cached_identifier(cpuid):
+				return identifiers
 
 		if identifiers['CPUID'].part in identifiers['CPUID'].PART:
 			# Cortex-M0 devices have a DSU for additional information, others use a CHIPID
 			if 'M0' in identifiers['CPUID'].PART[identifiers['CPUID'].part]:
-				create_identifier_register(ChipIdentifiers.DSU, 'DSU')
+				register_name = 'DSU'
+				create_identifier_register(ChipIdentifiers.DSU, register_name)
 			else:
-				create_identifier_register(ChipIdentifiers.CHIPID, 'CHIPID')
+				register_name = 'CHIPID'
+				create_identifier_register(ChipIdentifiers.CHIPID, register_name)
+
+			if cache is not None and device_id is not None:
+				matched_parts = PartLibrary.find_by_chip_ids(identifiers)
+				if len(matched_parts) == 1:
+					cache.store(device_id, cpuid, matched_parts[0].get_name(),
+						register_name, identifiers[register_name].base_address)
 
 		return identifiers
 
@@ -116,7 +158,7 @@ class PartLibrary(object):
 		Returns:
 			List of all parts whose name contains the search string.
 		"""
-		return [p for p in PartLibrary.SUPPORTED_PARTS if p.get_name() == name]
+		return [PartLibrary._NAMES[name]] if name in PartLibrary._NAMES else []
 
 
 	@staticmethod
@@ -131,4 +173,12 @@ class PartLibrary(object):
 		Returns:
 			List of all parts which match against the chip identifiers.
 		"""
-		return [p for p in PartLibrary.SUPPORTED_PARTS if p.identify(chip_ids)]
+
+		matched_parts = []
+
+		for name, identifier in chip_ids.items():
+			if name in IDENTIFIER_MASKS:
+				key = (name, identifier.chip_id & IDENTIFIER_MASKS[name])
+				matched_parts.extend(PartLibrary._REGISTRY.get(key, []))
+
+		return matched_parts
@@ -8,6 +8,8 @@
 
 from . import Part
 from .. import FlashControllers
+from .. import Peripheral
+from ..DeviceMemory import MemoryRegion
 
 
 class CortexM0p(Part.PartBase):
@@ -15,42 +17,18 @@ class CortexM0p(Part.PartBase):
 
 	# FLASH_CONTROLLER   = FlashControllers.NVMCTRL(base_address=0x41004000)
 
+	SERIAL_NUMBER_ADDRESSES = (0x0080A00C, 0x0080A040, 0x0080A044, 0x0080A048)
+
+	DSU_BASE_ADDRESS = 0x41002000
+	DSU_UNPROTECT    = None # (address, value) clearing the DSU write protection; `None` if unknown
+
 	BOOTLOADER_SIZE    = 2048
 	FLASH_BASE_ADDRESS = 0x00000000
 	FLASH_APP_ADDRESS  = FLASH_BASE_ADDRESS + BOOTLOADER_SIZE
 
 
-	@classmethod
-	def get_name(cls):
-		"""Retrieves the part name as a string. This extracts out the actual
-		   class name of the sub-classed parts, on the assumption that all
-		   subclasses of this class will be a specific SAM part (e.g.
-		   SAMD20J18A).
-
-		   Returns:
-			   Name of the SAM part, as a string.
-		"""
-		return '' if cls is CortexM0p else cls.__name__
-
-
-	@staticmethod
-	def identify(ids):
-		"""Determines if a device matches the given ID values that have been
-		   extracted from the part via a `ChipIdentifier` module. This is a
-		   common family implementation intended to be sub-classes per-device,
-		   thus this always returns a failed match.
-
-		Args:
-			ids -- dict of chip identifiers being tested { id_name: id_values, }.
-
-		Returns:
-			`False`.
-		"""
-		return False
-
-
-	def __init__(self, samba):
-		self.samba = samba
+	def __init__(self, samba, definition=None):
+		Part.PartBase.__init__(self, samba, definition)
 
 
 	def get_info(self):
@@ -79,35 +57,75 @@ class CortexM0p(Part.PartBase):
 		self.samba.run_from_address(self.FLASH_APP_ADDRESS)
 
 
-	def erase_chip(self, address=None):
+	def erase_chip(self, address=None, progress=None):
 		"""Erases the device's application area. As these SAM devices do not
 		   contain a ROM based SAM-BA bootloader, this is massaged into a range
 		   erase of the flash from the end of the bootloader area to the end of
 		   the flash.
+
+		Args:
+			address  -- Unused, the whole application area is erased.
+			progress -- `Progress` completed once erased (optional).
 		"""
 		self.FLASH_CONTROLLER.erase_flash(self.samba, start_address=self.FLASH_APP_ADDRESS)
+		if progress:
+			progress.advance(progress.total)
+
+
+	def get_memory_map(self):
+		"""Lists the serial number words, which may be cached by `DeviceMemory`.
+
+		Returns:
+			List of `MemoryRegion` instances.
+		"""
+		return [MemoryRegion(address, 4, 4) for address in self.SERIAL_NUMBER_ADDRESSES]
+
+
+	def get_unique_id(self):
+		"""Reads the 128-bit serial number of the device.
+
+		Returns:
+			Serial number, as a hex string.
+		"""
+		return ''.join('{:08X}'.format(self.samba.read_word(a)) for a in self.SERIAL_NUMBER_ADDRESSES)
+
+
+	def get_flash_checksum(self, address, length):
+		"""Calculates the CRC32 of a flash range with the DSU, on the parts
+		   whose DSU write protection is known.
+
+		Returns:
+			CRC32 of the range, or `None` if not supported.
+		"""
+		if self.DSU_UNPROTECT is None:
+			return None
+		return Peripheral.DSU(self.samba, self.DSU_BASE_ADDRESS, self.DSU_UNPROTECT).crc32(address, length)
 
 
-	def program_flash(self, data, address=None):
+	def program_flash(self, data, address=None, journal=None, verify=True, progress=None):
 		"""Program's the device's application area.
 
 		Args:
-			data    -- Data to program into the device.
-			address -- Address to program from (or start of application area if `None`).
+			data     -- Data to program into the device.
+			address  -- Address to program from (or start of application area if `None`).
+			journal  -- `ProgrammingJournal` to resume from and record progress in (optional).
+			verify   -- Unused, the flash controller does not verify written data.
+			progress -- `Progress` advanced by each page (optional).
 		"""
 
 		if address is None:
 			address = self.FLASH_APP_ADDRESS
 
-		self.FLASH_CONTROLLER.program_flash(self.samba, address, data)
+		self.FLASH_CONTROLLER.program_flash(self.samba, address, data, journal, progress)
 
 
-	def verify_flash(self, data, address=None):
+	def verify_flash(self, data, address=None, progress=None):
 		"""Verifies the device's application area against a reference data set.
 
 		Args:
-			data    -- Data to verify against.
-			address -- Address to verify from (or start of application area if `None`).
+			data     -- Data to verify against.
+			address  -- Address to verify from (or start of application area if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			`None` if the given data matches the data in the device at the
@@ -118,15 +136,16 @@ class CortexM0p(Part.PartBase):
 		if address is None:
 			address = self.FLASH_APP_ADDRESS
 
-		return self.FLASH_CONTROLLER.verify_flash(self.samba, address, data)
+		return self.FLASH_CONTROLLER.verify_flash(self.samba, address, data, progress)
 
 
-	def read_flash(self, address=None, length=None):
+	def read_flash(self, address=None, length=None, progress=None):
 		"""Reads the device's application area.
 
 		Args:
-			address -- Address to read from (or start of application area if `None`).
-			length  -- Length of the data to extract (or until end of application area if `None`).
+			address  -- Address to read from (or start of application area if `None`).
+			length   -- Length of the data to extract (or until end of application area if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			Byte array of the extracted data.
@@ -135,4 +154,4 @@ class CortexM0p(Part.PartBase):
 		if address is None:
 			address = self.FLASH_APP_ADDRESS
 
-		return self.FLASH_CONTROLLER.read_flash(self.samba, address, length=length)
+		return self.FLASH_CONTROLLER.read_flash(self.samba, address, length=length, progress=progress)
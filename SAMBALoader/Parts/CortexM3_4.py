@@ -16,35 +16,13 @@ class CortexM3_4(Part.PartBase):
 
 	LOG = logging.getLogger(__name__)
 
-	def __init__(self, samba):
-		self.samba = samba
+	# SRAM free for applets (see `CompressedUpload`): above the variables of
+	# the SAM-BA monitor, within the smallest SRAM of the family
+	APPLET_ADDRESS = 0x20001000
+	APPLET_LENGTH  = 0x7000
 
-
-	@classmethod
-	def get_name(cls):
-		"""Retrieves the part name as a string. This extracts out the actual
-		   class name of the sub-classed parts.
-
-		Returns:
-			Name of the SAM part, as a string (empty string for base classes).
-		"""
-		return '' if cls is CortexM3_4 else cls.__name__
-
-
-	@staticmethod
-	def identify(ids):
-		"""Determines if a device matches the given ID values that have been
-		   extracted from the part via a `ChipIdentifier` module. This is a
-		   common family implementation intended to be sub-classes per-device,
-		   thus this always returns a failed match.
-
-		Args:
-			ids -- dict of chip identifiers being tested { id_name: id_values, }.
-
-		Returns:
-			`False`.
-		"""
-		return False
+	def __init__(self, samba, definition=None):
+		Part.PartBase.__init__(self, samba, definition)
 
 
 	def get_info(self):
@@ -82,58 +60,99 @@ class CortexM3_4(Part.PartBase):
 		self.samba.run_from_address(address)
 
 
-	def erase_chip(self, address=None):
-		"""Erases the flash plane or chip.
+	def erase_chip(self, address=None, progress=None):
+		"""Erases the flash plane or chip. The erase commands of all the planes
+		   are issued first, then the planes are waited for together.
 
 		Args:
-			address -- Address of flash plane to erase (or chip erase if `None`).
+			address  -- Address of flash plane to erase (or chip erase if `None`).
+			progress -- `Progress` advanced by each erased plane (optional).
 		"""
 
-		for flash_controller in self.flash_controllers:
-			if address is None or flash_controller.flash_address_range.is_in_range(address, 0):
-				flash_controller.erase_flash(None)
+		flash_controllers = [flash_controller for flash_controller in self.flash_controllers
+			if address is None or flash_controller.flash_address_range.is_in_range(address, 0)]
+		for flash_controller in flash_controllers:
+			flash_controller.erase_flash(None)
+		FlashControllers.EEFCFlash.Flash.wait_for_erase(flash_controllers, progress)
 
 
-	def program_flash(self, data, address=None):
-		"""Program's the device's application area.
+	def get_memory_map(self):
+		"""Lists the flash planes, which may be cached by `DeviceMemory`.
+
+		Returns:
+			List of `MemoryRegion` instances.
+		"""
+		return [flash_controller.get_memory_region() for flash_controller in self.flash_controllers]
+
+
+	def get_unique_id(self):
+		"""Reads the unique identifier of the device.
+
+		Returns:
+			Unique identifier, as a hex string.
+		"""
+		return ''.join('{:02X}'.format(b) for b in self.flash_controllers[0].read_unique_identifier_area())
+
+
+	def get_flash_chunks(self, data, address=None):
+		"""Splits data between the flash planes it belongs to.
 
 		Args:
-			data    -- Data to program into the device.
-			address -- Address to program from (or start of application area if `None`).
+			data    -- Data to split.
+			address -- Address of the data (or start of flash if `None`).
+
+		Returns:
+			List of (flash_controller, address, data) tuples.
 		"""
 
 		pages_address_and_data = self.flash_address_range.get_page_chunks(data, address)
-		for page_index, page_address_and_data in enumerate(pages_address_and_data):
-			if page_address_and_data:
-				if not self.flash_controllers[page_index].program_flash(page_address_and_data[1], page_address_and_data[0]):
-					return False
+		return [(self.flash_controllers[page_index], page_address_and_data[0], page_address_and_data[1])
+			for page_index, page_address_and_data in enumerate(pages_address_and_data) if page_address_and_data]
+
+
+	def program_flash(self, data, address=None, journal=None, verify=True, progress=None):
+		"""Program's the device's application area.
+
+		Args:
+			data     -- Data to program into the device.
+			address  -- Address to program from (or start of application area if `None`).
+			journal  -- `ProgrammingJournal` to resume from and record progress in (optional).
+			verify   -- Verify the entire data once written.
+			progress -- `Progress` advanced by each page (optional).
+		"""
+
+		for flash_controller, chunk_address, chunk_data in self.get_flash_chunks(data, address):
+			if not flash_controller.program_flash(chunk_data, chunk_address, journal, verify, progress):
+				return False
 		return True
 
 
-	def verify_flash(self, data, address=None):
+	def verify_flash(self, data, address=None, progress=None):
 		"""Verifies the device's application area against a reference data set.
 
 		Args:
-			data    -- Data to verify against.
-			address -- Address to verify from (or start of flash if `None`).
+			data     -- Data to verify against.
+			address  -- Address to verify from (or start of flash if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 		"""
 
 		if address is None:
 			address = self.flash_address_range.start
-		pages_address_and_data = self.flash_address_range.get_page_chunks(address, data)
+		pages_address_and_data = self.flash_address_range.get_page_chunks(data, address)
 		for page_index, page_address_and_data in enumerate(pages_address_and_data):
 			if page_address_and_data:
-				if not self.flash_controllers[page_index].verify_flash(page_address_and_data[1], page_address_and_data[0]):
+				if not self.flash_controllers[page_index].verify_flash(page_address_and_data[1], page_address_and_data[0], progress):
 					return False
 		return True
 
 
-	def read_flash(self, address=None, length=None):
+	def read_flash(self, address=None, length=None, progress=None):
 		"""Reads the device's application area.
 
 		Args:
-			address -- Address to read from (or start of flash if `None`).
-			length  -- Length of the data to extract (or until end of flash if `None`).
+			address  -- Address to read from (or start of flash if `None`).
+			length   -- Length of the data to extract (or until end of flash if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			Byte array of the extracted data.
@@ -143,5 +162,5 @@ class CortexM3_4(Part.PartBase):
 		pages_address_and_length = self.flash_address_range.get_page_addresses(address, length)
 		for page_index, page_address_and_length in enumerate(pages_address_and_length):
 			if page_address_and_length:
-				ret += self.flash_controllers[page_index].read_flash(page_address_and_length[0], page_address_and_length[1])
+				ret += self.flash_controllers[page_index].read_flash(page_address_and_length[0], page_address_and_length[1], progress)
 		return ret
@@ -15,9 +15,72 @@ class CantSetFlashBoot(Exception):
 		Exception.__init__(message)
 
 
+class PartDefinition(object):
+	"""Definition of a supported part, as listed in the part table: the part
+	   name, the family class implementing it, the family parameters and the
+	   chip identifier value which identifies it. Calling a definition creates
+	   the part instance.
+	"""
+
+	def __init__(self, name, family, identifier, chip_id, parameters=(), tested=True):
+		"""Creates a part definition.
+
+		Args:
+			name       -- Part name.
+			family     -- Family class implementing the part, or its name in
+			              the `Parts` package (imported on first use).
+			identifier -- Name of the chip identifier register (e.g. 'CHIPID').
+			chip_id    -- Identifier value, with non-identifying fields masked.
+			parameters -- Tuple of family specific constructor parameters.
+			tested     -- `False` if the part has not been physically tested.
+		"""
+
+		self.name       = name
+		self.family     = family
+		self.identifier = identifier
+		self.chip_id    = chip_id
+		self.parameters = parameters
+		self.tested     = tested
+
+
+	def __repr__(self):
+		return 'PartDefinition({})'.format(self.name)
+
+
+	def __call__(self, samba):
+		"""Creates the part instance bound to the device.
+
+		Args:
+			samba -- Core `SAMBA` instance bound to the device.
+
+		Returns:
+			Part instance.
+		"""
+
+		return self.get_family()(samba, self)
+
+
+	def get_family(self):
+		"""Retrieves the family class implementing the part."""
+
+		if isinstance(self.family, str):
+			from .. import Parts
+			self.family = getattr(Parts, self.family)
+		return self.family
+
+
+	def get_name(self):
+		return self.name
+
+
+	def is_tested(self):
+		return self.tested
+
+
 class PartBase(object):
 	"""Base class for supported SAM-BA devices. Derived instances should
-	   override all methods listed here.
+	   override all methods listed here. Parts are created from their
+	   `PartDefinition`, which is stored in the instance.
 	"""
 
 	__metaclass__ = abc.ABCMeta
@@ -27,6 +90,11 @@ class PartBase(object):
 	PART_UNTESTED = False
 
 
+	def __init__(self, samba, definition=None):
+		self.samba = samba
+		self.definition = definition
+
+
 	def is_tested(self):
 		"""Determines if the current part has been tested (if not, a warning
 		   message should be displayed).
@@ -35,10 +103,11 @@ class PartBase(object):
 			   `True` if the part has been physically verified as working,
 			   `False` otherwise.
 		"""
+		if self.definition is not None:
+			return self.definition.is_tested()
 		return not self.PART_UNTESTED
 
 
-	@abc.abstractmethod
 	def get_name(self):
 		"""Device name, as a short string that can be displayed to the user or
 		   matched against a requested device name.
@@ -46,22 +115,9 @@ class PartBase(object):
 		Returns:
 			Name of the device, as a string.
 		"""
-		pass
-
-
-	@staticmethod
-	@abc.abstractmethod
-	def identify(ids):
-		"""Determines if a device matches the given ID values that have been
-		   extracted from the part via a `ChipIdentifier` module.
-
-		Args:
-			ids -- dict of chip identifiers being tested { id_name: id_values, }.
-
-		Returns:
-			`True` if the part matches the given identifier.
-		"""
-		pass
+		if self.definition is not None:
+			return self.definition.get_name()
+		return type(self).__name__
 
 
 	@abc.abstractmethod
@@ -101,35 +157,74 @@ class PartBase(object):
 
 
 	@abc.abstractmethod
-	def erase_chip(self, samba):
+	def erase_chip(self, samba, progress=None):
 		"""Erases the device's application area.
 
 		Args:
-			samba -- Core `SAMBA` instance bound to the device.
+			samba    -- Core `SAMBA` instance bound to the device.
+			progress -- `Progress` advanced as flash is erased (optional).
+		"""
+		pass
+
+
+	def get_memory_map(self):
+		"""Lists the device memory which only changes when written by the
+		   host, and may be cached by `DeviceMemory`.
+
+		Returns:
+			List of `MemoryRegion` instances.
+		"""
+		return []
+
+
+	@abc.abstractmethod
+	def get_unique_id(self):
+		"""Reads the unique identifier (serial number) of the device.
+
+		Returns:
+			Unique identifier, as a string.
 		"""
 		pass
 
 
+	def get_flash_checksum(self, address, length):
+		"""Calculates the CRC32 of a flash range on the device, where the part
+		   supports it, so that the range can be verified without reading it.
+
+		Args:
+			address -- Start address of the range, a multiple of 4.
+			length  -- Length of the range, a multiple of 4.
+
+		Returns:
+			CRC32 of the range (as `zlib.crc32`), or `None` if not supported.
+		"""
+		return None
+
+
 	@abc.abstractmethod
-	def program_flash(self, samba, data, address=None):
+	def program_flash(self, samba, data, address=None, journal=None, verify=True, progress=None):
 		"""Program's the device's application area.
 
 		Args:
-			samba   -- Core `SAMBA` instance bound to the device.
-			data    -- Data to program into the device.
-			address -- Address to program from (or start of application area if `None`).
+			samba    -- Core `SAMBA` instance bound to the device.
+			data     -- Data to program into the device.
+			address  -- Address to program from (or start of application area if `None`).
+			journal  -- `ProgrammingJournal` to resume from and record progress in (optional).
+			verify   -- Verify the entire data once written.
+			progress -- `Progress` advanced by each page (optional).
 		"""
 		pass
 
 
 	@abc.abstractmethod
-	def verify_flash(self, samba, data, address=None):
+	def verify_flash(self, samba, data, address=None, progress=None):
 		"""Verifies the device's application area against a reference data set.
 
 		Args:
-			samba   -- Core `SAMBA` instance bound to the device.
-			data    -- Data to verify against.
-			address -- Address to verify from (or start of application area if `None`).
+			samba    -- Core `SAMBA` instance bound to the device.
+			data     -- Data to verify against.
+			address  -- Address to verify from (or start of application area if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			`None` if the given data matches the data in the device at the
@@ -140,13 +235,14 @@ class PartBase(object):
 
 
 	@abc.abstractmethod
-	def read_flash(self, samba, address=None, length=None):
+	def read_flash(self, samba, address=None, length=None, progress=None):
 		"""Reads the device's application area.
 
 		Args:
-			samba   -- Core `SAMBA` instance bound to the device.
-			address -- Address to read from (or start of application area if `None`).
-			length  -- Length of the data to extract (or until end of application area if `None`).
+			samba    -- Core `SAMBA` instance bound to the device.
+			address  -- Address to read from (or start of application area if `None`).
+			length   -- Length of the data to extract (or until end of application area if `None`).
+			progress -- `Progress` advanced as the data is read (optional).
 
 		Returns:
 			Byte array of the extracted data.
@@ -0,0 +1,54 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Declarative table of the supported parts. Adding a variant of an existing
+# family only needs a new row here, not a new class.
+
+
+# Mask applied to each chip identifier register value before lookup, removing
+# the fields which do not identify the part (silicon revision etc.)
+IDENTIFIER_MASKS = {
+	'CHIPID' : 0x7FFFFFE0, # remove version (revision A, B) and extension flag
+	'DSU'    : 0xFFBF0000, # keep processor, family & series; remove die, revision & variant
+}
+
+
+# name, family class name, identifier name, masked identifier value, family parameters, tested
+PART_TABLE = (
+	# SAM3A/SAM3X: (flash planes, total flash length in KB)
+	('ATSAM3X8H',   'SAM3X', 'CHIPID', 0x286E0A60, (2, 2 * 256),  False),
+	('ATSAM3X8E',   'SAM3X', 'CHIPID', 0x285E0A60, (2, 2 * 256),  True),
+	('ATSAM3X4E',   'SAM3X', 'CHIPID', 0x285B0960, (2, 2 * 128),  False),
+	('ATSAM3X8C',   'SAM3X', 'CHIPID', 0x284E0A60, (2, 2 * 256),  False),
+	('ATSAM3X4C',   'SAM3X', 'CHIPID', 0x284B0960, (2, 2 * 128),  False),
+	('ATSAM3A8C',   'SAM3X', 'CHIPID', 0x283E0A60, (2, 2 * 256),  False),
+	('ATSAM3A4C',   'SAM3X', 'CHIPID', 0x283B0960, (2, 2 * 128),  False),
+
+	# SAM4S: (flash planes, total flash length in KB)
+	('ATSAM4SD32C', 'SAM4S', 'CHIPID', 0x29A70EE0, (2, 2 * 1024), False),
+	('ATSAM4SD32B', 'SAM4S', 'CHIPID', 0x29970EE0, (2, 2 * 1024), False),
+	('ATSAM4SD16C', 'SAM4S', 'CHIPID', 0x29A70CE0, (2, 1024),     True),
+	('ATSAM4SD16B', 'SAM4S', 'CHIPID', 0x29970CE0, (2, 1024),     False),
+	('ATSAM4SA16C', 'SAM4S', 'CHIPID', 0x28A70CE0, (1, 1024),     False),
+	('ATSAM4SA16B', 'SAM4S', 'CHIPID', 0x28970CE0, (1, 1024),     False),
+	('ATSAM4S16B',  'SAM4S', 'CHIPID', 0x289C0CE0, (1, 1024),     False),
+	('ATSAM4S16C',  'SAM4S', 'CHIPID', 0x28AC0CE0, (1, 1024),     False),
+	('ATSAM4S8B',   'SAM4S', 'CHIPID', 0x289C0AE0, (1, 512),      False),
+	('ATSAM4S8C',   'SAM4S', 'CHIPID', 0x28AC0AE0, (1, 512),      False),
+	('ATSAM4S4C',   'SAM4S', 'CHIPID', 0x28AB09E0, (1, 256),      False),
+	('ATSAM4S4B',   'SAM4S', 'CHIPID', 0x289B09E0, (1, 256),      False),
+	('ATSAM4S4A',   'SAM4S', 'CHIPID', 0x288B09E0, (1, 256),      False),
+	('ATSAM4S2C',   'SAM4S', 'CHIPID', 0x28AB07E0, (1, 128),      False),
+	('ATSAM4S2B',   'SAM4S', 'CHIPID', 0x289B07E0, (1, 128),      False),
+	('ATSAM4S2A',   'SAM4S', 'CHIPID', 0x288B07E0, (1, 128),      False),
+
+	# SAM C/D/L: DSU processor Cortex-M0+, family, series
+	('ATSAMC',      'ATSAMC', 'DSU',   0x11010000, (),            False),
+	('ATSAMD',      'ATSAMD', 'DSU',   0x10000000, (),            True),
+	('ATSAML',      'ATSAML', 'DSU',   0x10820000, (),            False),
+)
@@ -6,11 +6,39 @@
 #         www.fourwalledcubicle.com
 #
 
+import importlib
+
 from .Part import *
-from .CortexM0p import *
-from .SAMC import *
-from .SAMD import *
-from .SAML import *
-from .CortexM3_4 import *
-from .SAM4S import *
-from .SAM3A_X import *
+
+
+# Part family classes and the modules defining them. Families are imported on
+# first use, so that listing or looking up parts does not load every family,
+# flash controller and peripheral module.
+FAMILY_MODULES = {
+	'CortexM0p'  : 'CortexM0p',
+	'ATSAMC'     : 'SAMC',
+	'ATSAMD'     : 'SAMD',
+	'ATSAML'     : 'SAML',
+	'CortexM3_4' : 'CortexM3_4',
+	'SAM4S'      : 'SAM4S',
+	'SAM3X'      : 'SAM3A_X',
+}
+
+
+def __getattr__(name):
+	if name not in FAMILY_MODULES:
+		raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+	importlib.import_module('.' + FAMILY_MODULES[name], __name__)
+
+	# importing a submodule binds it on the package, shadowing the family
+	# classes named like their module
+	for family, module in FAMILY_MODULES.items():
+		module = globals().get(module)
+		if module is not None and hasattr(module, family):
+			globals()[family] = getattr(module, family)
+	return globals()[name]
+
+
+def __dir__():
+	return sorted(set(globals()) | set(FAMILY_MODULES))
@@ -0,0 +1,82 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+import logging
+import time
+
+
+class DSU(object):
+	"""Device Service Unit (DSU) of the Cortex M0+ parts, used for its CRC32
+	   engine: the CRC of a memory range is calculated on the device, without
+	   transferring the data.
+	"""
+
+	CTRL_OFFSET    = 0x00 # Control (8 bit)
+	STATUSA_OFFSET = 0x01 # Status A (8 bit)
+	ADDR_OFFSET    = 0x04 # Address
+	LENGTH_OFFSET  = 0x08 # Length
+	DATA_OFFSET    = 0x0C # Data
+
+	CTRL_CRC     = 1 << 2
+	STATUSA_DONE = 1 << 0
+	STATUSA_BERR = 1 << 2
+
+	CRC_TIMEOUT = 1 # s
+
+
+	LOG = logging.getLogger(__name__)
+
+	def __init__(self, samba, base_address, unprotect=None):
+		"""Initializes a Device Service Unit (DSU) instance.
+
+		Args:
+			samba        -- Core `SAMBA` instance bound to the device
+			base_address -- Absolute base address of the DSU registers
+			unprotect    -- (address, value) register write clearing the
+			                write protection of the DSU, if any
+		"""
+
+		self.samba = samba
+		self.base_address = base_address
+		self.unprotect = unprotect
+
+
+	def crc32(self, address, length):
+		"""Calculates the CRC32 (IEEE 802.3, as `zlib.crc32`) of a memory range.
+
+		Args:
+			address -- Start address of the range, a multiple of 4.
+			length  -- Length of the range, a multiple of 4.
+
+		Returns:
+			CRC32 of the range, or `None` if the DSU reported a bus error
+			(e.g. the range is protected).
+		"""
+
+		if self.unprotect:
+			self.samba.write_word(*self.unprotect)
+		self.samba.write_byte(self.base_address + self.STATUSA_OFFSET, self.STATUSA_DONE | self.STATUSA_BERR)
+		self.samba.write_word(self.base_address + self.DATA_OFFSET, 0xFFFFFFFF)
+		self.samba.write_word(self.base_address + self.ADDR_OFFSET, address)
+		self.samba.write_word(self.base_address + self.LENGTH_OFFSET, length)
+		self.samba.write_byte(self.base_address + self.CTRL_OFFSET, self.CTRL_CRC)
+
+		deadline = time.time() + self.CRC_TIMEOUT
+		while True:
+			status = self.samba.read_byte(self.base_address + self.STATUSA_OFFSET)[0]
+			if status & self.STATUSA_DONE:
+				break
+			if time.time() > deadline:
+				raise Exception('DSU CRC timeout @ 0x{:08X}'.format(address))
+
+		if status & self.STATUSA_BERR:
+			self.LOG.info('DSU CRC [0x{:08X}..0x{:08X}]: bus error'.format(address, address + length))
+			return None
+		ret = ~self.samba.read_word(self.base_address + self.DATA_OFFSET) & 0xFFFFFFFF
+		self.LOG.debug('DSU CRC [0x{:08X}..0x{:08X}]: 0x{:08X}'.format(address, address + length, ret))
+		return ret
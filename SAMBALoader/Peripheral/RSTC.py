@@ -54,7 +54,7 @@ class RSTC(object):
 		"""Writes the mode register."""
 		reg |= self.RSTC_KEY
 		self.LOG.info('RSTC_MR @ 0x{:08X} = 0x{:08X}'.format(self.base_address + self.MR_OFFSET, reg))
-		self.samba.write_word(self.base_address + self.MR_OFFSET)
+		self.samba.write_word(self.base_address + self.MR_OFFSET, reg)
 
 
 	def mode(self):
@@ -0,0 +1,339 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Staged flash programming: page buffers are produced and planned on host
+# threads while the link is busy with the previous pages.
+
+import collections
+import logging
+import queue
+import threading
+from time import time
+
+from . import Transports
+from .Profiler import Profiler
+
+
+class ProgrammingPipeline(object):
+	"""Flash programming job split into three stages, connected by bounded
+	   queues:
+
+	   - produce: splits the image into page buffers, skipping pages already
+	     confirmed by the journal;
+	   - plan:    compares each buffer with the current page contents and
+	     decides whether to skip, write or erase and write it;
+	   - io:      reads the current pages ahead of the planner and writes the
+	     planned pages, in page order.
+
+	   Only the io stage uses the link, so the device is accessed from a single
+	   thread; the produce and plan stages run on their own threads and hide
+	   behind the link waits. The busy time of each stage is reported once the
+	   job completes.
+
+	   A page access that times out or fails its verification does not abort
+	   the job: the link is resynchronized, and the page is read again,
+	   planned again and retried alone, up to `PAGE_RETRIES` times per page and
+	   `RETRY_BUDGET` times per job.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	QUEUE_DEPTH = 8 # pages
+	READ_AHEAD  = 4 # pages read before their plan is needed
+
+	PAGE_RETRIES = 3  # retries of a single page
+	RETRY_BUDGET = 16 # retries of all the pages of a job
+
+	STAGES = ('produce', 'plan', 'io')
+
+	_END = object()
+
+
+	def __init__(self, part, journal=None, progress=None):
+		"""Creates a programming pipeline.
+
+		Args:
+			part     -- Part instance, providing `get_flash_chunks()`.
+			journal  -- `ProgrammingJournal` of confirmed pages (optional).
+			progress -- `Progress` advanced by each page (optional).
+		"""
+
+		self.part     = part
+		self.journal  = journal
+		self.progress = progress
+		self.busy     = collections.OrderedDict((stage, 0.0) for stage in self.STAGES)
+		self.wall     = 0.0
+		self.pages    = 0
+		self.written  = 0
+		self.retries  = 0
+
+
+	def __str__(self):
+		return 'Pipeline: {} pages, {} written, {} retries in {:.3f}s; utilization: {}'.format(
+			self.pages, self.written, self.retries, self.wall,
+			', '.join('{} {:.0%}'.format(stage, u) for stage, u in self.get_utilization().items()))
+
+
+	def get_utilization(self):
+		"""Calculates the share of the job time each stage was busy.
+
+		Returns:
+			Dict of { STAGE : utilization } with values from 0 to 1.
+		"""
+
+		return collections.OrderedDict((stage, busy / self.wall if self.wall else 0.0) for stage, busy in self.busy.items())
+
+
+	def _put(self, output, item):
+		"""Internal helper to queue an item, unless the job was stopped.
+
+		Returns:
+			`True` if the item was queued.
+		"""
+
+		while not self._stop.is_set():
+			try:
+				output.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				pass
+		return False
+
+
+	def _get(self, source):
+		"""Internal helper to take an item from a queue, unless the job was
+		   stopped.
+
+		Returns:
+			The item, or `None` if the job was stopped.
+		"""
+
+		while not self._stop.is_set():
+			try:
+				return source.get(timeout=0.1)
+			except queue.Empty:
+				pass
+		return None
+
+
+	def _produce(self, blocks):
+		"""Produce stage: splits the blocks into page buffers."""
+
+		start = time()
+		try:
+			for address, data in blocks:
+				for controller, chunks_address, chunks_data in self.part.get_flash_chunks(data, address):
+					page_size = controller.flash_address_range.page_size
+					for chunk_address, chunk_data in controller._chunk(page_size, chunks_address, chunks_data):
+						page_address = chunk_address - chunk_address % page_size
+						confirmed = self.journal is not None and self.journal.is_confirmed(page_address)
+						if confirmed:
+							self.LOG.debug('Flash page confirmed by journal, skipped: 0x%08X' % page_address)
+							if self.progress is None:
+								continue
+						self.busy['produce'] += time() - start
+						# confirmed pages only go through for the progress
+						if not self._put(self._pages, (controller, page_address, chunk_address, chunk_data, confirmed)):
+							return
+						start = time()
+			item = self._END
+		except Exception as e:
+			item = e
+		self.busy['produce'] += time() - start
+		self._put(self._pages, item)
+
+
+	def _plan(self):
+		"""Plan stage: decides what to do with each page buffer."""
+
+		while True:
+			item = self._get(self._reads)
+			if item is None:
+				return
+			if not isinstance(item, tuple):
+				# end of job or failure of an earlier stage
+				self._put(self._plans, item)
+				return
+
+			controller, page_address, chunk_address, chunk_data, page = item
+			start = time()
+			try:
+				plan = controller.plan_page(chunk_address, chunk_data, page)
+			except Exception as e:
+				self._put(self._plans, e)
+				return
+			self.busy['plan'] += time() - start
+			if not self._put(self._plans, (controller, page_address, chunk_address, chunk_data, plan)):
+				return
+
+
+	def run(self, blocks):
+		"""Programs blocks of data into flash. Blocks must not share pages.
+
+		Args:
+			blocks -- List of (address, data) tuples.
+		"""
+
+		self._stop   = threading.Event()
+		self._pages  = queue.Queue(self.QUEUE_DEPTH)
+		self._reads  = queue.Queue(self.READ_AHEAD + 1)
+		self._plans  = queue.Queue(self.READ_AHEAD + 1)
+		threads = [
+			threading.Thread(target=self._produce, args=(blocks,), name='pipeline-produce'),
+			threading.Thread(target=self._plan, name='pipeline-plan'),
+		]
+
+		start_timestamp = time()
+		for thread in threads:
+			thread.daemon = True
+			thread.start()
+		try:
+			self._io()
+		finally:
+			self._stop.set()
+			for thread in threads:
+				thread.join()
+			self.wall = time() - start_timestamp
+		self.LOG.info(str(self))
+
+
+	def _io(self):
+		"""IO stage: reads the current pages ahead of the planner, and
+		   executes the plans in page order.
+		"""
+
+		outstanding = 0
+		produced = False
+		while True:
+			item = None
+			if not produced and outstanding < self.READ_AHEAD:
+				try:
+					# only wait for a page buffer if there is nothing to write
+					item = self._pages.get(block=outstanding == 0, timeout=0.1)
+				except queue.Empty:
+					if outstanding == 0:
+						continue
+
+			if item is not None:
+				if isinstance(item, tuple):
+					controller, page_address, chunk_address, chunk_data, confirmed = item
+					if confirmed:
+						self.progress.advance(len(chunk_data), False)
+						continue
+					start = time()
+					with Profiler.phase('read-compare'):
+						page = self._read_page(controller, page_address)
+					self.busy['io'] += time() - start
+					item = (controller, page_address, chunk_address, chunk_data, page)
+					outstanding += 1
+				else:
+					produced = True
+				self._put(self._reads, item)
+				continue
+
+			item = self._plans.get()
+			if item is self._END:
+				return
+			if isinstance(item, Exception):
+				raise item
+
+			controller, page_address, chunk_address, chunk_data, plan = item
+			outstanding -= 1
+			start = time()
+			if plan is not None:
+				self._write_page(controller, page_address, chunk_address, chunk_data, plan)
+				self.written += 1
+			if self.journal:
+				self.journal.confirm(page_address)
+			self.busy['io'] += time() - start
+			self.pages += 1
+			if self.progress:
+				self.progress.advance(len(chunk_data), plan is not None)
+
+
+	@staticmethod
+	def _get_retry_errors():
+		"""Internal helper to list the failures recovered by resynchronizing
+		   the link and retrying the page: timeouts and verify mismatches. Flash
+		   command errors (e.g. a locked region) recur, and are raised at once.
+		   The flash controllers are only imported here, not at startup.
+
+		Returns:
+			Tuple of exception classes.
+		"""
+
+		from .FlashControllers import FlashController
+		return (Transports.TimeoutError, FlashController.WriteException)
+
+
+	def _read_page(self, controller, page_address):
+		"""Internal helper to read the current contents of a page, retrying
+		   it after a failure (see `_recover()`).
+		"""
+
+		attempt = 0
+		while True:
+			try:
+				return controller.read_page(page_address)
+			except self._get_retry_errors() as e:
+				attempt += 1
+				if not self._recover(controller, page_address, attempt, e):
+					raise
+
+
+	def _write_page(self, controller, page_address, chunk_address, chunk_data, plan):
+		"""Internal helper to write a planned page, retrying it after a
+		   failure (see `_recover()`). A failed write may have left the page
+		   erased, half written or even written, so the page is read and
+		   planned again before each retry.
+		"""
+
+		attempt = 0
+		while plan is not None:
+			try:
+				controller.write_page(plan)
+				return
+			except self._get_retry_errors() as e:
+				attempt += 1
+				if not self._recover(controller, page_address, attempt, e):
+					raise
+			page = self._read_page(controller, page_address)
+			plan = controller.plan_page(chunk_address, chunk_data, page)
+		self.LOG.debug('Flash page written before the failure: 0x%08X' % page_address)
+
+
+	def _recover(self, controller, page_address, attempt, error):
+		"""Internal helper to recover from a failed page access: resynchronizes
+		   the link and drops the cached contents of the page, so that the page
+		   can be retried.
+
+		Args:
+			controller   -- Flash controller of the page.
+			page_address -- Absolute address of the page.
+			attempt      -- Number of failures of the page so far.
+			error        -- Exception of the failure.
+
+		Returns:
+			`True` if the page can be retried, `False` if the retries of the
+			page or of the job are exhausted.
+		"""
+
+		if attempt > self.PAGE_RETRIES or self.retries >= self.RETRY_BUDGET:
+			self.LOG.error('Flash page 0x%08X failed, no retry left: %s' % (page_address, str(error) or 'timeout'))
+			return False
+
+		self.retries += 1
+		self.LOG.warning('Flash page 0x%08X failed (%s), retry %d of %d' % (page_address, str(error) or 'timeout', attempt, self.PAGE_RETRIES))
+		with Profiler.phase('resync'):
+			try:
+				controller.samba.resync()
+			except Transports.TimeoutError:
+				# the retry fails in turn if the device is still not responding
+				self.LOG.warning('Resynchronization timed out')
+		controller.invalidate(controller.samba, page_address, controller.flash_address_range.page_size)
+		return True
@@ -0,0 +1,344 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Precompiled programming plans: images compiled for a part into page
+# records, so that a production station loads and runs them without
+# parsing and preparing the images on every run.
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import zlib
+
+from .SparseImage import SparseImage
+
+
+class PlanError(Exception):
+	pass
+
+
+class _OfflineDevice(object):
+	"""Stands in for the device when a part is created to compile a plan
+	   without one: the register writes of the part constructors are dropped,
+	   anything else is refused.
+	"""
+
+	is_usb = True
+
+
+	def write_word(self, address, word):
+		pass
+
+
+	def __getattr__(self, name):
+		raise PlanError('The part cannot be created without a device ({})'.format(name))
+
+
+class ProgrammingPlan(object):
+	"""Images compiled for a part: page-aligned records with their CRC32 and
+	   blank flag, the data of the non-blank records, the erase strategy and
+	   the CRC32 the flash is expected to hold once programmed. The bytes of a
+	   partial page outside the images are recorded blank (0xFF).
+
+	   With the "page" strategy, only the pages whose flash CRC32 differs from
+	   the recorded one are written, where the part calculates flash
+	   checksums; elsewhere every page is read, compared with the flash and
+	   written only where it differs, as any other write. With the "erase"
+	   strategy, the flash planes holding the images are erased first, then
+	   only the non-blank pages are written, without reading them.
+
+	   A plan records the geometry of the part it was compiled for (see
+	   `get_geometry`), and is refused by any part of another geometry.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	MAGIC = b'SAMBALoader plan v1\n'
+
+	# address, length, CRC32, flags
+	PAGE_RECORD = struct.Struct('<IIIB')
+	PAGE_BLANK  = 0x01
+
+	# Record size where the part does not declare the flash pages
+	DEFAULT_RECORD_SIZE = 4 * 1024
+
+	CHECKSUM_BLOCK_SIZE = 4 * 1024
+
+	STRATEGY_PAGE  = 'page'
+	STRATEGY_ERASE = 'erase'
+
+
+	def __init__(self, part_name, geometry, strategy, pages, payload, checksums, erase_planes=(), sources=None):
+		"""Creates a plan, see `compile()` and `load()`.
+
+		Args:
+			part_name    -- Name of the part the plan was compiled for.
+			geometry     -- Geometry hash of the part, see `get_geometry()`.
+			strategy     -- `STRATEGY_PAGE` or `STRATEGY_ERASE`.
+			pages        -- List of (address, length, crc32, flags) records.
+			payload      -- Data of the non-blank records, in record order.
+			checksums    -- List of (address, length, crc32) expected in flash.
+			erase_planes -- Start addresses of the planes erased first.
+			sources      -- Fingerprints of the source files (optional).
+		"""
+
+		self.part_name    = part_name
+		self.geometry     = geometry
+		self.strategy     = strategy
+		self.pages        = pages
+		self.payload      = payload
+		self.checksums    = checksums
+		self.erase_planes = list(erase_planes)
+		self.sources      = sources
+
+
+	def __str__(self):
+		blank = sum(1 for page in self.pages if page[3] & self.PAGE_BLANK)
+		return 'Plan for {} ({} strategy): {} bytes in {} pages, {} blank'.format(
+			self.part_name, self.strategy, len(self), len(self.pages), blank)
+
+
+	def __len__(self):
+		return sum(page[1] for page in self.pages)
+
+
+	@staticmethod
+	def get_geometry(part):
+		"""Calculates the geometry hash of a part: its name, family and flash
+		   regions with their page sizes.
+
+		Returns:
+			Geometry hash, as a hex string.
+		"""
+
+		description = [part.get_name(), type(part).__name__] + \
+			[[region.start, region.length, region.page_size] for region in part.get_memory_map()]
+		return hashlib.sha256(json.dumps(description).encode('ascii')).hexdigest()[:16]
+
+
+	@staticmethod
+	def get_offline_part(name):
+		"""Creates a part by its name, without a device, to compile a plan.
+
+		Returns:
+			Part instance; it cannot access any device.
+		"""
+
+		from .PartLibrary import PartLibrary
+
+		matched_parts = PartLibrary.find_by_name(name)
+		if not matched_parts:
+			raise PlanError('Unknown part name: %s' % name)
+		return matched_parts[0](_OfflineDevice())
+
+
+	@staticmethod
+	def get_sources(specs):
+		"""Fingerprints the source files of a plan by their path, size and
+		   modification time, so that a cached plan is reused without reading
+		   them.
+
+		Args:
+			specs -- List of (file path, address) tuples.
+
+		Returns:
+			List of fingerprints.
+		"""
+
+		sources = []
+		for file_path, address in specs:
+			stat = os.stat(file_path)
+			sources.append([os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, address])
+		return sources
+
+
+	@classmethod
+	def compile(cls, part, images, erase=False, sources=None):
+		"""Compiles images for a part.
+
+		Args:
+			part    -- Part instance, possibly without a device.
+			images  -- List of (address, data) or (address, data, name) tuples.
+			erase   -- `True` for the "erase" strategy: erase the planes holding
+			           the images, then write the non-blank pages only.
+			sources -- Fingerprints of the source files, see `get_sources()`.
+
+		Returns:
+			New `ProgrammingPlan`.
+		"""
+
+		image = SparseImage()
+		for entry in images:
+			image.add(*entry)
+
+		# flash regions (the memory map may also list e.g. serial number words)
+		regions = [region for region in part.get_memory_map() if region.page_size > 4]
+		if erase and not hasattr(part, 'flash_controllers'):
+			raise PlanError('Erase strategy not supported for %s' % part.get_name())
+
+		def find_region(address):
+			for region in regions:
+				if region.contains(address):
+					return region
+			if erase or regions:
+				raise PlanError('Image data @ 0x%08X outside of the flash of %s' % (address, part.get_name()))
+			return None
+
+		# (address, data) records, split at the page boundaries
+		records = []
+		erase_planes = set()
+		for segment in image.segments:
+			offset = 0
+			while offset < len(segment.data):
+				address = segment.address + offset
+				region = find_region(address)
+				page_size = region.page_size if region else cls.DEFAULT_RECORD_SIZE
+				length = min(page_size - address % page_size, len(segment.data) - offset)
+				records.append((address, segment.data[offset : offset + length], page_size))
+				if erase:
+					erase_planes.add(region.start)
+				offset += length
+
+		# page-aligned records: the rest of each page is blank
+		merged = []
+		for address, data, page_size in records:
+			page_address = address - address % page_size
+			if not merged or merged[-1][0] != page_address:
+				merged.append((page_address, bytearray(b'\xFF') * page_size, page_size))
+			merged[-1][1][address - page_address : address - page_address + len(data)] = data
+		records = merged
+
+		pages = []
+		payload = bytearray()
+		for address, data, page_size in records:
+			flags = cls.PAGE_BLANK if data == b'\xFF' * len(data) else 0
+			pages.append((address, len(data), zlib.crc32(bytes(data)) & 0xFFFFFFFF, flags))
+			if not flags & cls.PAGE_BLANK:
+				payload += data
+
+		checksums = []
+		for segment in image.segments:
+			for offset in range(0, len(segment.data), cls.CHECKSUM_BLOCK_SIZE):
+				block = bytes(segment.data[offset : offset + cls.CHECKSUM_BLOCK_SIZE])
+				checksums.append((segment.address + offset, len(block), zlib.crc32(block) & 0xFFFFFFFF))
+
+		plan = cls(part.get_name(), cls.get_geometry(part), cls.STRATEGY_ERASE if erase else cls.STRATEGY_PAGE,
+			pages, bytes(payload), checksums, sorted(erase_planes), sources)
+		cls.LOG.info(str(plan))
+		return plan
+
+
+	def check(self, part):
+		"""Checks that the plan was compiled for the part.
+
+		Raises:
+			PlanError if the part, or its geometry, differs.
+		"""
+
+		if part.get_name() != self.part_name:
+			raise PlanError('Plan compiled for {}, not {}'.format(self.part_name, part.get_name()))
+		if self.get_geometry(part) != self.geometry:
+			raise PlanError('Plan compiled for another geometry of {}, compile it again'.format(self.part_name))
+
+
+	def is_current(self, part, sources):
+		"""Checks whether a cached plan is still valid for the part and the
+		   source files.
+		"""
+
+		try:
+			self.check(part)
+		except PlanError as e:
+			self.LOG.info('Cached plan out of date: %s' % e)
+			return False
+		return self.sources == sources
+
+
+	def get_pages(self):
+		"""Lists the pages of the plan with their data.
+
+		Returns:
+			Generator of (address, data, blank) tuples; the data of blank
+			pages is generated.
+		"""
+
+		offset = 0
+		for address, length, crc, flags in self.pages:
+			if flags & self.PAGE_BLANK:
+				yield (address, b'\xFF' * length, True)
+			else:
+				yield (address, self.payload[offset : offset + length], False)
+				offset += length
+
+
+	def get_segments(self):
+		"""Merges the pages of the plan into contiguous segments.
+
+		Returns:
+			List of (address, data) tuples.
+		"""
+
+		segments = []
+		for address, data, blank in self.get_pages():
+			if segments and segments[-1][0] + len(segments[-1][1]) == address:
+				segments[-1][1].extend(data)
+			else:
+				segments.append((address, bytearray(data)))
+		return segments
+
+
+	def save(self, path):
+		"""Saves the plan to a file: a magic line, a JSON header line, the page
+		   records and the payload.
+		"""
+
+		table = b''.join(self.PAGE_RECORD.pack(*page) for page in self.pages)
+		header = {
+			'part'         : self.part_name,
+			'geometry'     : self.geometry,
+			'strategy'     : self.strategy,
+			'erase_planes' : self.erase_planes,
+			'pages'        : len(self.pages),
+			'payload'      : len(self.payload),
+			'crc'          : zlib.crc32(self.payload, zlib.crc32(table)) & 0xFFFFFFFF,
+			'checksums'    : self.checksums,
+			'sources'      : self.sources,
+		}
+		with open(path, 'wb') as f:
+			f.write(self.MAGIC)
+			f.write(json.dumps(header, sort_keys=True).encode('utf-8') + b'\n')
+			f.write(table)
+			f.write(self.payload)
+		self.LOG.info('Saved plan \'%s\'' % path)
+
+
+	@classmethod
+	def load(cls, path):
+		"""Loads a plan saved with `save()`.
+
+		Returns:
+			`ProgrammingPlan` instance.
+		"""
+
+		with open(path, 'rb') as f:
+			data = f.read()
+		if not data.startswith(cls.MAGIC):
+			raise PlanError('Not a programming plan: %s' % path)
+		end = data.index(b'\n', len(cls.MAGIC))
+		header = json.loads(data[len(cls.MAGIC) : end].decode('utf-8'))
+		table_end = end + 1 + header['pages'] * cls.PAGE_RECORD.size
+		table = data[end + 1 : table_end]
+		payload = data[table_end : ]
+		if len(payload) != header['payload'] or zlib.crc32(payload, zlib.crc32(table)) & 0xFFFFFFFF != header['crc']:
+			raise PlanError('Corrupted programming plan: %s' % path)
+
+		pages = [cls.PAGE_RECORD.unpack_from(table, offset) for offset in range(0, len(table), cls.PAGE_RECORD.size)]
+		return cls(header['part'], header['geometry'], header['strategy'], pages, payload,
+			[tuple(c) for c in header['checksums']], header['erase_planes'], header['sources'])
@@ -0,0 +1,221 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Phase level profiling of a run: wall time, link round trips and bytes of
+# each phase, reported as a table or exported as a Chrome trace.
+
+import collections
+import os
+import threading
+from time import time
+
+
+ProfileEvent = collections.namedtuple('ProfileEvent',
+	['name', 'path', 'depth', 'thread', 'start', 'duration', 'round_trips', 'bytes_sent', 'bytes_received'])
+
+
+class _Phase(object):
+	"""Context manager recording a phase in a `Profiler`."""
+
+	def __init__(self, profiler, name):
+		self.profiler = profiler
+		self.name = name
+
+
+	def __enter__(self):
+		self.profiler._enter(self.name)
+		return self
+
+
+	def __exit__(self, *exc_info):
+		self.profiler._exit()
+		return False
+
+
+class _NoPhase(object):
+	"""Context manager used for phases while no `Profiler` is active."""
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, *exc_info):
+		return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class Profiler(object):
+	"""Profiler of the phases of a run (port open, handshake, latch fill,
+	   flash busy wait, ...). The code marks its phases with
+	   `Profiler.phase(name)`, which costs nothing unless a profiler was
+	   started. Phases nest; each one records its wall time and the round
+	   trips and bytes of the transport attached with `Profiler.attach()`.
+	   The link counters cover the whole link, so phases are only marked on
+	   the thread using it.
+	"""
+
+	_active = None
+
+
+	def __init__(self):
+		"""Creates a profiler, started with `start()`."""
+
+		self.transport  = None
+		self.events     = []
+		self.start_time = None
+		self.stop_time  = None
+		self._local     = threading.local()
+
+
+	@classmethod
+	def phase(cls, name):
+		"""Marks a phase of the active profiler, if any.
+
+		Args:
+			name -- Name of the phase, e.g. "latch fill".
+
+		Returns:
+			Context manager covering the phase.
+		"""
+
+		profiler = cls._active
+		if profiler is None:
+			return _NO_PHASE
+		return _Phase(profiler, name)
+
+
+	@classmethod
+	def attach(cls, transport):
+		"""Attaches the transport whose link statistics are recorded by the
+		   active profiler, if any.
+
+		Args:
+			transport -- Transport connected to the device.
+		"""
+
+		if cls._active is not None:
+			cls._active.transport = transport
+
+
+	def start(self):
+		"""Starts profiling; only one profiler is active at a time."""
+
+		self.start_time = time()
+		Profiler._active = self
+
+
+	def stop(self):
+		"""Stops profiling."""
+
+		self.stop_time = time()
+		if Profiler._active is self:
+			Profiler._active = None
+
+
+	def _get_counters(self):
+		transport = self.transport
+		if transport is None:
+			return (0, 0, 0)
+		return (transport.round_trips, transport.bytes_sent, transport.bytes_received)
+
+
+	def _enter(self, name):
+		stack = getattr(self._local, 'stack', None)
+		if stack is None:
+			stack = self._local.stack = []
+		stack.append((name, time(), self._get_counters()))
+
+
+	def _exit(self):
+		stack = self._local.stack
+		name, start, counters = stack.pop()
+		duration = time() - start
+		deltas = [c - s for c, s in zip(self._get_counters(), counters)]
+		path = tuple(entry[0] for entry in stack) + (name, )
+		self.events.append(ProfileEvent(name, path, len(stack), threading.current_thread().name, start, duration, *deltas))
+
+
+	def get_report(self):
+		"""Aggregates the recorded phases by name within their parent phases,
+		   in the order they first started; e.g. the verify of each page
+		   written is reported apart from a final verify.
+
+		Returns:
+			List of dicts of { 'name', 'depth', 'calls', 'time',
+			'round_trips', 'bytes_sent', 'bytes_received' }, with the times in
+			seconds; a nested phase is also counted in its parents.
+		"""
+
+		phases = collections.OrderedDict()
+		for event in sorted(self.events, key=lambda e: (e.start, e.depth)):
+			phase = phases.get(event.path)
+			if phase is None:
+				phase = phases[event.path] = { 'name' : event.name, 'depth' : event.depth, 'calls' : 0,
+					'time' : 0.0, 'round_trips' : 0, 'bytes_sent' : 0, 'bytes_received' : 0 }
+			phase['calls'] += 1
+			phase['time'] += event.duration
+			phase['round_trips'] += event.round_trips
+			phase['bytes_sent'] += event.bytes_sent
+			phase['bytes_received'] += event.bytes_received
+		return list(phases.values())
+
+
+	def get_elapsed(self):
+		"""Returns the wall time of the profiled run, s."""
+
+		return (self.stop_time or time()) - self.start_time
+
+
+	def __str__(self):
+		elapsed = self.get_elapsed()
+		row = '{:<28} {:>6} {:>10} {:>6} {:>11} {:>10} {:>10}'
+		lines = [row.format('Phase', 'Calls', 'Time, s', '%', 'Round trips', 'Sent', 'Received')]
+		other = elapsed
+		for phase in self.get_report():
+			if phase['depth'] == 0:
+				other -= phase['time']
+			lines.append(row.format('  ' * phase['depth'] + phase['name'], phase['calls'], '{:.3f}'.format(phase['time']),
+				'{:.1%}'.format(phase['time'] / elapsed if elapsed else 0), phase['round_trips'], phase['bytes_sent'], phase['bytes_received']))
+		lines.append(row.format('(other)', '', '{:.3f}'.format(max(other, 0.0)), '{:.1%}'.format(max(other, 0.0) / elapsed if elapsed else 0), '', '', ''))
+		round_trips, bytes_sent, bytes_received = self._get_counters()
+		lines.append(row.format('Total', '', '{:.3f}'.format(elapsed), '', round_trips, bytes_sent, bytes_received))
+		return '\n'.join(lines)
+
+
+	def save_trace(self, filename):
+		"""Saves the recorded phases as a Chrome trace (Trace Event Format),
+		   viewable in chrome://tracing or Perfetto.
+
+		Args:
+			filename -- Path of the JSON trace file to write.
+		"""
+
+		import json
+
+		pid = os.getpid()
+		threads = collections.OrderedDict()
+		trace_events = []
+		for event in sorted(self.events, key=lambda e: (e.start, e.depth)):
+			tid = threads.setdefault(event.thread, len(threads) + 1)
+			trace_events.append({
+				'name' : event.name,
+				'cat'  : 'sambaloader',
+				'ph'   : 'X',
+				'ts'   : round((event.start - self.start_time) * 1e6, 1),
+				'dur'  : round(event.duration * 1e6, 1),
+				'pid'  : pid,
+				'tid'  : tid,
+				'args' : { 'round_trips' : event.round_trips, 'bytes_sent' : event.bytes_sent, 'bytes_received' : event.bytes_received },
+			})
+		for thread, tid in threads.items():
+			trace_events.append({ 'name' : 'thread_name', 'ph' : 'M', 'pid' : pid, 'tid' : tid, 'args' : { 'name' : thread } })
+
+		with open(filename, 'w') as f:
+			json.dump({ 'traceEvents' : trace_events, 'displayTimeUnit' : 'ms' }, f)
@@ -0,0 +1,127 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Progress reporting of long operations (programming, reading, verifying and
+# erasing flash).
+
+from time import time
+
+
+class Progress(object):
+	"""Progress of a long operation. `Session` operations start a phase
+	   (e.g. "write", then "verify") with its total length, and the parts and
+	   flash controllers advance it as pages are processed. The callback is
+	   called with this instance at the start and end of each phase, and at
+	   most every `REPORT_INTERVAL` in between.
+	"""
+
+	REPORT_INTERVAL = 0.1 # s
+	RATE_SMOOTHING  = 0.3 # weight of the latest rate sample
+
+
+	def __init__(self, callback):
+		"""Creates a progress tracker.
+
+		Args:
+			callback -- Function `callback(progress)` called on progress.
+		"""
+
+		self.callback = callback
+		self.start('', 0)
+
+
+	def start(self, operation, total):
+		"""Starts a phase of the operation.
+
+		Args:
+			operation -- Name of the phase, e.g. "write".
+			total     -- Number of bytes the phase processes.
+		"""
+
+		self.operation     = operation
+		self.total         = total
+		self.done          = 0
+		self.pages_written = 0
+		self.pages_skipped = 0
+		self.finished      = False
+		self.rate          = 0.0
+		self.start_time    = time()
+		self._sample_time  = self.start_time
+		self._sample_done  = 0
+		self._report_time  = 0
+		if operation:
+			self.callback(self)
+
+
+	def advance(self, length, written=None):
+		"""Records processed data.
+
+		Args:
+			length  -- Number of bytes processed.
+			written -- `True` if a page was written, `False` if a page was
+			           skipped, `None` if no page was programmed (reads).
+		"""
+
+		self.done += length
+		if written is True:
+			self.pages_written += 1
+		elif written is False:
+			self.pages_skipped += 1
+
+		now = time()
+		if now - self._sample_time >= self.REPORT_INTERVAL:
+			rate = (self.done - self._sample_done) / (now - self._sample_time)
+			self.rate = rate if not self.rate else self.RATE_SMOOTHING * rate + (1 - self.RATE_SMOOTHING) * self.rate
+			self._sample_time, self._sample_done = now, self.done
+		if now - self._report_time >= self.REPORT_INTERVAL:
+			self._report_time = now
+			self.callback(self)
+
+
+	def finish(self):
+		"""Ends the current phase."""
+
+		self.finished = True
+		self.rate = self.average_rate
+		self.callback(self)
+
+
+	@property
+	def elapsed(self):
+		return time() - self.start_time
+
+
+	@property
+	def average_rate(self):
+		"""Average rate of the phase, bytes/s."""
+		elapsed = self.elapsed
+		return self.done / elapsed if elapsed else 0.0
+
+
+	@property
+	def eta(self):
+		"""Estimated time to the end of the phase, s; `None` if unknown."""
+		rate = self.rate or self.average_rate
+		if self.finished:
+			return 0.0
+		return (self.total - self.done) / rate if rate else None
+
+
+	def as_dict(self):
+		"""Returns the progress as a dictionary, e.g. for JSON events."""
+
+		return {
+			'operation'     : self.operation,
+			'done'          : self.done,
+			'total'         : self.total,
+			'pages_written' : self.pages_written,
+			'pages_skipped' : self.pages_skipped,
+			'rate'          : round(self.rate, 1),
+			'eta'           : None if self.eta is None else round(self.eta, 2),
+			'finished'      : self.finished,
+		}
@@ -7,7 +7,9 @@
 #
 
 import logging
+import time
 from . import Transports
+from .Transaction import TransactionOperation, TransactionError
 
 
 class SAMBACommands:
@@ -34,16 +36,34 @@ class SAMBA(object):
 
 	LOG = logging.getLogger(__name__)
 
+	READ_SEGMENT_SIZE_MIN     = 512
+	READ_SEGMENT_SIZE_MAX     = 32 * 1024
+	READ_SEGMENT_SIZE_DEFAULT = 4 * 1024
 
-	def __init__(self, transport, is_usb=False):
+	READ_RETRIES = 3
+
+	# Terminator of the text responses of the monitor
+	RESPONSE_TERMINATOR = b'\n\r'
+
+
+	def __init__(self, transport, is_usb=False, xmodem_1k=False, read_segment_size=None):
 		"""Instantiates a SAMBA instance with a given transport, ready for use.
 
 		Args:
 			transport -- Transport connected to a SAM-BA device.
+			is_usb    -- `True` if the device is connected over USB, `False`
+			             for serial (UART) mode which uses XMODEM transfers.
+			xmodem_1k -- Use XMODEM-1K blocks in serial mode where the monitor
+			             supports them.
+			read_segment_size -- Size of each `read_block` segment, or `None`
+			             to tune the segment size automatically.
 		"""
 
 		self.transport = transport
 		self.is_usb = is_usb
+		self.xmodem = None if is_usb else Transports.XMODEM(transport, use_1k=xmodem_1k)
+		self.read_segment_size = read_segment_size
+		self._auto_segment_size = self.READ_SEGMENT_SIZE_DEFAULT
 
 		if not self.is_usb:
 			self.LOG.debug('Serial mode, sending auto baud handshake')
@@ -51,7 +71,7 @@ class SAMBA(object):
 
 		self.LOG.debug('Set normal mode')
 		self.transport.write(self._serialize_command(SAMBACommands.SET_NORMAL_MODE, arguments=[]))
-		self.transport.read(2)
+		self.transport.read_until(self.RESPONSE_TERMINATOR)
 
 
 	def _to_32bit_hex(self, value):
@@ -116,9 +136,7 @@ class SAMBA(object):
 
 		self.transport.write(self._serialize_command(SAMBACommands.GET_VERSION, arguments=[]))
 
-		version = bytearray()
-		while not b'\n\r' in version:
-			version += self.transport.read(1)
+		version = self.transport.read_until(self.RESPONSE_TERMINATOR)
 		try:
 			version = version.decode('ascii').strip()
 		except:
@@ -141,13 +159,73 @@ class SAMBA(object):
 
 		self.transport.write(self._serialize_command(SAMBACommands.SEND_FILE, arguments=[address, len(data)]))
 		if not self.is_usb:
-			Transports.XMODEM(self.transport).write(data)
+			self.xmodem.write(data)
 		else:
 			self.transport.write(data)
 
 
+	def resync(self):
+		"""Resynchronizes with the attached device after a timeout or a garbled
+		   response, by discarding any pending data and re-entering normal mode.
+		"""
+
+		self.LOG.info('Resynchronizing with device')
+
+		if not self.is_usb:
+			# abort any XMODEM transfer still in progress
+			self.transport.write(bytearray([Transports.XMODEMControl.CAN] * 2))
+
+		self.transport.drain()
+		self.transport.write(self._serialize_command(SAMBACommands.SET_NORMAL_MODE, arguments=[]))
+		self.transport.read_until(self.RESPONSE_TERMINATOR)
+
+
+	def _get_segment_size(self):
+		"""Internal helper to retrieve the current `read_block` segment size.
+
+		Returns:
+			Configured segment size, or the current auto-tuned segment size.
+		"""
+
+		if self.read_segment_size:
+			return self.read_segment_size
+		return self._auto_segment_size
+
+
+	def _tune_segment_size(self, success):
+		"""Internal helper to auto-tune the `read_block` segment size, growing it
+		   after successful segments and shrinking it after failures.
+
+		Args:
+			success -- `True` if the last segment was received successfully.
+		"""
+
+		if success:
+			self._auto_segment_size = min(self._auto_segment_size * 2, self.READ_SEGMENT_SIZE_MAX)
+		else:
+			self._auto_segment_size = max(self._auto_segment_size // 2, self.READ_SEGMENT_SIZE_MIN)
+
+
+	def _receive_segment(self, buffer):
+		"""Internal helper to receive the response of a `RECEIVE_FILE` command
+		   into a caller provided buffer.
+
+		Args:
+			buffer -- Writable memory to fill, sized to the requested length.
+		"""
+
+		if not self.is_usb:
+			if self.xmodem.readinto(buffer) != len(buffer):
+				raise Transports.TimeoutError()
+		else:
+			self.transport.readinto(buffer)
+
+
 	def read_block(self, address, length):
-		"""Reads a block of data from the attached device.
+		"""Reads a block of data from the attached device. Large blocks are split
+		   into segments; over USB the command for the next segment is issued
+		   while the current one is still being received. A failed segment is
+		   retried on its own after resynchronizing with the device.
 
 		Args:
 			address -- Address to read the data from.
@@ -159,11 +237,40 @@ class SAMBA(object):
 
 		self.LOG.debug('Read Block @ 0x%08x (%d bytes)' % (address, length))
 
-		self.transport.write(self._serialize_command(SAMBACommands.RECEIVE_FILE, arguments=[address, length]))
-		if not self.is_usb:
-			data = Transports.XMODEM(self.transport).read(length)
-		else:
-			data = self.transport.read(length)
+		data = bytearray(length)
+		view = memoryview(data)
+
+		offset  = 0
+		pending = None
+		while offset < length:
+			size = pending if pending else min(self._get_segment_size(), length - offset)
+			if not pending:
+				self.transport.write(self._serialize_command(SAMBACommands.RECEIVE_FILE, arguments=[address + offset, size]))
+
+			# keep the next command in flight while this segment drains (USB only)
+			pending = None
+			if self.is_usb and offset + size < length:
+				pending = min(self._get_segment_size(), length - offset - size)
+				self.transport.write(self._serialize_command(SAMBACommands.RECEIVE_FILE, arguments=[address + offset + size, pending]))
+
+			retries = 0
+			while True:
+				try:
+					self._receive_segment(view[offset : offset + size])
+					self._tune_segment_size(True)
+					break
+				except (Transports.TimeoutError, Transports.XMODEMError):
+					retries += 1
+					self.LOG.warning('Read Block @ 0x%08x (%d bytes) failed, retry %d of %d' % (address + offset, size, retries, self.READ_RETRIES))
+					if retries > self.READ_RETRIES:
+						raise
+					self._tune_segment_size(False)
+					self.resync()
+					# any pipelined command was discarded by the resync
+					pending = None
+					self.transport.write(self._serialize_command(SAMBACommands.RECEIVE_FILE, arguments=[address + offset, size]))
+
+			offset += size
 
 		return data
 
@@ -196,6 +303,92 @@ class SAMBA(object):
 		return word
 
 
+	def _poll_word(self, address, condition, timeout, word):
+		"""Internal helper to repeat a transaction poll until its condition
+		   is met.
+
+		Args:
+			address   -- Address of the polled register.
+			condition -- Tuple of (mask, value) of the poll.
+			timeout   -- Poll timeout, s.
+			word      -- Register value already read, or `None`.
+
+		Returns:
+			Last register value read.
+		"""
+
+		mask, value = condition
+		start_timestamp = time.time()
+		if word is None:
+			word = self.read_word(address)
+		while word & mask != value:
+			if time.time() - start_timestamp >= timeout:
+				raise TransactionError(address, word)
+			time.sleep(.001)
+			word = self.read_word(address)
+		return word
+
+
+	def _send_commands(self, commands, reads):
+		"""Internal helper to send a batch of commands in one exchange and
+		   receive the words read by them.
+
+		Returns:
+			List of the read words.
+		"""
+
+		if not commands:
+			return []
+		self.transport.write(''.join(commands))
+		data = self.transport.read(4 * reads) if reads else []
+		return [data[i] | data[i + 1] << 8 | data[i + 2] << 16 | data[i + 3] << 24 for i in range(0, 4 * reads, 4)]
+
+
+	def execute(self, transaction):
+		"""Executes a register `Transaction`. Over USB, the operations up to
+		   each poll are pipelined into a single exchange with the device;
+		   over UART they are issued one at a time.
+
+		Args:
+			transaction -- `Transaction` to execute.
+
+		Returns:
+			List of the values of every read and poll, in order.
+		"""
+
+		self.LOG.debug('Execute transaction (%d operations)' % len(transaction))
+
+		results = []
+		if not self.is_usb:
+			for operation, address, argument, timeout in transaction.operations:
+				if operation == TransactionOperation.WRITE:
+					self.write_word(address, argument)
+				elif operation == TransactionOperation.READ:
+					results.append(self.read_word(address))
+				else:
+					results.append(self._poll_word(address, argument, timeout, None))
+			return results
+
+		commands = []
+		reads = 0
+		for operation, address, argument, timeout in transaction.operations:
+			if operation == TransactionOperation.WRITE:
+				commands.append(self._serialize_command(SAMBACommands.WRITE_WORD, arguments=[address, argument]))
+				continue
+
+			commands.append(self._serialize_command(SAMBACommands.READ_WORD, arguments=[address]))
+			reads += 1
+			if operation == TransactionOperation.POLL:
+				# a poll holds back everything behind it until its condition is met
+				results += self._send_commands(commands, reads)
+				results[-1] = self._poll_word(address, argument, timeout, results[-1])
+				commands = []
+				reads = 0
+
+		results += self._send_commands(commands, reads)
+		return results
+
+
 	def write_half_word(self, address, half_word):
 		"""Writes a 16-bit half-word of data to the attached device.
 
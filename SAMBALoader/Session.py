@@ -0,0 +1,791 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+import logging
+import struct
+import time
+import zlib
+from . import Transports
+from .SAMBA import SAMBA
+from .DeviceMemory import DeviceMemory
+from .PartLibrary import PartLibrary
+from .FileFormatLibrary import FileFormatLibrary
+from .IdentificationCache import IdentificationCache
+from .SparseImage import SparseImage
+from .Pipeline import ProgrammingPipeline
+from .Profiler import Profiler
+
+
+class SessionError(Exception):
+	pass
+
+
+class Session(object):
+	"""Programming session with a single attached device. The device version,
+	   chip identifiers and part are read once and cached for the lifetime of
+	   the session, so a session can serve any number of operations. Device
+	   memory within the memory map of the part is cached by `DeviceMemory`.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+	READ_CHUNK_SIZE     = 64 * 1024 # bytes
+	CHECKSUM_BLOCK_SIZE = 4 * 1024  # bytes
+
+
+	def __init__(self, samba, id_cache=None):
+		"""Creates a session.
+
+		Args:
+			samba    -- Core `SAMBA` instance bound to the device.
+			id_cache -- `IdentificationCache` used to speed up identification (optional).
+		"""
+
+		self.samba    = samba
+		self.memory   = DeviceMemory(samba)
+		self.id_cache = id_cache
+		self.part     = None
+		self.chip_ids = None
+		self.version  = None
+		self.pipeline = None
+
+
+	def __str__(self):
+		try:
+			return str(self.samba.transport)
+		except:
+			return ''
+
+
+	@classmethod
+	def connect(cls, port, is_usb=True, baud=115200, xmodem_1k=False, read_segment_size=None, use_id_cache=True):
+		"""Opens a session with the device attached to the given port.
+
+		Args:
+			port              -- Serial port to open (e.g. "COM1" or "/dev/ttyACM0").
+			is_usb            -- `True` for USB connections, `False` for UART.
+			baud              -- UART baud rate.
+			xmodem_1k         -- Use XMODEM-1K blocks in UART mode.
+			read_segment_size -- `read_block` segment size, or `None` for auto.
+			use_id_cache      -- Use the persistent `IdentificationCache`.
+
+		Returns:
+			New `Session` instance.
+		"""
+
+		with Profiler.phase('port open'):
+			transport = Transports.Serial(port=port, baud=baud)
+		Profiler.attach(transport)
+		with Profiler.phase('handshake'):
+			samba = SAMBA(transport, is_usb=is_usb, xmodem_1k=xmodem_1k, read_segment_size=read_segment_size)
+		return cls(samba, IdentificationCache() if use_id_cache else None)
+
+
+	def _get_part(self, chip_ids):
+		# find & collect the part classes types by chip ids
+		matched_parts = PartLibrary.find_by_chip_ids(chip_ids)
+
+		if len(matched_parts) == 0:
+			raise SessionError('Unknown part.')
+		elif len(matched_parts) > 1:
+			raise SessionError('Multiple matching parts: %s' % [p.get_name() for p in matched_parts])
+		else:
+			# create part class instance
+			with Profiler.phase('part construction'):
+				return matched_parts[0](self.memory)
+
+
+	def _get_file_processor(self, filename):
+		matched_formats = FileFormatLibrary.find_by_name(filename)
+
+		if len(matched_formats) == 0:
+			raise SessionError('Unknown file format: %s' % filename)
+		elif len(matched_formats) > 1:
+			raise SessionError('Multiple matching file formats: %s' % [f.get_name() for f in matched_formats])
+		else:
+			return matched_formats[0]()
+
+
+	def _check_part(self):
+		if self.part is None:
+			raise SessionError('Part not set.')
+
+
+	def get_version(self):
+		"""Retrieves the SAM-BA version string of the device (cached).
+
+		Returns:
+			Version string returned by the attached device.
+		"""
+
+		if self.version is None:
+			with Profiler.phase('get version'):
+				self.version = self.samba.get_version()
+		return self.version
+
+
+	def check_device(self):
+		"""Checks that a session kept open between operations (e.g. by the
+		   SAM-BA daemon) still talks to the device it identified: the version
+		   string and the chip identifiers are read again. A UART port does
+		   not tell two boards of the same part apart, so the cached device
+		   memory of a UART session is dropped as well.
+
+		Returns:
+			`True` if the session can be reused, `False` if the device changed.
+		"""
+
+		with Profiler.phase('device check'):
+			if self.version is not None and self.samba.get_version() != self.version:
+				return False
+			for reg in (self.chip_ids or {}).values():
+				identifiers = str(reg)
+				if not reg.read(self.samba) or str(reg) != identifiers:
+					return False
+		if not self.samba.is_usb:
+			self.memory.invalidate()
+		return True
+
+
+	def get_part_identifiers(self, addresses=None):
+		"""Reads out the chip identifiers from the attached device. Note that
+		   each device usually implements only a single one of the chip
+		   identifier modules, thus all but one value will essentially read as
+		   garbage.
+
+		Args:
+			addresses -- Dict: { REGISTER_NAME : REGISTER_ADDRESS, }. If `None`: DEFAULT_ADDRESSES
+
+		Returns:
+			Dictionary of `{name, identifiers}` for each chip identifier,
+			which can then be used to match against a device.
+		"""
+		with Profiler.phase('chip ids'):
+			device_id = self.samba.transport.get_device_id() if self.id_cache is not None else None
+			return PartLibrary.get_chip_ids(self.samba, addresses, self.id_cache, device_id)
+
+
+	def set_part_by_chip_ids(self, chip_ids):
+		self.chip_ids = chip_ids
+		self.part = self._get_part(chip_ids)
+		self.memory.set_memory_map(self.part.get_memory_map())
+
+		return self.part
+
+
+	def set_part_by_name(self, name):
+		matched_parts = PartLibrary.find_by_name(name)
+
+		if len(matched_parts) == 0:
+			raise SessionError('Unknown part name: %s' % name)
+
+		self.chip_ids = dict()
+		with Profiler.phase('part construction'):
+			self.part = matched_parts[0](self.memory)
+		self.memory.set_memory_map(self.part.get_memory_map())
+
+		return self.part
+
+
+	def identify(self, addresses=None, part_name=None):
+		"""Identifies the attached device, unless it was already identified
+		   in this session.
+
+		Args:
+			addresses -- Dict: { REGISTER_NAME : REGISTER_ADDRESS, }. If `None`: DEFAULT_ADDRESSES
+			part_name -- Name of the part known to be attached; if given, the
+			             chip identifiers are not read at all.
+
+		Returns:
+			Name of the discovered part.
+		"""
+
+		if self.part is None:
+			if part_name:
+				self.set_part_by_name(part_name)
+			else:
+				self.set_part_by_chip_ids(self.get_part_identifiers(addresses))
+		return self.part.get_name()
+
+
+	def get_chip_ids_info(self):
+		"""Returns the chip identifiers read during identification as text."""
+
+		self._check_part()
+		if not self.chip_ids:
+			return 'Not read, part given explicitly'
+		return '\n'.join(str(v) for v in self.chip_ids.values())
+
+
+	def is_part_tested(self):
+		self._check_part()
+		return self.part.is_tested()
+
+
+	def get_info(self):
+		"""Reads information about the part.
+
+		Returns:
+			Part info as text.
+		"""
+
+		self._check_part()
+		return self.part.get_info()
+
+
+	def read_flash(self, address=None, length=None, progress=None):
+		self._check_part()
+		if progress is None:
+			with Profiler.phase('read'):
+				return self.part.read_flash(address, length)
+
+		progress.start('read', self._get_flash_range(address, length)[1] or 0)
+		with Profiler.phase('read'):
+			data = self.part.read_flash(address, length, progress)
+		progress.finish()
+		return data
+
+
+	def _get_flash_range(self, address, length):
+		"""Internal helper to resolve a flash range with defaults.
+
+		Returns:
+			Tuple of (address, length); the length is `None` if the end of
+			flash is only known to the part.
+		"""
+
+		if address is None:
+			address = self.get_flash_start()
+		flash_address_range = getattr(self.part, 'flash_address_range', None)
+		if length is None and flash_address_range is not None:
+			length = flash_address_range.start + flash_address_range.length - address
+		return address, length
+
+
+	def get_flash_start(self):
+		"""Returns the start address of the flash (application area) of the
+		   part, used when no address is given.
+		"""
+
+		self._check_part()
+		flash_address_range = getattr(self.part, 'flash_address_range', None)
+		if flash_address_range is not None:
+			return flash_address_range.start
+		return self.part.FLASH_APP_ADDRESS
+
+
+	def read_flash_chunks(self, address=None, length=None, chunk_size=READ_CHUNK_SIZE, progress=None):
+		"""Reads the flash of the part chunk by chunk, so that it can be
+		   processed as it is read, with constant memory.
+
+		Args:
+			address    -- Address to read from (or start of flash if `None`).
+			length     -- Length to read (or until end of flash if `None`).
+			chunk_size -- Length of each chunk, bytes.
+			progress   -- `Progress` of the read (optional).
+
+		Returns:
+			Generator of (address, data) tuples, in address order.
+		"""
+
+		self._check_part()
+		address, length = self._get_flash_range(address, length)
+		if progress:
+			progress.start('read', length or 0)
+		if length is None:
+			# the end of flash is only known to the part, read it at once
+			with Profiler.phase('read'):
+				data = self.part.read_flash(address, length, progress)
+			yield (address, data)
+		else:
+			for offset in range(0, length, chunk_size):
+				with Profiler.phase('read'):
+					data = self.part.read_flash(address + offset, min(chunk_size, length - offset), progress)
+				yield (address + offset, data)
+		if progress:
+			progress.finish()
+
+
+	def read_regions(self, regions, max_gap=DeviceMemory.COALESCE_GAP):
+		"""Reads several named regions of memory (flash, SRAM, peripheral
+		   registers, ...), coalescing nearby regions into fewer reads.
+
+		Args:
+			regions -- List of (name, address, length) tuples.
+			max_gap -- Largest gap between two regions read together, bytes.
+
+		Returns:
+			List of (name, address, data) tuples, in the order of `regions`.
+		"""
+
+		self._check_part()
+		with Profiler.phase('read'):
+			data = self.memory.read_ranges([(address, length) for _, address, length in regions], max_gap)
+		return [(name, address, d) for (name, address, _), d in zip(regions, data)]
+
+
+	def write_flash(self, data, address=None, journal_path=None, resume=False, progress=None, compress=None):
+		"""Writes data to the flash of the part.
+
+		Args:
+			data         -- Data to program into the device.
+			address      -- Address to program from (or start of flash if `None`).
+			journal_path -- Path of the programming journal (optional). The
+			                journal is kept if the write fails, and removed once
+			                it succeeds.
+			resume       -- Resume from the pages confirmed in the journal.
+			progress     -- `Progress` of the "write" and "verify" phases (optional).
+			compress     -- Compressed upload (see `CompressedUpload`): `True`,
+			                "auto" to use it where it is estimated faster, or
+			                `None` not to use it.
+
+		Returns:
+			`True` if the data was written and verified.
+		"""
+
+		self._check_part()
+
+		if self._can_pipeline():
+			if address is None:
+				address = self.part.flash_address_range.start
+			program = lambda journal: self._program_blocks([(address, data)], journal, progress=progress, compress=compress)
+		else:
+			def program(journal):
+				if progress:
+					progress.start('write', len(data))
+				with Profiler.phase('write'):
+					result = self.part.program_flash(data, address, journal, progress=progress)
+				if progress:
+					progress.finish()
+				return result
+
+		if journal_path is None:
+			return program(None)
+
+		from .Journal import ProgrammingJournal
+		return self._run_journaled(journal_path, ProgrammingJournal.image_hash(data, address), resume, program)
+
+
+	def _can_pipeline(self):
+		"""Internal helper to check whether the flash of the part can be
+		   programmed by a `ProgrammingPipeline`.
+		"""
+
+		return hasattr(self.part, 'get_flash_chunks')
+
+
+	def _program_blocks(self, blocks, journal=None, verify=True, progress=None, compress=None):
+		"""Internal helper to program blocks of (address, data) through a
+		   `ProgrammingPipeline`, kept as `self.pipeline` for its statistics,
+		   or a `CompressedUpload` (see `write_flash()`).
+		"""
+
+		upload = None
+		if compress:
+			from .Compression import CompressedUpload
+			if CompressedUpload.is_supported(self.part):
+				upload = CompressedUpload(self.samba, self.part, self.memory)
+				with Profiler.phase('compress'):
+					batches = upload.compress(upload.get_pages(blocks))
+				if compress == 'auto' and not upload.is_worthwhile(batches):
+					upload = None
+			else:
+				self.LOG.warning('Compressed upload not supported for %s' % self.part.get_name())
+
+		if progress:
+			progress.start('write', sum(len(data) for _, data in blocks))
+		with Profiler.phase('write'):
+			if upload is not None:
+				upload.run(batches, journal, progress)
+			else:
+				self.pipeline = ProgrammingPipeline(self.part, journal, progress)
+				self.pipeline.run(blocks)
+		if progress:
+			progress.finish()
+		if not verify:
+			# every written page was verified already
+			return True
+		return self._verify_blocks(blocks, progress)
+
+
+	def _run_journaled(self, journal_path, image_hash, resume, program):
+		"""Internal helper to run a programming job with a journal, which is
+		   removed once the job succeeded and kept otherwise. The job runs
+		   without a journal if the journal cannot be created.
+
+		Args:
+			journal_path -- Path of the programming journal.
+			image_hash   -- Hash of the image being programmed.
+			resume       -- Resume from the pages confirmed in the journal.
+			program      -- Function `program(journal)` running the job.
+
+		Returns:
+			Result of the job.
+		"""
+
+		from .Journal import ProgrammingJournal
+		try:
+			journal = ProgrammingJournal(journal_path, self.part.get_unique_id(), image_hash, resume=resume)
+		except (IOError, OSError) as e:
+			# e.g. a read-only image directory: programmed without a journal
+			self.LOG.warning('Cannot create journal \'%s\', not journaling: %s' % (journal_path, e))
+			return program(None)
+		try:
+			result = program(journal)
+		except:
+			journal.close()
+			raise
+		if result:
+			journal.remove()
+		else:
+			journal.close()
+		return result
+
+
+	def _get_page_size(self, address):
+		"""Internal helper to find the flash page size at an address from the
+		   memory map of the part (1 if unknown).
+		"""
+
+		for region in self.part.get_memory_map():
+			if region.contains(address):
+				return region.page_size
+		return 1
+
+
+	def program_images(self, images, journal_path=None, resume=False, progress=None, compress=None):
+		"""Writes several images (e.g. bootloader, application and
+		   configuration) to the flash of the part in one job. The images are
+		   merged into a single sparse image, so that a page shared by two
+		   images is programmed once, and verified in a single pass once all
+		   of them were written.
+
+		Args:
+			images       -- List of (address, data) or (address, data, name) tuples.
+			journal_path -- Path of the programming journal (optional).
+			resume       -- Resume from the pages confirmed in the journal.
+			progress     -- `Progress` of the "write" and "verify" phases (optional).
+			compress     -- Compressed upload, see `write_flash()`.
+
+		Returns:
+			`True` if all images were written and verified.
+		"""
+
+		self._check_part()
+
+		image = SparseImage()
+		for entry in images:
+			image.add(*entry)
+		if not image.segments:
+			return True
+
+		blocks = []
+		for run in image.get_runs(self._get_page_size(image.segments[0].address)):
+			start, end = run[0].address, run[-1].end
+			# fill the gaps within shared pages with the current flash contents
+			data = bytearray(end - start)
+			offset = start
+			for segment in run:
+				if segment.address > offset:
+					data[offset - start : segment.address - start] = self.memory.read_block(offset, segment.address - offset)
+				data[segment.address - start : segment.end - start] = segment.data
+				offset = segment.end
+			blocks.append((start, data))
+
+		def program(journal):
+			if self._can_pipeline():
+				return self._program_blocks(blocks, journal, progress=progress, compress=compress)
+			if progress:
+				progress.start('write', sum(len(data) for _, data in blocks))
+			for start, data in blocks:
+				self.LOG.info('Program image run [0x%08X..0x%08X]' % (start, start + len(data)))
+				with Profiler.phase('write'):
+					if not self.part.program_flash(data, start, journal, verify=False, progress=progress):
+						return False
+			if progress:
+				progress.finish()
+			return self._verify_blocks(blocks, progress)
+
+		if journal_path is None:
+			return program(None)
+		return self._run_journaled(journal_path, image.digest(), resume, program)
+
+
+	def _verify_blocks(self, blocks, progress=None):
+		"""Internal helper to verify blocks of (address, data) against the
+		   flash contents, read back from the device rather than the cache.
+		"""
+
+		if progress:
+			progress.start('verify', sum(len(data) for _, data in blocks))
+		self.memory.invalidate()
+		for start, data in blocks:
+			with Profiler.phase('verify'):
+				actual = bytearray(self.part.read_flash(start, len(data), progress))
+			# image data may be a list of byte values (e.g. `BinFormat`)
+			if actual != bytearray(data):
+				mismatch = next(i for i in range(len(data)) if actual[i] != data[i])
+				self.LOG.error('Image verify: FAIL @ 0x%08X' % (start + mismatch))
+				return False
+		if progress:
+			progress.finish()
+		self.LOG.info('Image verify: OK')
+		return True
+
+
+	def execute_plan(self, plan, progress=None):
+		"""Programs a `ProgrammingPlan` compiled for the part.
+
+		Args:
+			plan     -- `ProgrammingPlan` to execute.
+			progress -- `Progress` of the "erase", "write" and "verify" phases (optional).
+
+		Returns:
+			`True` if the plan was written and verified.
+		"""
+
+		self._check_part()
+		plan.check(self.part)
+		self.LOG.info(str(plan))
+
+		if plan.strategy == plan.STRATEGY_PAGE:
+			return self._execute_page_plan(plan, progress)
+
+		from .FlashControllers import EEFCFlash
+
+		flash_controllers = [c for c in self.part.flash_controllers if c.flash_address_range.start in plan.erase_planes]
+		if progress:
+			progress.start('erase', sum(c.flash_address_range.length for c in flash_controllers))
+		with Profiler.phase('erase'):
+			for flash_controller in flash_controllers:
+				flash_controller.erase_flash(None)
+			EEFCFlash.Flash.wait_for_erase(flash_controllers, progress)
+		if progress:
+			progress.finish()
+			progress.start('write', len(plan))
+
+		# the planes are erased: blank pages are skipped, the others written without comparing
+		with Profiler.phase('write'):
+			for address, data, blank in plan.get_pages():
+				if not blank:
+					flash_controller = next(c for c in flash_controllers if c.flash_address_range.is_in_range(address, len(data)))
+					flash_controller.write_page((address, struct.unpack('<%dI' % (len(data) // 4), data), 'WP'))
+				if progress:
+					progress.advance(len(data), not blank)
+		if progress:
+			progress.finish()
+
+		return self._verify_checksums(plan.checksums, progress)
+
+
+	def _execute_page_plan(self, plan, progress=None):
+		"""Internal helper to program a plan of the "page" strategy: the pages
+		   whose flash CRC32 matches the recorded one are skipped, where the
+		   part calculates flash checksums, and the others programmed as any
+		   other write.
+		"""
+
+		pages = [(address, data) for address, data, _ in plan.get_pages()]
+		stale = []
+		with Profiler.phase('checksum'):
+			for (address, data), (_, _, crc, _) in zip(pages, plan.pages):
+				checksum = self.part.get_flash_checksum(address, len(data)) if len(data) % 4 == 0 else None
+				if checksum is None:
+					# not supported: every page is compared
+					stale = pages
+					break
+				if checksum != crc:
+					# the device checksum prevails over any cached contents
+					self.memory.invalidate(address, len(data))
+					stale.append((address, data))
+		self.LOG.info('Plan: %d of %d page(s) to program' % (len(stale), len(pages)))
+		if not stale:
+			return True
+		return self.program_images(stale, progress=progress)
+
+
+	def _verify_checksums(self, checksums, progress=None):
+		"""Internal helper to verify the flash against expected CRC32 values,
+		   calculated by the part where it can, or over the data read back.
+
+		Args:
+			checksums -- List of (address, length, crc32) tuples.
+			progress  -- `Progress` of the verify (optional).
+		"""
+
+		if progress:
+			progress.start('verify', sum(length for _, length, _ in checksums))
+		self.memory.invalidate()
+		for address, length, crc in checksums:
+			with Profiler.phase('verify'):
+				checksum = None
+				if address % 4 == 0 and length % 4 == 0:
+					checksum = self.part.get_flash_checksum(address, length)
+				if checksum is None:
+					checksum = zlib.crc32(bytes(self.part.read_flash(address, length))) & 0xFFFFFFFF
+			if checksum != crc:
+				self.LOG.error('Plan verify: FAIL @ 0x%08X' % address)
+				return False
+			if progress:
+				progress.advance(length)
+		if progress:
+			progress.finish()
+		self.LOG.info('Plan verify: OK')
+		return True
+
+
+	def verify_images(self, images, max_mismatches=10, progress=None):
+		"""Verifies images against the flash of the part. Where the part can
+		   calculate flash checksums, each block is first compared by its
+		   checksum and only read back on a difference; everything else is
+		   read back in large blocks and compared as a whole.
+
+		Args:
+			images         -- List of (address, data) or (address, data, name) tuples.
+			max_mismatches -- Number of mismatching bytes to report.
+			progress       -- `Progress` of the verify (optional).
+
+		Returns:
+			Dict of { 'length' : bytes verified, 'checksummed' : bytes verified
+			by checksum, 'elapsed' : seconds, 'mismatches' : [(address,
+			expected_byte, actual_byte), ...] }, with up to `max_mismatches`
+			mismatches in address order.
+		"""
+
+		self._check_part()
+
+		image = SparseImage()
+		for entry in images:
+			image.add(*entry)
+
+		start_timestamp = time.time()
+		result = { 'length' : len(image), 'checksummed' : 0, 'mismatches' : [] }
+		if progress:
+			progress.start('verify', len(image))
+		# compare with the device, not with what the cache expects it to hold
+		self.memory.invalidate()
+		for segment in image.segments:
+			for offset in range(0, len(segment.data), self.READ_CHUNK_SIZE):
+				address = segment.address + offset
+				data = segment.data[offset : offset + self.READ_CHUNK_SIZE]
+				checksummed = result['checksummed']
+				with Profiler.phase('verify'):
+					for block_address, block_data in self._get_unmatched_blocks(address, data, result):
+						actual = self.part.read_flash(block_address, len(block_data), progress)
+						self._compare(block_address, block_data, actual, result, max_mismatches)
+				if progress:
+					progress.advance(result['checksummed'] - checksummed)
+			if len(result['mismatches']) >= max_mismatches:
+				break
+		result['elapsed'] = time.time() - start_timestamp
+		if progress:
+			progress.finish()
+
+		self.LOG.info('Image verify: {}, {} bytes ({} by checksum) in {:.3f}s'.format(
+			'FAIL' if result['mismatches'] else 'OK', result['length'], result['checksummed'], result['elapsed']))
+		return result
+
+
+	def _get_unmatched_blocks(self, address, data, result):
+		"""Internal helper to split data into the blocks whose checksum does
+		   not match the flash contents; all of the data if the part cannot
+		   calculate checksums. Blocks are word aligned for the checksum, the
+		   unaligned head and tail are always returned.
+
+		Returns:
+			List of (address, data) tuples.
+		"""
+
+		start = address + (-address % 4)
+		end = (address + len(data)) & ~3
+		if end - start < self.CHECKSUM_BLOCK_SIZE:
+			return [(address, data)]
+
+		blocks = []
+		if start > address:
+			blocks.append((address, data[ : start - address]))
+		for block_address in range(start, end, self.CHECKSUM_BLOCK_SIZE):
+			block_data = data[block_address - address : min(end, block_address + self.CHECKSUM_BLOCK_SIZE) - address]
+			checksum = self.part.get_flash_checksum(block_address, len(block_data))
+			if checksum is None and block_address == start:
+				# not supported by the part
+				return [(address, data)]
+			if checksum == zlib.crc32(bytes(block_data)) & 0xFFFFFFFF:
+				result['checksummed'] += len(block_data)
+			else:
+				blocks.append((block_address, block_data))
+		if address + len(data) > end:
+			blocks.append((end, data[end - address : ]))
+		return blocks
+
+
+	@staticmethod
+	def _compare(address, expected, actual, result, max_mismatches):
+		"""Internal helper to compare a block with the data read back, adding
+		   its first mismatches to the verify result.
+		"""
+
+		if actual == expected:
+			return
+		for i in range(len(expected)):
+			if len(result['mismatches']) >= max_mismatches:
+				return
+			if i >= len(actual) or actual[i] != expected[i]:
+				result['mismatches'].append((address + i, expected[i], actual[i] if i < len(actual) else None))
+
+
+	def erase_chip(self, address=None, progress=None):
+		self._check_part()
+		if progress is None:
+			with Profiler.phase('erase'):
+				return self.part.erase_chip(address)
+
+		# erased planes (flash size is only known to Cortex M3/M4 parts)
+		flash_controllers = getattr(self.part, 'flash_controllers', [])
+		progress.start('erase', sum(c.flash_address_range.length for c in flash_controllers
+			if address is None or c.flash_address_range.is_in_range(address, 0)))
+		with Profiler.phase('erase'):
+			self.part.erase_chip(address, progress)
+		progress.finish()
+
+
+	def set_flash_boot(self):
+		self._check_part()
+		with Profiler.phase('flash boot'):
+			self.part.set_flash_boot()
+
+
+	def reset(self):
+		self._check_part()
+		with Profiler.phase('reset'):
+			self.part.reset()
+
+
+	def program_flash(self, filename):
+		self._check_part()
+
+		file_format = self._get_file_processor(filename)
+		with Profiler.phase('file parse'):
+			file_data = file_format.read(filename)
+
+		with Profiler.phase('write'):
+			self.part.program_flash(file_data)
+
+
+	def verify_flash(self, filename):
+		self._check_part()
+
+		file_format = self._get_file_processor(filename)
+		with Profiler.phase('file parse'):
+			file_format.read(filename)
+
+		flash_start = self.get_flash_start()
+		result = self.verify_images([(flash_start if address is None else address, data) for address, data in file_format.get_segments()], 1)
+		if result['mismatches']:
+			address, expected, actual = result['mismatches'][0]
+			raise SessionError('Verification failure @ 0x%08x: 0x%02x != %s' % (address, expected, 'nothing' if actual is None else '0x%02x' % actual))
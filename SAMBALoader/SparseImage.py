@@ -0,0 +1,116 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+import logging
+
+
+class ImageOverlapError(Exception):
+	"""Exception thrown when two segments of a sparse image overlap."""
+
+	def __init__(self, segment, other):
+		self.segment = segment
+		self.other = other
+
+
+	def __str__(self):
+		return 'Image {} overlaps image {}'.format(self.segment, self.other)
+
+
+class ImageSegment(object):
+	"""Contiguous block of data at an absolute address."""
+
+	def __init__(self, address, data, name=None):
+		self.address = address
+		self.data    = bytearray(data)
+		self.name    = name
+
+
+	def __str__(self):
+		return '{}[0x{:08X}..0x{:08X}]'.format(self.name + ' ' if self.name else '', self.address, self.end)
+
+
+	@property
+	def end(self):
+		return self.address + len(self.data)
+
+
+class SparseImage(object):
+	"""Sparse memory image, merged from any number of images (e.g. a
+	   bootloader, an application and a configuration blob) placed at their
+	   own addresses.
+	"""
+
+	LOG = logging.getLogger(__name__)
+
+
+	def __init__(self):
+		self.segments = []
+
+
+	def __len__(self):
+		return sum(len(s.data) for s in self.segments)
+
+
+	def add(self, address, data, name=None):
+		"""Adds a block of data to the image.
+
+		Args:
+			address -- Absolute address of the data.
+			data    -- Data to add.
+			name    -- Name of the data source, for messages (optional).
+		"""
+
+		segment = ImageSegment(address, data, name)
+		if not segment.data:
+			return
+		for other in self.segments:
+			if segment.address < other.end and other.address < segment.end:
+				raise ImageOverlapError(segment, other)
+
+		self.LOG.debug('Image segment %s' % segment)
+		self.segments.append(segment)
+		self.segments.sort(key=lambda s: s.address)
+
+
+	def get_runs(self, page_size=1):
+		"""Groups the segments into runs, so that no page is shared by two
+		   runs: segments which are adjacent, or have a page in common, are
+		   programmed together.
+
+		Args:
+			page_size -- Flash page size, bytes.
+
+		Returns:
+			List of lists of `ImageSegment`, in address order.
+		"""
+
+		runs = []
+		for segment in self.segments:
+			if runs and segment.address // page_size <= (runs[-1][-1].end - 1) // page_size:
+				runs[-1].append(segment)
+			elif runs and segment.address == runs[-1][-1].end:
+				runs[-1].append(segment)
+			else:
+				runs.append([segment])
+		return runs
+
+
+	def digest(self):
+		"""Calculates the hash that identifies the image in a journal.
+
+		Returns:
+			Hash of the segments and their addresses, as a hex string.
+		"""
+
+		import hashlib
+
+		h = hashlib.sha256()
+		for segment in self.segments:
+			h.update('{:08X}:{:X}:'.format(segment.address, len(segment.data)).encode('ascii'))
+			h.update(segment.data)
+		return h.hexdigest()
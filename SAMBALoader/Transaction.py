@@ -0,0 +1,107 @@
+#
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Register transactions: sequences of register writes, reads and polls which
+# are executed together by `SAMBA.execute()`.
+
+
+class TransactionError(Exception):
+	"""Exception thrown when a transaction poll condition is not met in time."""
+
+	def __init__(self, address, value):
+		self.address = address
+		self.value = value
+
+
+	def __str__(self):
+		return 'Poll timeout @ 0x{:08X}: 0x{:08X}'.format(self.address, self.value)
+
+
+class TransactionOperation:
+	"""Transaction operation types."""
+
+	WRITE = 'write'
+	READ  = 'read'
+	POLL  = 'poll'
+
+
+class Transaction(object):
+	"""Sequence of 32-bit register accesses. Operations run in the order they
+	   were added; every read and poll adds one value to the transaction
+	   results. A poll blocks all following operations until its condition is
+	   met, so that e.g. a flash command is only issued once the controller
+	   is ready.
+
+	   Over USB, all operations up to the next poll are sent to the device in
+	   a single exchange; otherwise they are run one at a time.
+	"""
+
+	POLL_TIMEOUT = 2 # s
+
+
+	def __init__(self):
+		self.operations = []
+
+
+	def __len__(self):
+		return len(self.operations)
+
+
+	def write_word(self, address, word):
+		"""Adds a 32-bit register write.
+
+		Args:
+			address -- Address of the register.
+			word    -- 32-bit value to write.
+
+		Returns:
+			The transaction, so that operations can be chained.
+		"""
+
+		self.operations.append((TransactionOperation.WRITE, address, word, None))
+		return self
+
+
+	def read_word(self, address):
+		"""Adds a 32-bit register read, which adds the read value to the
+		   transaction results.
+
+		Args:
+			address -- Address of the register.
+
+		Returns:
+			The transaction, so that operations can be chained.
+		"""
+
+		self.operations.append((TransactionOperation.READ, address, None, None))
+		return self
+
+
+	def poll_word(self, address, mask, value=None, timeout=POLL_TIMEOUT):
+		"""Adds a 32-bit register poll, repeating the read until the masked
+		   register value matches. The last read value is added to the
+		   transaction results.
+
+		Args:
+			address -- Address of the register.
+			mask    -- Mask of the register bits to check.
+			value   -- Expected value of the masked bits (default: all set).
+			timeout -- Poll timeout, s; `TransactionError` is thrown on expiry.
+
+		Returns:
+			The transaction, so that operations can be chained.
+		"""
+
+		self.operations.append((TransactionOperation.POLL, address, (mask, mask if value is None else value), timeout))
+		return self
+
+
+	def writes(self):
+		"""Lists the (address, word) pairs written by the transaction."""
+
+		return [(address, word) for operation, address, word, _ in self.operations if operation == TransactionOperation.WRITE]
@@ -8,10 +8,15 @@
 
 from . import Transport
 import logging
+import sys
+import time
 
 
 class Serial(Transport.TransportBase):
-	"""Serial transport for SAM-BA devices using a COM port."""
+	"""Serial transport for SAM-BA devices using a COM port. Reads take any
+	   data already received along with the requested data, and keep it in a
+	   read-ahead buffer for the next reads.
+	"""
 
 	LOG = logging.getLogger(__name__)
 
@@ -39,6 +44,8 @@ class Serial(Transport.TransportBase):
 										bytesize=serial.EIGHTBITS,
 										timeout=1, # read timeout, s
 										write_timeout=1)
+		self._buffer = bytearray() # data received ahead of the reads
+		self._device_id = None
 
 		# flush input buffer
 		try:
@@ -123,12 +130,28 @@ class Serial(Transport.TransportBase):
 			Flat byte array.
 		"""
 
-		if isinstance(data, str):
+		if isinstance(data, (bytes, bytearray)):
+			return data
+		elif isinstance(data, str):
 			return bytearray(data.encode('ascii', 'ignore'))
 		else:
 			return bytearray([ord(d) if isinstance(d, str) else d for d in data])
 
 
+	def _receive(self, length):
+		"""Internal helper to receive at least the given number of bytes from
+		   the serial port (fewer on timeout), together with any further data
+		   the port already holds.
+
+		Returns:
+			Bytes received.
+		"""
+
+		data = self.serialport.read(max(length, self.serialport.in_waiting))
+		self._count_received(len(data))
+		return data
+
+
 	def read(self, length):
 		"""Reads a given number of bytes from the serial interface.
 
@@ -142,13 +165,147 @@ class Serial(Transport.TransportBase):
 			TimeoutError if the read operation timed out.
 		"""
 
-		data = self.serialport.read(length)
-		if len(data) != length:
-			raise Transport.TimeoutError()
+		data = bytearray(length)
+		self.readinto(data)
+		return data
+
+
+	def readinto(self, buffer):
+		"""Reads data from the serial interface into a caller provided buffer,
+		   filling it completely.
+
+		Args:
+			buffer -- Writable bytes-like object to fill with received data.
+
+		Returns:
+			Number of bytes stored into the buffer.
+
+		Raises:
+			TimeoutError if the read operation timed out.
+		"""
+
+		view   = memoryview(buffer)
+		length = len(view)
+
+		buffered = min(len(self._buffer), length)
+		if buffered:
+			view[:buffered] = self._buffer[:buffered]
+			del self._buffer[:buffered]
+		if buffered < length:
+			data = self._receive(length - buffered)
+			received = min(len(data), length - buffered)
+			view[buffered : buffered + received] = data[:received]
+			self._buffer += data[received:]
+			if buffered + received != length:
+				raise Transport.TimeoutError()
+
+		if self.LOG.isEnabledFor(logging.DEBUG):
+			self.LOG.debug('Receive %d bytes %s' % (length, list(view.tobytes())))
+
+		return length
+
 
-		self.LOG.debug('Receive %d bytes %s' % (len(data), [b for b in data]))
+	def read_until(self, terminator):
+		"""Reads a framed response from the serial interface, up to and
+		   including a terminator, taking whatever data was received on each
+		   read rather than a byte at a time.
+
+		Args:
+			terminator -- Bytes ending the response, e.g. `b'\\n\\r'`.
+
+		Returns:
+			Byte array of the received data, including the terminator.
+
+		Raises:
+			TimeoutError if the terminator was not received in time.
+		"""
+
+		start = 0
+		while True:
+			end = self._buffer.find(terminator, start)
+			if end >= 0:
+				break
+			start = max(0, len(self._buffer) - len(terminator) + 1)
+			data = self._receive(1)
+			if not data:
+				raise Transport.TimeoutError()
+			self._buffer += data
+
+		end += len(terminator)
+		data = self._buffer[:end]
+		del self._buffer[:end]
+
+		if self.LOG.isEnabledFor(logging.DEBUG):
+			self.LOG.debug('Receive %d bytes %s' % (len(data), list(data)))
+
+		return data
+
+
+	def read_available(self):
+		"""Reads the data already received by the serial interface, without
+		   waiting for more.
+
+		Returns:
+			Byte array of the received data, possibly empty.
+		"""
+
+		data = self._buffer
+		self._buffer = bytearray()
+		pending = self.serialport.in_waiting
+		if pending:
+			data += self._receive(pending)
+		return data
+
+
+	def get_device_id(self):
+		"""Retrieves a stable identifier of the connected device: the USB
+		   VID:PID and serial number if available, or the port path otherwise.
+		   The identifier is looked up once per connection.
+
+		Returns:
+			Device identifier as a string.
+		"""
+
+		if self._device_id is None:
+			self._device_id = self._find_device_id()
+		return self._device_id
+
+
+	def _find_device_id(self):
+		"""Internal helper to look up the USB properties of the open port. On
+		   Linux only the sysfs entry of the port is read; elsewhere the ports
+		   are listed, which may take longer.
+
+		Returns:
+			Device identifier as a string.
+		"""
+
+		port = self.serialport.port
+		try:
+			if sys.platform.startswith('linux'):
+				from serial.tools import list_ports_linux
+				info = list_ports_linux.SysFS(port)
+			else:
+				import serial.tools.list_ports
+				info = next((p for p in serial.tools.list_ports.comports() if p.device == port), None)
+			if info is not None and info.serial_number:
+				return 'USB {:04X}:{:04X} {}'.format(info.vid, info.pid, info.serial_number)
+		except Exception:
+			pass
+		return port
+
+
+	def drain(self):
+		"""Discards any data pending reception on the serial interface, waiting
+		   until the device stops sending.
+		"""
 
-		return bytearray(data)
+		del self._buffer[:]
+		while True:
+			time.sleep(.05)
+			if not self.read_available():
+				break
+		self.serialport.reset_input_buffer()
 
 
 	def write(self, data):
@@ -158,6 +315,9 @@ class Serial(Transport.TransportBase):
 			data -- Bytes to write.
 		"""
 
-		self.LOG.debug('Send %d bytes: %s' % (len(data), [b for b in data]))
+		data = self._to_byte_array(data)
+		if self.LOG.isEnabledFor(logging.DEBUG):
+			self.LOG.debug('Send %d bytes: %s' % (len(data), list(data)))
 
-		self.serialport.write(self._to_byte_array(data))
+		self._count_sent(len(data))
+		self.serialport.write(data)
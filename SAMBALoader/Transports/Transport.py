@@ -28,6 +28,12 @@ class TransportBase(object):
 
 	LOG = logging.getLogger(__name__)
 
+	# Link statistics, counted by the transports talking to the device
+	bytes_sent         = 0
+	bytes_received     = 0
+	round_trips        = 0 # responses received after sending
+	_awaiting_response = False
+
 
 	@abc.abstractmethod
 	def read(self, length):
@@ -43,6 +49,57 @@ class TransportBase(object):
 		pass
 
 
+	def readinto(self, buffer):
+		"""Reads data from the transport into a caller provided buffer, filling
+		   it completely. Transports override this to avoid the extra copy.
+
+		Args:
+			buffer -- Writable bytes-like object to fill with received data.
+
+		Returns:
+			Number of bytes stored into the buffer.
+
+		Raises:
+			TimeoutError if the read operation timed out.
+		"""
+
+		data = self.read(len(buffer))
+		buffer[:len(data)] = data
+		return len(data)
+
+
+	def read_until(self, terminator):
+		"""Reads a framed response from the transport, up to and including a
+		   terminator. Transports override this to read the response in as few
+		   reads as possible.
+
+		Args:
+			terminator -- Bytes ending the response, e.g. `b'\\n\\r'`.
+
+		Returns:
+			Byte array of the received data, including the terminator.
+
+		Raises:
+			TimeoutError if the terminator was not received in time.
+		"""
+
+		data = bytearray()
+		while not data.endswith(terminator):
+			data += self.read(1)
+		return data
+
+
+	def read_available(self):
+		"""Reads the data already received by the transport, without waiting
+		   for more.
+
+		Returns:
+			Byte array of the received data, possibly empty.
+		"""
+
+		return bytearray()
+
+
 	@abc.abstractmethod
 	def write(self, data):
 		"""Writes a given number of bytes to the transport.
@@ -51,3 +108,43 @@ class TransportBase(object):
 			data -- Bytes to write.
 		"""
 		pass
+
+
+	def _count_sent(self, length):
+		"""Records data sent to the device in the link statistics."""
+
+		self.bytes_sent += length
+		self._awaiting_response = True
+
+
+	def _count_received(self, length):
+		"""Records data received from the device in the link statistics; the
+		   first data received after sending completes a round trip.
+		"""
+
+		self.bytes_received += length
+		if self._awaiting_response:
+			self._awaiting_response = False
+			self.round_trips += 1
+
+
+	def get_device_id(self):
+		"""Retrieves a stable identifier of the connected device, used to key
+		   cached information about it.
+
+		Returns:
+			Device identifier as a string, or `None` if not available.
+		"""
+		return None
+
+
+	def drain(self):
+		"""Discards any data pending reception on the transport, so that the
+		   next read starts from a clean state.
+		"""
+
+		try:
+			while True:
+				self.read(1)
+		except TimeoutError:
+			pass
@@ -8,62 +8,167 @@
 
 from . import Transport
 import logging
-import io
+
+
+class XMODEMControl:
+	"""XMODEM protocol control characters."""
+
+	SOH = 0x01 # Start of a 128 byte block
+	STX = 0x02 # Start of a 1024 byte block (XMODEM-1K)
+	EOT = 0x04 # End of transmission
+	ACK = 0x06
+	NAK = 0x15
+	CAN = 0x18
+	CRC = 0x43 # 'C', receiver requests CRC16 mode
+
+
+def _make_crc16_table():
+	"""Builds the lookup table for the CRC16-CCITT (XMODEM) polynomial."""
+
+	table = []
+	for i in range(256):
+		crc = i << 8
+		for _ in range(8):
+			crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+		table.append(crc & 0xFFFF)
+	return table
+
+
+_CRC16_TABLE = _make_crc16_table()
+
+
+def crc16(data, crc=0):
+	"""Calculates the XMODEM CRC16 of the given data.
+
+	Args:
+		data -- Bytes-like object to calculate the CRC over.
+		crc  -- Initial CRC value.
+
+	Returns:
+		16-bit CRC value.
+	"""
+
+	table = _CRC16_TABLE
+	for b in data:
+		crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ b]
+	return crc
+
+
+class XMODEMError(Exception):
+	"""Exception thrown when an XMODEM transfer cannot be completed."""
+	pass
 
 
 class XMODEM(Transport.TransportBase):
-	"""XMODEM wrapper transport."""
+	"""XMODEM wrapper transport, supporting both 128 byte blocks and XMODEM-1K
+	   (1024 byte) blocks in CRC16 mode. A single instance is intended to be
+	   kept for the whole session and reused for every transfer.
+	"""
 
+	LOG = logging.getLogger(__name__)
 
-	def __init__(self, transport):
+	BLOCK_SIZE    = 128
+	BLOCK_SIZE_1K = 1024
+
+	PAD_BYTE      = 0xFF
+
+
+	def __init__(self, transport, use_1k=False, retries=10):
 		"""Constructs an XMODEM transport.
 
 		Args:
 			transport -- Existing transport to wrap with an XMODEM stream.
+			use_1k    -- If `True`, 1024 byte blocks are sent where the receiver
+			             accepts them (falling back to 128 byte blocks if not).
+			retries   -- Number of retries for each block before aborting.
 		"""
 
-		try:
-			import xmodem
-		except ImportError as e:
-			self.LOG.fatal('Could not import xmodem library. Is it installed?')
-			raise e
-
 		if not isinstance(transport, Transport.TransportBase):
 			raise AssertionError('XMODEM transport must wrap an existing transport instance.')
 
 		self.transport = transport
-		self.xmodem    = xmodem.XMODEM(self._read_byte, self._write_byte)
+		self.use_1k    = use_1k
+		self.retries   = retries
+
+
+	def _read_control(self):
+		"""Internal helper to read a single control character from the wrapped
+		   transport.
+
+		Returns:
+			Control character value, or `None` if the read timed out.
+		"""
+
+		try:
+			return self.transport.read(1)[0]
+		except Transport.TimeoutError:
+			return None
+
+
+	def _wait_for_receiver(self):
+		"""Waits until the receiver requests the start of a CRC16 mode
+		   transfer.
+		"""
 
+		for _ in range(self.retries):
+			control = self._read_control()
+			if control == XMODEMControl.CRC:
+				return
+			elif control == XMODEMControl.CAN:
+				raise XMODEMError('Transfer cancelled by receiver')
+			elif control == XMODEMControl.NAK:
+				raise XMODEMError('Receiver does not support CRC16 mode')
 
-	def _read_byte(self, size, timeout=1):
-		"""Internal helper for the XMODEM serialiser, to bind read requests to
-		   the wrapped transport.
+		raise XMODEMError('Timeout waiting for receiver')
 
-		   Args:
-			  size    -- length of the data to read.
-			  timeout -- read timeout, in seconds.
 
-		   Returns:
-			  Read data as an array of bytes.
+	def _make_packet(self, sequence, block):
+		"""Builds a complete XMODEM packet for the given block of data.
+
+		Args:
+			sequence -- Block sequence number.
+			block    -- Block data, either 128 or 1024 bytes in length.
+
+		Returns:
+			Packet as a `bytearray`, ready for transmission.
 		"""
 
-		return self.transport.read(size)
+		sequence &= 0xFF
+		crc = crc16(block)
 
+		packet = bytearray(len(block) + 5)
+		packet[0] = XMODEMControl.STX if len(block) == self.BLOCK_SIZE_1K else XMODEMControl.SOH
+		packet[1] = sequence
+		packet[2] = 0xFF - sequence
+		packet[3:-2] = block
+		packet[-2] = crc >> 8
+		packet[-1] = crc & 0xFF
+		return packet
 
-	def _write_byte(self, data, timeout=1):
-		"""Internal helper for the XMODEM serialiser, to bind write requests to
-		   the wrapped transport.
 
-		   Args:
-			  data    -- data to send.
-			  timeout -- write timeout, in seconds.
+	def _send_packet(self, packet):
+		"""Sends a packet, retrying until the receiver acknowledges it.
 
-		   Returns:
-			  Read data as an array of bytes.
+		Args:
+			packet -- Complete packet to send.
+
+		Returns:
+			`True` if the packet was acknowledged, `False` if it was rejected
+			on every retry.
 		"""
 
-		self.transport.write(data)
-		return len(data)
+		for _ in range(self.retries):
+			self.transport.write(packet)
+
+			control = self._read_control()
+			if control == XMODEMControl.ACK:
+				return True
+			elif control == XMODEMControl.CAN:
+				raise XMODEMError('Transfer cancelled by receiver')
+
+			self.LOG.debug('Block %d not acknowledged (0x%02x), retrying' % (packet[1], control or 0))
+
+		return False
 
 
 	def read(self, length):
@@ -76,20 +181,112 @@ class XMODEM(Transport.TransportBase):
 			Byte array of the received data.
 		"""
 
-		data = io.BytesIO()
-		self.xmodem.recv(data, crc_mode=1)
-		return [ord(b) if isinstance(b, str) else b for b in data.getvalue()]
+		data = bytearray(length)
+		self.readinto(data)
+		return data
+
+
+	def readinto(self, buffer):
+		"""Receives an XMODEM transfer directly into a caller provided buffer.
+		   Any block padding beyond the end of the buffer is discarded.
+
+		Args:
+			buffer -- Writable bytes-like object to fill with received data.
+
+		Returns:
+			Number of bytes stored into the buffer.
+		"""
+
+		view     = memoryview(buffer)
+		length   = len(view)
+		offset   = 0
+		sequence = 1
+		errors   = 0
+
+		self.transport.write(bytearray([XMODEMControl.CRC]))
+
+		while True:
+			control = self._read_control()
+
+			if control == XMODEMControl.EOT:
+				self.transport.write(bytearray([XMODEMControl.ACK]))
+				break
+			elif control == XMODEMControl.CAN:
+				raise XMODEMError('Transfer cancelled by sender')
+			elif control in (XMODEMControl.SOH, XMODEMControl.STX):
+				block_size = self.BLOCK_SIZE_1K if control == XMODEMControl.STX else self.BLOCK_SIZE
+				try:
+					packet = self.transport.read(block_size + 4)
+				except Transport.TimeoutError:
+					packet = None
+
+				if packet is not None and packet[0] == 0xFF - packet[1] and \
+						crc16(packet[2:-2]) == (packet[-2] << 8 | packet[-1]):
+					if packet[0] == sequence & 0xFF:
+						count = min(block_size, length - offset)
+						view[offset : offset + count] = packet[2 : 2 + count]
+						offset += count
+						sequence += 1
+						errors = 0
+					# duplicate of the previous block (lost ACK) is acknowledged and dropped
+					self.transport.write(bytearray([XMODEMControl.ACK]))
+					continue
+
+			errors += 1
+			if errors > self.retries:
+				self.transport.write(bytearray([XMODEMControl.CAN, XMODEMControl.CAN]))
+				raise XMODEMError('Too many errors while receiving block %d' % sequence)
+			if sequence == 1:
+				# the start request was lost or came before the sender was
+				# ready: a CRC mode sender only starts on 'C', not on NAK
+				self.transport.write(bytearray([XMODEMControl.CRC]))
+			else:
+				self.transport.write(bytearray([XMODEMControl.NAK]))
+
+		return offset
 
 
 	def write(self, data):
 		"""Writes a given number of bytes to the wrapped transport over XMODEM.
+		   Data of any length is split into as many blocks as required, with the
+		   final block padded out with `PAD_BYTE`.
 
 		Args:
 			data -- Bytes to write.
 		"""
 
-		data = bytearray(data)
-		data.extend([255] * (128 - len(data)))
+		view     = memoryview(bytes(data) if not isinstance(data, (bytes, bytearray)) else data)
+		offset   = 0
+		sequence = 1
+
+		self._wait_for_receiver()
+
+		while offset < len(view):
+			remaining = len(view) - offset
+			# the tail is sent in 128 byte blocks, not padded out to 1K
+			if self.use_1k and remaining >= self.BLOCK_SIZE_1K:
+				block_size = self.BLOCK_SIZE_1K
+			else:
+				block_size = self.BLOCK_SIZE
+
+			block = bytearray(view[offset : offset + block_size])
+			block.extend([self.PAD_BYTE] * (block_size - len(block)))
+
+			if not self._send_packet(self._make_packet(sequence, block)):
+				if block_size == self.BLOCK_SIZE_1K and sequence == 1:
+					# receiver rejects 1K blocks, retry with 128 byte blocks
+					self.LOG.info('XMODEM-1K not supported by receiver, using 128 byte blocks')
+					self.use_1k = False
+					continue
+				self.transport.write(bytearray([XMODEMControl.CAN, XMODEMControl.CAN]))
+				raise XMODEMError('Block %d not acknowledged' % sequence)
+
+			offset += block_size
+			sequence += 1
+
+		for _ in range(self.retries):
+			self.transport.write(bytearray([XMODEMControl.EOT]))
+			if self._read_control() == XMODEMControl.ACK:
+				return
 
-		packet = io.BytesIO(data)
-		self.xmodem.send(packet)
+		raise XMODEMError('End of transmission not acknowledged')
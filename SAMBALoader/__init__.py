@@ -6,12 +6,53 @@
 #         www.fourwalledcubicle.com
 #
 
+import importlib
+
 from .SAMBA import *
+from .Transaction import *
 from .PartLibrary import *
 from .FileFormatLibrary import *
+from .IdentificationCache import *
+from .SparseImage import *
+from .Progress import *
+from .Profiler import *
+from .Session import *
+
+
+# Subpackages and modules which are only imported on first use, to keep the
+# command line tool startup fast.
+_LAZY_MODULES = (
+	'Transports',
+	'Parts',
+	'ChipIdentifiers',
+	'FlashControllers',
+	'FileFormats',
+	'Peripheral',
+	'Journal',
+	'Daemon',
+	'Hotplug',
+	'Plan',
+	'Compression',
+)
+
+# Public names re-exported from lazily imported modules: { name : module }
+_LAZY_ATTRIBUTES = {
+	'ProgrammingJournal' : 'Journal',
+	'HotplugWatcher'     : 'Hotplug',
+	'ProgrammingPlan'    : 'Plan',
+	'CompressedUpload'   : 'Compression',
+}
+
+
+def __getattr__(name):
+	if name in _LAZY_MODULES:
+		return importlib.import_module('.' + name, __name__)
+	elif name in _LAZY_ATTRIBUTES:
+		value = getattr(importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__), name)
+		globals()[name] = value
+		return value
+	raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
 
-from . import Transports
-from . import Parts
-from . import ChipIdentifiers
-from . import FlashControllers
-from . import FileFormats
+def __dir__():
+	return sorted(set(globals()) | set(_LAZY_MODULES) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# Startup time benchmark: imports the package the way the command line tool
+# does under `python -X importtime`, and fails if the import got slower than
+# the budget or pulled in modules which should only be loaded on use.
+
+from __future__ import print_function
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code run in the measured interpreter: what `SAMBALoader.py parts` needs
+STARTUP_CODE = 'import SAMBALoader; [p.get_name() for p in SAMBALoader.PartLibrary.SUPPORTED_PARTS]'
+
+# Modules which must not be imported at startup
+LAZY_MODULES = (
+	'serial',
+	'intelhex',
+	'socket',
+	'hashlib',
+	'SAMBALoader.Daemon',
+	'SAMBALoader.Journal',
+	'SAMBALoader.FlashControllers',
+	'SAMBALoader.Peripheral',
+	'SAMBALoader.Parts.CortexM0p',
+	'SAMBALoader.Parts.CortexM3_4',
+	'SAMBALoader.FileFormats',
+)
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure():
+	"""Imports the package in a fresh interpreter.
+
+	Returns:
+		Tuple of (cumulative package import time in microseconds, set of
+		imported module names).
+	"""
+
+	output = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+		cwd=ROOT, stderr=subprocess.STDOUT).decode('utf-8')
+
+	package_time = 0
+	modules = set()
+	for line in output.splitlines():
+		match = IMPORT_TIME_LINE.match(line)
+		if match is None:
+			continue
+		modules.add(match.group(4))
+		if match.group(4) == 'SAMBALoader':
+			package_time += int(match.group(2))
+	return package_time, modules
+
+
+def main():
+	parser = argparse.ArgumentParser(description='SAMBALoader startup time benchmark')
+	parser.add_argument('-n', type=int, default=5, help='number of runs, the fastest is used; default: %(default)s')
+	parser.add_argument('--max-ms', type=float, default=40.0, help='startup budget in milliseconds; default: %(default)s')
+	args = parser.parse_args()
+
+	best = None
+	for _ in range(args.n):
+		package_time, modules = measure()
+		best = package_time if best is None else min(best, package_time)
+
+	print('import SAMBALoader: %.1f ms (best of %d, budget %.1f ms)' % (best / 1000.0, args.n, args.max_ms))
+
+	failed = False
+	for module in LAZY_MODULES:
+		loaded = [m for m in modules if m == module or m.startswith(module + '.')]
+		if loaded:
+			print('FAIL: %s imported at startup' % module)
+			failed = True
+
+	if best / 1000.0 > args.max_ms:
+		print('FAIL: startup exceeds the budget')
+		failed = True
+
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+#      Open Source SAM-BA Programmer
+#      Released under the MIT license
+#
+#   dean [at] fourwalledcubicle [dot] com
+#         www.fourwalledcubicle.com
+#
+
+# SAM3 flash read benchmark: compares the word by word read path with the
+# pipelined word reads used for parts which cannot use `read_block`. Runs
+# against a device given with `-p`, or against a simulated USB link with a
+# fixed round trip latency.
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SAMBALoader
+from SAMBALoader.Transports import Transport
+from SAMBALoader.FlashControllers import EEFCFlash
+
+
+class SimulatedLink(Transport.TransportBase):
+	"""SAM-BA USB link answering word reads with zeros, where every exchange
+	   (the first read after a write) costs a fixed round trip latency.
+	"""
+
+	def __init__(self, latency):
+		self.latency = latency
+		self.pending = bytearray()
+		self.response = bytearray()
+		self.waited = True
+
+
+	def write(self, data):
+		self.pending += data.encode('ascii') if isinstance(data, str) else bytearray(data)
+		while b'#' in self.pending:
+			command, _, self.pending = self.pending.partition(b'#')
+			if command.startswith(b'N'):
+				self.response += b'\n\r'
+			elif command.startswith(b'w'):
+				self.response += bytearray(4)
+		self.waited = False
+
+
+	def read(self, length):
+		if not self.waited:
+			time.sleep(self.latency)
+			self.waited = True
+		if len(self.response) < length:
+			raise Transport.TimeoutError()
+		data = self.response[:length]
+		del self.response[:length]
+		return data
+
+
+def measure(read, address, length):
+	start_timestamp = time.time()
+	data = read(address, length)
+	assert len(data) == length
+	return time.time() - start_timestamp
+
+
+def main():
+	parser = argparse.ArgumentParser(description='SAM3 flash read benchmark')
+	parser.add_argument('-p', '--port', help='port of a SAM3 device; default: simulated link')
+	parser.add_argument('-l', metavar='BYTES', type=int, default=16 * 1024, help='length to read; default: %(default)s')
+	parser.add_argument('--latency', metavar='MS', type=float, default=1.0, help='simulated round trip latency; default: %(default)s')
+	args = parser.parse_args()
+
+	if args.port:
+		session = SAMBALoader.Session.connect(args.port, use_id_cache=False)
+		session.identify()
+		flash = session.part.flash_controllers[0]
+		if not flash.dont_use_read_block:
+			print('%s does not use word reads' % session.part.get_name())
+			sys.exit(1)
+		samba = session.samba
+	else:
+		samba = SAMBALoader.SAMBA(SimulatedLink(args.latency / 1000.0), is_usb=True)
+		flash = EEFCFlash.Flash(samba, 0x00080000, 0x400E0A00, 1024, 256, dont_use_read_block=True)
+
+	address = flash.flash_address_range.start
+	word_time = measure(lambda a, l: flash._read_by_word(a, l, samba), address, args.l)
+	pipelined_time = measure(lambda a, l: flash._read_words(a, l, samba), address, args.l)
+
+	print('Read %d bytes' % args.l)
+	print('  word by word: %8.3f s  %8.1f KB/s' % (word_time, args.l / 1024.0 / word_time))
+	print('  pipelined:    %8.3f s  %8.1f KB/s' % (pipelined_time, args.l / 1024.0 / pipelined_time))
+	print('  speedup:      %8.1fx' % (word_time / pipelined_time))
+
+
+if __name__ == '__main__':
+	main()